@@ -1,19 +1,113 @@
+import argparse
 import os
-from src.models.yolo_bow import YoloBow
+from src.core.live import LiveAnalyzer
 from src.core.log import logger
+from src.core.model import Model
+from src.core.registry import ModelRegistry
+from src.core.store import SessionStore
+from src.core.tuning import AutoTuner
+from src.models.batch import BatchRunner
+from src.models.yolo_bow import YoloBow
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='射箭姿态分析 - 批量处理 data/input 中的视频')
+    parser.add_argument('--input', default=os.path.join('data', 'input'), help='输入目录')
+    parser.add_argument('--output', default=os.path.join('data', 'output'), help='输出目录')
+    parser.add_argument('--model', default='yolo11x-pose', help='模型名称')
+    parser.add_argument('--device', default='auto', help='设备: auto / cpu / cuda / mps')
+    parser.add_argument('--backend', default='torch', choices=['torch', 'onnx', 'openvino'], help='推理后端, onnx / openvino 首次使用时导出并缓存到 data/models')
+    parser.add_argument('--int8', action='store_true', help='使用INT8量化模型 (仅 onnx / openvino)')
+    parser.add_argument('--calibration', default=None, help='INT8校准视频, 默认使用第一个待处理视频')
+    parser.add_argument('--batch-size', type=int, default=0, help='批处理大小, 0 表示按 (模型, 设备, 分辨率) 自动调优并保存到 data/tuning.json')
+    parser.add_argument('--retune', action='store_true', help='清除已保存的调优结果, 重新自动调优')
+    parser.add_argument('--workers', type=int, default=1, help='并行工作进程数')
+    parser.add_argument('--threads', type=int, default=None, help='每个工作进程的线程数, 默认均分CPU核数')
+    parser.add_argument('--chunks', type=int, default=0, help='单个视频切分的段数, 各段由工作进程并行推理; 0 表示按视频并行')
+    parser.add_argument('--pipeline', action='store_true', help='启用解码/推理/标注/编码流水线')
+    parser.add_argument('--queue-size', type=int, default=4, help='流水线队列深度')
+    parser.add_argument('--adaptive-stride', type=int, default=0, help='自适应跳帧的最大推理间隔, 0 表示逐帧推理')
+    parser.add_argument('--roi', action='store_true', help='只对射手周围的裁剪区域推理')
+    parser.add_argument('--decode-width', type=int, default=0, help='整帧推理前把帧缩小到的宽度 (如 4K 输入设为 1280), 0 表示原尺寸推理')
+    parser.add_argument('--cascade', default=None, help='级联推理的轻量模型 (如 yolo11n-pose): 逐帧跟踪, 仅关键点置信度低或接近环节分界的帧交给 --model 推理')
+    parser.add_argument('--cascade-conf', type=float, default=0.5, help='级联升级的肩、肘、髋关键点置信度阈值')
+    parser.add_argument('--multi-archer', action='store_true', help='多射手模式: 按跟踪ID分别分析每个射手, 数据按 (帧号, 目标ID) 每人一行')
+    parser.add_argument('--formats', default='csv', help='数据输出格式, 逗号分隔: csv,npz,parquet')
+    parser.add_argument('--metrics', default=None, help='指标快照文件 (.json / .prom), 每处理完一个视频更新一次')
+    parser.add_argument('--metrics-port', type=int, default=0, help='本地HTTP指标端口 (/metrics, /metrics.json), 0 表示不开启')
+    parser.add_argument('--headless', action='store_true', help='只输出数据, 不绘制和编码标注视频 (可稍后用 --render 渲染)')
+    parser.add_argument('--render', action='store_true', help='由 --headless 保存的逐帧结果渲染标注视频, 不执行推理')
+    parser.add_argument('--reanalyze', action='store_true', help='只用关键点缓存重算姿态数据与动作环节 (如调整环节判定后), 不解码视频、不执行推理')
+    parser.add_argument('--render-workers', type=int, default=None, help='渲染的并行进程数, 默认CPU核数')
+    parser.add_argument('--live', default=None, help='实时模式输入: 摄像头序号、视频流地址或本地视频 (按帧率实时播放)')
+    parser.add_argument('--latency-budget', type=float, default=100, help='实时模式端到端延迟预算 (毫秒)')
+    parser.add_argument('--store', default=None, help='训练记录库 (SQLite), 处理完成的视频切分为单次射箭后写入, 如 data/sessions.db')
+    parser.add_argument('--archer', default=None, help='写入训练记录库的射手名称')
+    parser.add_argument('--index', action='store_true', help='只把已有完整输出的视频写入 --store 训练记录库, 不执行推理')
+    parser.add_argument('--force', action='store_true', help='重新处理已有完整输出的视频')
+    return parser.parse_args()
+
+
 def main():
+    args = parse_args()
+    if args.live is not None:
+        # 实时模式: 批大小1, 始终分析最新帧
+        with ModelRegistry.lease(args.model, args.device, args.backend, args.int8, args.calibration) as model:
+            LiveAnalyzer(model, args.live, latency_budget=args.latency_budget / 1000).run()
+        return
+    if args.index:
+        store = SessionStore(args.store or SessionStore.DEFAULT_PATH)
+        for input_path in BatchRunner.list_videos(args.input):
+            output_path = BatchRunner.output_path(input_path, args.output)
+            # 标注与仅数据两种模式的完整输出均可补录
+            if BatchRunner.is_complete(output_path) or BatchRunner.is_complete(output_path, annotate=False):
+                store.add_video(input_path, YoloBow.csv_path(output_path), archer=args.archer)
+        store.close()
+        return
+    if args.render:
+        for input_path in BatchRunner.list_videos(args.input):
+            YoloBow.render(input_path, BatchRunner.output_path(input_path, args.output), workers=args.render_workers)
+        return
+    if args.reanalyze:
+        model_label = Model.label(args.model, args.backend, args.int8)
+        for input_path in BatchRunner.list_videos(args.input):
+            summary = YoloBow.reanalyze(input_path, BatchRunner.output_path(input_path, args.output), model_label,
+                                        record_formats=tuple(args.formats.split(',')), multi_archer=args.multi_archer,
+                                        decode_width=args.decode_width)
+            if summary is None:
+                logger.warning(f"⚠️ 无关键点缓存, 跳过: {input_path}")
+        return
+    if args.retune:
+        AutoTuner.clear()
     # 确保输入和输出目录存在
-    input_dir = os.path.join('data', 'input')
-    output_dir = os.path.join('data', 'output')
-    os.makedirs(input_dir, exist_ok=True)
-    os.makedirs(output_dir, exist_ok=True)
-    default_model_name = 'yolo11x-pose'
+    os.makedirs(args.input, exist_ok=True)
+    os.makedirs(args.output, exist_ok=True)
     # 处理输入目录中的所有视频文件
-    for filename in os.listdir(input_dir):
-        if filename.lower().endswith(('.mp4', '.avi', '.mov', '.mkv')):
-            input_path = os.path.join(input_dir, filename)
-            output_path = os.path.join(output_dir, f'output_{filename}')
-            YoloBow.process_video(input_path, output_path, default_model_name)
+    runner = BatchRunner(
+        model_name=args.model,
+        device_name=args.device,
+        workers=args.workers,
+        threads_per_worker=args.threads,
+        metrics_path=args.metrics,
+        metrics_port=args.metrics_port,
+        store_path=args.store,
+        archer=args.archer,
+        batch_size=args.batch_size,
+        pipeline=args.pipeline,
+        queue_size=args.queue_size,
+        adaptive_stride=args.adaptive_stride,
+        roi=args.roi,
+        decode_width=args.decode_width,
+        cascade_model=args.cascade,
+        cascade_conf=args.cascade_conf,
+        annotate=not args.headless,
+        multi_archer=args.multi_archer,
+        backend=args.backend,
+        int8=args.int8,
+        calibration_source=args.calibration,
+        record_formats=tuple(args.formats.split(',')),
+    )
+    runner.run(args.input, args.output, force=args.force, chunks=args.chunks)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,324 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from src.bench.synthetic import SyntheticArcher
+from src.core.cache import KeypointCache
+from src.core.keypoints import FrameKeypoints
+from src.core.log import logger
+from src.core.phase import PhaseTracker
+from src.core.pose import Pose
+from src.core.records import Records
+from src.core.series import AngleRate
+from src.core.video import Video
+
+
+class Benchmark:
+    """分阶段性能基准测试
+    分别计时 解码、推理 (各后端 × 各批大小)、Pose.analyze_frame、文本叠加、编码、数据写入,
+    输出 JSON 报告并可与保存的基线报告对比.
+    """
+
+    REPORT_VERSION = 1
+
+    def __init__(self, video_path, fixture_path=None, model_name='yolo11n-pose', device_name='cpu',
+                 backends=('torch',), batch_sizes=(1, 4, 8), max_frames=150, record_formats=('csv',), repeat=3):
+        """
+        Args:
+            video_path: 测试视频路径
+            fixture_path: 关键点测试数据目录 (关键点缓存格式), 为空时姿态阶段使用推理结果
+            model_name: 模型名称, 为空时跳过推理阶段
+            device_name: 设备名称
+            backends: 推理后端列表
+            batch_sizes: 批大小列表
+            max_frames: 最多读取的帧数 (全部保留在内存中供各阶段复用)
+            record_formats: 数据写入阶段的输出格式
+            repeat: 推理以外各阶段的重复次数, 取最快一次以降低抖动
+        """
+        self.video_path = video_path
+        self.fixture_path = fixture_path
+        self.model_name = model_name
+        self.device_name = device_name
+        self.backends = tuple(backends)
+        self.batch_sizes = tuple(batch_sizes)
+        self.max_frames = max_frames
+        self.record_formats = tuple(record_formats)
+        self.repeat = max(1, repeat)
+        self.stages = {}
+
+    @staticmethod
+    def stats(latencies, frames, seconds=None):
+        """阶段统计
+        Args:
+            latencies: 每次调用耗时 (秒)
+            frames: 每次调用处理的帧数, 与 latencies 等长
+            seconds: 阶段总耗时, 默认为各次调用耗时之和
+        Returns:
+            dict: 帧数、总耗时、FPS 及单帧耗时分位数 (毫秒)
+        """
+        latencies = np.asarray(latencies, dtype=np.float64)
+        frames = np.asarray(frames, dtype=np.float64)
+        total = float(frames.sum())
+        seconds = float(latencies.sum()) if seconds is None else seconds
+        per_frame = latencies / np.maximum(frames, 1) * 1000
+        p50, p95, p99 = np.percentile(per_frame, (50, 95, 99)) if len(per_frame) else (0.0, 0.0, 0.0)
+        return {
+            'frames': int(total), 'seconds': round(seconds, 6), 'fps': round(total / seconds, 3) if seconds > 0 else 0.0,
+            'p50_ms': round(float(p50), 4), 'p95_ms': round(float(p95), 4), 'p99_ms': round(float(p99), 4),
+        }
+
+    def _record(self, name, stats):
+        if name in self.stages and self.stages[name]['fps'] >= stats['fps']:
+            return
+        self.stages[name] = stats
+        logger.debug(f"⏱️ {name}: {stats['frames']}帧 | {stats['fps']:.1f} FPS | p50 {stats['p50_ms']:.2f}ms | p95 {stats['p95_ms']:.2f}ms")
+
+    def bench_decode(self):
+        """解码阶段, 返回解码得到的帧"""
+        capture = cv2.VideoCapture(self.video_path)
+        if not capture.isOpened():
+            raise RuntimeError(f"无法打开视频: {self.video_path}")
+        frames, latencies = [], []
+        while len(frames) < self.max_frames:
+            start = time.perf_counter()
+            success, frame = capture.read()
+            if not success:
+                break
+            latencies.append(time.perf_counter() - start)
+            frames.append(frame)
+        capture.release()
+        self._record('decode', self.stats(latencies, [1] * len(latencies)))
+        return frames
+
+    def bench_inference(self, frames, backend, batch_size):
+        """推理阶段, 返回每帧关键点 (各批大小复用同一常驻模型)"""
+        from src.core.registry import ModelRegistry
+
+        keypoints, latencies, counts = [], [], []
+        with ModelRegistry.lease(self.model_name, self.device_name, backend) as model:
+            list(Video.track(model, frames[:batch_size]))  # 预热
+            for k in range(0, len(frames), batch_size):
+                batch = frames[k:k + batch_size]
+                start = time.perf_counter()
+                results = list(Video.track(model, batch, reset=k == 0))
+                latencies.append(time.perf_counter() - start)
+                counts.append(len(batch))
+                keypoints.extend(FrameKeypoints.from_results(results))
+        self._record(f'inference[{backend},b{batch_size}]', self.stats(latencies, counts))
+        return keypoints
+
+    def bench_pose(self, frames, keypoints):
+        """Pose.analyze_frame 阶段 (含骨架绘制与动作环节判断), 返回标注帧与数据行"""
+        tracker = PhaseTracker()
+        rate = AngleRate()
+        annotated, rows, latencies = [], [], []
+        for index, (frame, kp) in enumerate(zip(frames, keypoints)):
+            start = time.perf_counter()
+            frame, arm_angle, spine_angle, action_state = Pose.analyze_frame(frame, kp, tracker)
+            latencies.append(time.perf_counter() - start)
+            annotated.append(frame)
+            velocity, acceleration = rate.update(arm_angle)
+            rows.append((index, round(arm_angle, 2), round(spine_angle, 2), action_state.value,
+                         round(velocity, 2), round(acceleration, 2)))
+        self._record('pose', self.stats(latencies, [1] * len(latencies)))
+        return annotated, rows
+
+    def bench_overlay(self, frames, rows):
+        """文本叠加阶段"""
+        latencies = []
+        for frame, (index, arm_angle, spine_angle, action_state, *_) in zip(frames, rows):
+            start = time.perf_counter()
+            Video.draw_texts(frame, (
+                f"processed: {index}",
+                f"Arm Angle: {arm_angle:.2f} deg",
+                f"Spine Tilt: {spine_angle:.2f} deg",
+                f"Technical process: {action_state}"
+            ))
+            latencies.append(time.perf_counter() - start)
+        self._record('overlay', self.stats(latencies, [1] * len(latencies)))
+
+    def bench_encode(self, frames, directory):
+        """编码阶段, 使用与 Video 相同的编码器, 不可用时退回 mp4v"""
+        height, width = frames[0].shape[:2]
+        path = os.path.join(directory, 'encode.mp4')
+        for codec in ('avc1', 'mp4v'):
+            writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*codec), 30, (width, height))
+            if writer.isOpened():
+                break
+        else:
+            logger.warning("⚠️ 无可用视频编码器, 跳过编码阶段")
+            return
+        latencies = []
+        for frame in frames:
+            start = time.perf_counter()
+            writer.write(frame)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        writer.release()
+        seconds = sum(latencies) + time.perf_counter() - start
+        self._record(f'encode[{codec}]', self.stats(latencies, [1] * len(latencies), seconds))
+
+    def bench_records(self, rows, directory):
+        """数据写入阶段 (含关闭时的落盘与改名)"""
+        records = Records(os.path.join(directory, 'records.csv'), formats=self.record_formats)
+        latencies = []
+        for row in rows:
+            start = time.perf_counter()
+            records.append(*row)
+            latencies.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        records.close()
+        seconds = sum(latencies) + time.perf_counter() - start
+        self._record(f"records[{','.join(self.record_formats)}]", self.stats(latencies, [1] * len(latencies), seconds))
+
+    def run(self):
+        """执行全部阶段
+        Returns:
+            dict: 基准测试报告
+        """
+        self.stages = {}
+        for _ in range(self.repeat):
+            frames = self.bench_decode()
+        if not frames:
+            raise RuntimeError(f"视频中没有可读取的帧: {self.video_path}")
+
+        keypoints = None
+        if self.model_name:
+            for backend in self.backends:
+                for batch_size in self.batch_sizes:
+                    keypoints = self.bench_inference(frames, backend, batch_size)
+        if self.fixture_path:
+            fixture = KeypointCache.read(self.fixture_path)
+            if fixture is None:
+                raise FileNotFoundError(f"关键点测试数据不存在: {self.fixture_path}")
+            keypoints = [fixture.frame(i) for i in range(min(len(fixture), len(frames)))]
+        if keypoints is None:
+            raise ValueError("未指定模型时需要提供关键点测试数据")
+
+        for _ in range(self.repeat):
+            annotated, rows = self.bench_pose(frames, keypoints)
+            self.bench_overlay(annotated, rows)
+            with tempfile.TemporaryDirectory() as directory:
+                self.bench_encode(annotated, directory)
+                self.bench_records(rows, directory)
+        logger.info("⏱️ 各阶段耗时:\n" + "\n".join(
+            f"  {name}: {s['frames']}帧 | {s['fps']:.1f} FPS | p50 {s['p50_ms']:.2f}ms | p95 {s['p95_ms']:.2f}ms | p99 {s['p99_ms']:.2f}ms"
+            for name, s in self.stages.items()
+        ))
+        return self.report(frames[0].shape)
+
+    def report(self, frame_shape):
+        import torch
+
+        return {
+            'version': self.REPORT_VERSION,
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.processor(),
+                'cpu_count': os.cpu_count(), 'numpy': np.__version__, 'opencv': cv2.__version__, 'torch': torch.__version__,
+            },
+            'config': {
+                'video': self.video_path, 'fixture': self.fixture_path, 'resolution': [frame_shape[1], frame_shape[0]],
+                'model': self.model_name, 'device': self.device_name, 'backends': list(self.backends),
+                'batch_sizes': list(self.batch_sizes), 'imgsz': Video.IMGSZ, 'conf': Video.CONF, 'repeat': self.repeat,
+            },
+            'stages': self.stages,
+        }
+
+    @staticmethod
+    def save(report, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        logger.info(f"📄 基准测试报告: {path}")
+
+    @staticmethod
+    def load(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def compare(report, baseline, tolerance=0.1):
+        """与基线报告对比各阶段 FPS
+        Args:
+            report: 本次报告
+            baseline: 基线报告
+            tolerance: 允许的 FPS 下降比例
+        Returns:
+            list: 每个共有阶段的对比结果 (阶段名, 基线FPS, 本次FPS, 变化比例, 是否退化)
+        """
+        if report['config']['resolution'] != baseline['config']['resolution']:
+            logger.warning("⚠️ 基线与本次测试的分辨率不同, 对比结果仅供参考")
+        rows = []
+        for name, stats in report['stages'].items():
+            if name not in baseline['stages'] or not baseline['stages'][name]['fps']:
+                continue
+            before, after = baseline['stages'][name]['fps'], stats['fps']
+            change = after / before - 1
+            rows.append((name, before, after, change, change < -tolerance))
+        lines = [f"  {'❌' if regressed else '✅'} {name}: {before:.1f} → {after:.1f} FPS ({change:+.1%})"
+                 for name, before, after, change, regressed in rows]
+        logger.info("📋 基线对比:\n" + "\n".join(lines))
+        return rows
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='射箭姿态分析 - 分阶段性能基准测试')
+    parser.add_argument('--video', default=None, help='测试视频, 默认生成合成视频')
+    parser.add_argument('--fixture', default=None, help='关键点测试数据目录 (关键点缓存格式), 合成视频默认使用其生成的关键点')
+    parser.add_argument('--width', type=int, default=1280, help='合成视频宽度')
+    parser.add_argument('--height', type=int, default=720, help='合成视频高度')
+    parser.add_argument('--fps', type=int, default=30, help='合成视频帧率')
+    parser.add_argument('--seconds', type=float, default=5, help='合成视频时长')
+    parser.add_argument('--persons', type=int, default=1, help='合成视频人数')
+    parser.add_argument('--model', default='yolo11n-pose', help='模型名称, 为空字符串时跳过推理阶段')
+    parser.add_argument('--device', default='cpu', help='设备: auto / cpu / cuda / mps')
+    parser.add_argument('--backends', default='torch', help='推理后端, 逗号分隔: torch,onnx,openvino')
+    parser.add_argument('--batch-sizes', default='1,4,8', help='批大小, 逗号分隔')
+    parser.add_argument('--max-frames', type=int, default=150, help='最多测试的帧数')
+    parser.add_argument('--repeat', type=int, default=3, help='推理以外各阶段的重复次数, 取最快一次')
+    parser.add_argument('--formats', default='csv', help='数据输出格式, 逗号分隔: csv,npz,parquet')
+    parser.add_argument('--output', default=os.path.join('data', 'bench', 'report.json'), help='报告输出路径')
+    parser.add_argument('--baseline', default=None, help='基线报告路径, 指定时对比并在退化时返回非零退出码')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='允许的 FPS 下降比例')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    video_path, fixture_path = args.video, args.fixture
+    if video_path is None:
+        name = f'synthetic_{args.width}x{args.height}_{args.fps}fps_{args.seconds:g}s_{args.persons}p.mp4'
+        video_path = os.path.join('data', 'bench', name)
+        if not os.path.exists(video_path) or KeypointCache.read(SyntheticArcher.fixture_path(video_path)) is None:
+            SyntheticArcher.write(video_path, args.width, args.height, args.fps, args.seconds, args.persons)
+        fixture_path = fixture_path or SyntheticArcher.fixture_path(video_path)
+
+    benchmark = Benchmark(
+        video_path, fixture_path,
+        model_name=args.model or None,
+        device_name=args.device,
+        backends=tuple(args.backends.split(',')),
+        batch_sizes=tuple(int(b) for b in args.batch_sizes.split(',')),
+        max_frames=args.max_frames,
+        record_formats=tuple(args.formats.split(',')),
+        repeat=args.repeat,
+    )
+    report = benchmark.run()
+    Benchmark.save(report, args.output)
+    if args.baseline:
+        rows = Benchmark.compare(report, Benchmark.load(args.baseline), args.tolerance)
+        if any(regressed for *_, regressed in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
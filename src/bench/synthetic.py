@@ -0,0 +1,118 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.core.cache import KeypointCacheWriter
+from src.core.keypoints import FrameKeypoints
+from src.core.log import logger
+
+
+class SyntheticArcher:
+    """可复现的合成射箭视频
+    按固定的动作周期 (举弓→开弓→固势→撒放→收势) 生成关键点并绘制火柴人, 相同参数生成的视频与关键点逐帧一致.
+    关键点同时按关键点缓存格式保存, 可作为姿态/动作环节基准测试的测试数据.
+    """
+
+    CYCLE = 6.0  # 动作周期 (秒)
+    UPPER_ARM = 0.09  # 上臂长度 (相对画面高度)
+
+    @classmethod
+    def arm_angle(cls, t):
+        """t 秒时的双臂姿态角, 各阶段区间与 PhaseTracker 的环节分界对应"""
+        t = t % cls.CYCLE
+        if t < 0.75:  # 举弓
+            return (350 + t * 20) % 360
+        if t < 2.5:  # 开弓
+            return 15 + (t - 0.75) / 1.75 * 133
+        if t < 4.25:  # 固势, 小幅抖动
+            return 160 + 0.5 * np.sin(t * 40)
+        if t < 5.0:  # 撒放, 角度骤增后继续张开
+            return 168 + (t - 4.25) * 40
+        return 340 + (t - 5.0) * 10  # 收势
+
+    @classmethod
+    def keypoints(cls, index, width, height, fps, persons=1):
+        """第 index 帧的关键点
+        Returns:
+            FrameKeypoints: 每人 17 个关键点, 检测框与跟踪ID
+        """
+        t = index / fps
+        arm = height * cls.UPPER_ARM
+        xy = np.zeros((persons, FrameKeypoints.NUM_KEYPOINTS, 2), np.float32)
+        for p in range(persons):
+            # 多人时错开动作相位与站位
+            angle = np.radians(cls.arm_angle(t + p * cls.CYCLE / (persons + 1)))
+            cx = width * (p + 1) / (persons + 1) + 0.01 * width * np.sin(t * 1.3 + p)
+            cy = height * 0.4
+            left_shoulder = np.array([cx - arm / 2, cy])
+            right_shoulder = np.array([cx + arm / 2, cy])
+            left_elbow = left_shoulder + arm * np.array([np.cos(angle), np.sin(angle)])
+            right_elbow = right_shoulder + [arm, 0]
+            xy[p] = [
+                [cx, cy - arm * 0.9],  # 鼻
+                [cx - arm * 0.15, cy - arm * 1.0], [cx + arm * 0.15, cy - arm * 1.0],  # 眼
+                [cx - arm * 0.3, cy - arm * 0.9], [cx + arm * 0.3, cy - arm * 0.9],  # 耳
+                left_shoulder, right_shoulder,
+                left_elbow, right_elbow,
+                left_elbow + (left_elbow - left_shoulder) * 0.9, right_elbow - [arm * 0.8, arm * 0.2],  # 腕
+                [cx - arm * 0.35, cy + arm * 2.2], [cx + arm * 0.35, cy + arm * 2.2],  # 髋
+                [cx - arm * 0.45, cy + arm * 3.3], [cx + arm * 0.45, cy + arm * 3.3],  # 膝
+                [cx - arm * 0.5, cy + arm * 4.4], [cx + arm * 0.5, cy + arm * 4.4],  # 踝
+            ]
+        boxes = np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=1)
+        return FrameKeypoints(xy, boxes=boxes, ids=np.arange(1, persons + 1), source='synthetic')
+
+    @staticmethod
+    def background(width, height, seed=0):
+        """固定随机种子的低频纹理背景"""
+        rng = np.random.default_rng(seed)
+        noise = rng.integers(40, 140, size=(max(1, height // 40), max(1, width // 40), 3), dtype=np.uint8)
+        return cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC)
+
+    @classmethod
+    def render(cls, background, keypoints):
+        """在背景上绘制火柴人"""
+        frame = background.copy()
+        thickness = max(2, frame.shape[0] // 60)
+        skeleton = ((5, 6), (5, 7), (7, 9), (6, 8), (8, 10), (5, 11), (6, 12), (11, 12), (11, 13), (13, 15), (12, 14), (14, 16))
+        for xy in keypoints.xy.astype(int):
+            for i, j in skeleton:
+                cv2.line(frame, tuple(xy[i]), tuple(xy[j]), (230, 210, 190), thickness, lineType=cv2.LINE_AA)
+            cv2.circle(frame, tuple(xy[0]), thickness * 3, (200, 180, 160), -1, lineType=cv2.LINE_AA)
+        return frame
+
+    @classmethod
+    def write(cls, video_path, width=1280, height=720, fps=30, seconds=10.0, persons=1, seed=0):
+        """生成合成视频及对应的关键点测试数据
+        Args:
+            video_path: 输出视频路径
+            width, height: 分辨率
+            fps: 帧率
+            seconds: 时长
+            persons: 人数
+            seed: 背景随机种子
+        Returns:
+            tuple: (视频路径, 关键点测试数据目录)
+        """
+        os.makedirs(os.path.dirname(video_path) or '.', exist_ok=True)
+        fixture_path = cls.fixture_path(video_path)
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        if not writer.isOpened():
+            raise RuntimeError(f"无法创建合成视频: {video_path}")
+        fixture = KeypointCacheWriter(
+            fixture_path, model='synthetic', width=width, height=height, fps=fps, persons=persons, seed=seed
+        )
+        background = cls.background(width, height, seed)
+        for index in range(round(fps * seconds)):
+            keypoints = cls.keypoints(index, width, height, fps, persons)
+            writer.write(cls.render(background, keypoints))
+            fixture.append(keypoints)
+        writer.release()
+        fixture.close()
+        logger.info(f"🎬 生成合成视频: {video_path} ({width}x{height} {fps}FPS {seconds}s)")
+        return video_path, fixture_path
+
+    @staticmethod
+    def fixture_path(video_path):
+        return video_path.rsplit('.', 1)[0] + '_keypoints'
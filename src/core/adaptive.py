@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+from src.core.keypoints import FrameKeypoints
+from src.core.phase import PhaseTracker
+from src.core.pose import Pose
+
+
+class AdaptiveSampler:
+    """自适应跳帧策略
+    低运动且远离环节分界时每 stride 帧推理一次, 其余帧由前后推理帧插值;
+    画面运动大、双臂姿态角变化快或接近环节分界 (如固势→撒放) 时回到逐帧推理.
+    """
+
+    def __init__(self, stride=4, motion_threshold=3.0, angle_delta=2.0, boundary_margin=3.0, motion_width=64):
+        """
+        Args:
+            stride: 低运动阶段的推理间隔帧数
+            motion_threshold: 缩小灰度帧间平均差值阈值 (0-255), 超过视为运动
+            angle_delta: 相邻推理帧双臂姿态角变化阈值, 超过时逐帧推理
+            boundary_margin: 双臂姿态角距环节分界小于该值时逐帧推理
+            motion_width: 运动检测使用的缩小宽度
+        """
+        self.stride = max(1, stride)
+        self.motion_threshold = motion_threshold
+        self.angle_delta = angle_delta
+        self.boundary_margin = boundary_margin
+        self.motion_width = motion_width
+        self._previous = None
+
+    def motion(self, frames):
+        """一组连续帧的最大帧间运动量 (与上一组最后一帧衔接)"""
+        score = 0.0
+        for frame in frames:
+            height = max(1, round(frame.shape[0] * self.motion_width / frame.shape[1]))
+            small = cv2.cvtColor(cv2.resize(frame, (self.motion_width, height), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+            if self._previous is not None:
+                score = max(score, float(cv2.absdiff(small, self._previous).mean()))
+            self._previous = small
+        return score
+
+    @staticmethod
+    def arm_angles(keypoints):
+        """每个人的双臂姿态角"""
+        return Pose.compute_metrics(keypoints.xy)['arm'] if len(keypoints) else np.empty(0)
+
+    def is_stable(self, previous, current):
+        """两推理帧之间是否足够平稳, 可以插值"""
+        if previous is None or len(previous) != len(current):
+            return False
+        angles = self.arm_angles(current)
+        delta = np.abs((angles - self.arm_angles(previous) + 180) % 360 - 180)
+        if (delta > self.angle_delta).any():
+            return False
+        return all(PhaseTracker.boundary_distance(angle) > self.boundary_margin for angle in angles)
+
+    @staticmethod
+    def interpolate(previous, current, count):
+        """在两推理帧之间生成 count 帧插值关键点"""
+        return [FrameKeypoints.interpolate(previous, current, (i + 1) / (count + 1)) for i in range(count)]
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+
+from src.core.keypoints import FrameKeypoints
+from src.core.log import logger
+
+
+class KeypointCache:
+    """关键点持久化缓存
+    以 (视频内容哈希, 模型, imgsz, conf) 为键, 每个视频一个目录, 每个字段一个可内存映射的 .npy 文件.
+    阈值或指标调整后重新分析时直接读取缓存, 跳过YOLO推理.
+    """
+
+    CACHE_DIR = os.path.join('data', 'cache', 'keypoints')
+    FIELDS = ('xy', 'conf', 'boxes', 'scores', 'ids', 'counts')
+
+    # 文件哈希缓存 (路径, 大小, 修改时间) → 哈希
+    _hashes = {}
+
+    @classmethod
+    def file_hash(cls, path, chunk_size=1 << 20):
+        """计算视频文件内容哈希"""
+        stat = os.stat(path)
+        memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if memo_key not in cls._hashes:
+            digest = hashlib.blake2b(digest_size=16)
+            with open(path, 'rb') as f:
+                while chunk := f.read(chunk_size):
+                    digest.update(chunk)
+            cls._hashes[memo_key] = digest.hexdigest()
+        return cls._hashes[memo_key]
+
+    @classmethod
+    def key(cls, video_path, model_name, imgsz, conf):
+        """缓存键"""
+        return f"{cls.file_hash(video_path)}_{model_name}_{imgsz}_{conf}"
+
+    @classmethod
+    def path(cls, key):
+        return os.path.join(cls.CACHE_DIR, key)
+
+    @classmethod
+    def load(cls, key):
+        """读取缓存, 未命中时返回 None
+        Returns:
+            CachedKeypoints: 内存映射的缓存数据
+        """
+        cached = cls.read(cls.path(key))
+        if cached is not None:
+            logger.info(f"📦 命中关键点缓存: {key} ({cached.meta['frames']}帧)")
+        return cached
+
+    @classmethod
+    def read(cls, path):
+        """读取缓存目录 (也可用作关键点测试数据), 目录不完整时返回 None"""
+        if not os.path.exists(os.path.join(path, 'meta.json')):
+            return None
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {field: np.load(os.path.join(path, f'{field}.npy'), mmap_mode='r') for field in cls.FIELDS}
+        return CachedKeypoints(meta, **arrays)
+
+    @classmethod
+    def writer(cls, key, **meta):
+        """创建缓存写入器"""
+        return KeypointCacheWriter(cls.path(key), key=key, **meta)
+
+
+class CachedKeypoints:
+    """整段视频的关键点数组, 形状 (frames, persons, ...), 人数不足处为NaN / -1"""
+
+    def __init__(self, meta, xy, conf, boxes, scores, ids, counts):
+        self.meta = meta
+        self.xy = xy
+        self.conf = conf
+        self.boxes = boxes
+        self.scores = scores
+        self.ids = ids
+        self.counts = counts
+
+    def __len__(self):
+        return len(self.counts)
+
+    def frame(self, index):
+        """取单帧关键点"""
+        n = int(self.counts[index])
+        return FrameKeypoints(
+            self.xy[index, :n], self.conf[index, :n], self.boxes[index, :n], self.scores[index, :n], self.ids[index, :n]
+        )
+
+
+class KeypointCacheWriter:
+    """逐帧累积关键点, 关闭时按最大人数填充并写入缓存目录"""
+
+    def __init__(self, path, **meta):
+        self.path = path
+        self.meta = meta
+        self.frames = []
+
+    def append(self, keypoints):
+        """追加一帧
+        Args:
+            keypoints: FrameKeypoints
+        """
+        self.frames.append(keypoints)
+
+    def close(self):
+        frames = len(self.frames)
+        persons = max((len(kp) for kp in self.frames), default=0)
+        k = FrameKeypoints.NUM_KEYPOINTS
+        arrays = {
+            'xy': np.full((frames, persons, k, 2), np.nan, np.float32),
+            'conf': np.full((frames, persons, k), np.nan, np.float32),
+            'boxes': np.full((frames, persons, 4), np.nan, np.float32),
+            'scores': np.full((frames, persons), np.nan, np.float32),
+            'ids': np.full((frames, persons), -1, np.int32),
+            'counts': np.zeros(frames, np.int16),
+        }
+        for i, kp in enumerate(self.frames):
+            n = len(kp)
+            arrays['xy'][i, :n] = kp.xy
+            arrays['conf'][i, :n] = kp.conf
+            arrays['boxes'][i, :n] = kp.boxes
+            arrays['scores'][i, :n] = kp.scores
+            arrays['ids'][i, :n] = kp.ids
+            arrays['counts'][i] = n
+
+        # 先写临时目录再改名, 中断时不会留下不完整的缓存
+        tmp_path = self.path + '.part'
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        for field, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{field}.npy'), array)
+        with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+            json.dump({**self.meta, 'frames': frames, 'persons': persons}, f, ensure_ascii=False)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp_path, self.path)
+        logger.info(f"📦 写入关键点缓存: {self.path}")
@@ -0,0 +1,93 @@
+from collections import deque
+
+import numpy as np
+
+from src.core.keypoints import FrameKeypoints
+from src.core.phase import PhaseTracker, TrackPhases
+from src.core.pose import Pose
+from src.core.roi import ArcherRoi
+
+
+class ModelCascade:
+    """轻量/重量模型级联策略
+    轻量模型跟踪每一帧; 双肩、双肘、双髋关键点置信度低于阈值, 双臂姿态角接近环节分界, 或固势中出现接近撒放的角度骤增,
+    以及轻量模型刚丢失目标时, 该帧交给重量模型重新推理. 重量模型的检测沿用轻量模型的跟踪ID.
+    """
+
+    GATED_KEYPOINTS = (Pose.LEFT_SHOULDER, Pose.RIGHT_SHOULDER, Pose.LEFT_ELBOW, Pose.RIGHT_ELBOW, Pose.LEFT_HIP, Pose.RIGHT_HIP)
+    CONF_THRESHOLD = 0.5
+    IOU_THRESHOLD = 0.5
+
+    def __init__(self, light_name, heavy_name, conf_threshold=CONF_THRESHOLD, boundary_margin=3.0, jump_fraction=0.5):
+        """
+        Args:
+            light_name: 轻量模型标识 (记录到数据中)
+            heavy_name: 重量模型标识
+            conf_threshold: 关键点置信度阈值, 任一人的门控关键点低于该值时升级
+            boundary_margin: 双臂姿态角距环节分界小于该值时升级
+            jump_fraction: 固势中相对前几帧均值的增量达到撒放阈值的该比例时升级
+        """
+        self.light_name = light_name
+        self.heavy_name = heavy_name
+        self.conf_threshold = conf_threshold
+        self.boundary_margin = boundary_margin
+        self.jump_threshold = PhaseTracker.RELEASE_ANGLE_THRESHOLD * jump_fraction
+        self.history = {}  # 目标ID → 最近几帧双臂姿态角
+        self.last_seen = {}  # 目标ID → 最近出现的帧计数, 按 TrackPhases.MAX_IDLE 释放长时间未出现的目标
+        self.present = False  # 上一帧轻量模型是否检出
+        self.frames = 0
+        self.escalated = 0
+
+    def needs_heavy(self, keypoints):
+        """判断一帧轻量模型结果是否需要重量模型重新推理 (须按帧顺序调用)
+        Args:
+            keypoints: 轻量模型的 FrameKeypoints
+        Returns:
+            bool: 是否升级
+        """
+        self.frames += 1
+        escalate = self._check(keypoints)
+        self.present = len(keypoints) > 0
+        self.escalated += escalate
+        if self.frames % TrackPhases.MAX_IDLE == 0:
+            for key in [k for k, seen in self.last_seen.items() if self.frames - seen > TrackPhases.MAX_IDLE]:
+                del self.history[key], self.last_seen[key]
+        return escalate
+
+    def _check(self, keypoints):
+        if not len(keypoints):
+            return self.present  # 刚丢失目标
+        low_confidence = (keypoints.conf[:, self.GATED_KEYPOINTS].min(axis=1) < self.conf_threshold).any()
+        near_boundary = False
+        angles = Pose.compute_metrics(keypoints.xy)['arm']
+        for key, angle in zip(TrackPhases.keys(keypoints.ids).tolist(), angles.tolist()):
+            history = self.history.setdefault(key, deque(maxlen=PhaseTracker.LOOKBACK))
+            if PhaseTracker.boundary_distance(angle) < self.boundary_margin:
+                near_boundary = True
+            elif len(history) == PhaseTracker.LOOKBACK and 150 <= angle < 185:
+                near_boundary |= angle - sum(history) / len(history) >= self.jump_threshold
+            history.append(angle)
+            self.last_seen[key] = self.frames
+        return bool(low_confidence or near_boundary)
+
+    def merge(self, light, heavy):
+        """重量模型结果按检测框交并比沿用轻量模型的跟踪ID; 重量模型未检出时保留轻量模型结果
+        按交并比从高到低贪心一对一匹配, 每个轻量模型ID至多分给一个重量模型检测框
+        Returns:
+            FrameKeypoints: 该帧采用的结果, source 为产出的模型
+        """
+        if not len(heavy):
+            return light
+        ids = np.full(len(heavy), -1, np.int32)
+        if len(light):
+            ious = np.stack([ArcherRoi.iou(box, light.boxes) for box in heavy.boxes])
+            used_heavy, used_light = set(), set()
+            for flat in np.argsort(ious, axis=None)[::-1]:
+                i, j = np.unravel_index(flat, ious.shape)
+                if ious[i, j] < self.IOU_THRESHOLD:
+                    break
+                if i not in used_heavy and j not in used_light:
+                    ids[i] = light.ids[j]
+                    used_heavy.add(i)
+                    used_light.add(j)
+        return FrameKeypoints(heavy.xy, heavy.conf, heavy.boxes, heavy.scores, ids, source=self.heavy_name)
@@ -0,0 +1,127 @@
+from collections import Counter
+from itertools import islice
+
+import numpy as np
+
+from src.core.cache import KeypointCache, KeypointCacheWriter
+from src.core.keypoints import FrameKeypoints
+from src.core.log import logger
+from src.core.roi import ArcherRoi
+from src.core.video import Video
+
+
+class VideoChunks:
+    """单个长视频分段并行推理
+    按帧区间切分为若干段, 每段从区间起点之前 overlap 帧开始推理, 让跟踪器先预热;
+    预热帧与上一段末尾的帧重叠, 拼接时据此把本段的跟踪ID映射为上一段的ID, 保证全片ID连续.
+    动作环节在拼接后对整段角度序列离线标注, 与逐帧顺序处理的结果一致.
+    """
+
+    MIN_CHUNK_FRAMES = 300  # 每段最少帧数, 避免预热开销占比过高
+    IOU_THRESHOLD = 0.5  # 重叠帧中检测框匹配为同一目标的最小交并比
+
+    @classmethod
+    def plan(cls, total_frames, chunks, overlap):
+        """切分帧区间
+        Args:
+            total_frames: 视频总帧数
+            chunks: 期望的段数
+            overlap: 每段的预热帧数
+        Returns:
+            list: [(预热起点, 起点, 终点)], 最后一段终点为 None 表示读到视频结束
+        """
+        count = max(1, min(chunks, total_frames // max(cls.MIN_CHUNK_FRAMES, overlap + 1)))
+        bounds = np.linspace(0, total_frames, count + 1).astype(int)
+        return [
+            (max(0, int(bounds[k]) - overlap), int(bounds[k]), int(bounds[k + 1]) if k < count - 1 else None)
+            for k in range(count)
+        ]
+
+    @staticmethod
+    def process_chunk(model, input_path, chunk_path, warm_start, start, end, batch_size=12, decode_width=0):
+        """推理一段 [预热起点, 终点) 帧, 关键点 (含预热帧) 写入分段目录
+        Args:
+            decode_width: 推理前把帧缩小到的宽度, 0 表示原尺寸
+        Returns:
+            int: 推理的帧数
+        """
+        video = Video(input_path, None, decode_width=decode_width)
+        video.seek(warm_start)
+        frames = video.process_frames_batch(model, batch_size)
+        if end is not None:
+            frames = islice(frames, end - warm_start)
+        writer = KeypointCacheWriter(chunk_path, start=start, warmup=start - warm_start)
+        try:
+            for _, result in frames:
+                writer.append(result if isinstance(result, FrameKeypoints) else FrameKeypoints.from_result(result))
+        finally:
+            video.close()
+        writer.close()
+        return len(writer.frames)
+
+    @classmethod
+    def match_ids(cls, previous, current):
+        """由重叠帧把本段跟踪ID映射到上一段ID
+        每帧按检测框交并比配对, 多帧投票后一对一分配
+        Args:
+            previous: 上一段末尾的帧 (已映射为全局ID)
+            current: 本段对应的预热帧
+        Returns:
+            dict: 本段ID → 上一段ID
+        """
+        votes = Counter()
+        for prev, cur in zip(previous, current):
+            valid = prev.ids >= 0
+            if not valid.any():
+                continue
+            boxes, ids = prev.boxes[valid], prev.ids[valid]
+            for box, track_id in zip(cur.boxes, cur.ids):
+                if track_id < 0:
+                    continue
+                ious = ArcherRoi.iou(box, boxes)
+                best = int(np.argmax(ious))
+                if ious[best] >= cls.IOU_THRESHOLD:
+                    votes[int(track_id), int(ids[best])] += 1
+        mapping, used = {}, set()
+        for (track_id, previous_id), _ in votes.most_common():
+            if track_id not in mapping and previous_id not in used:
+                mapping[track_id] = previous_id
+                used.add(previous_id)
+        return mapping
+
+    @classmethod
+    def stitch(cls, chunk_paths, writers):
+        """按顺序拼接各段关键点, 去掉预热帧并统一跟踪ID
+        Args:
+            chunk_paths: 各段关键点目录 (按帧顺序)
+            writers: 写入拼接结果的 KeypointCacheWriter 列表
+        Returns:
+            int: 拼接后的帧数
+        """
+        tail, next_id, frames = [], 1, 0
+        for k, path in enumerate(chunk_paths):
+            chunk = KeypointCache.read(path)
+            warmup = chunk.meta['warmup']
+            current = [chunk.frame(i) for i in range(len(chunk))]
+            previous = tail[-warmup:] if warmup else []
+            # 预热帧的最后一帧与上一段的最后一帧对齐
+            mapping = cls.match_ids(previous, current[warmup - len(previous):warmup])
+            if k:
+                logger.info(f"🧵 拼接第{k + 1}段: 起点 {chunk.meta['start']} | 沿用跟踪ID {len(mapping)} 个")
+            tail = []
+            for kp in current[warmup:]:
+                ids = kp.ids.copy()
+                for i, track_id in enumerate(ids):
+                    if track_id < 0:
+                        continue
+                    if track_id not in mapping:
+                        # 本段新出现的目标分配新的全局ID
+                        mapping[track_id] = next_id
+                    ids[i] = mapping[track_id]
+                    next_id = max(next_id, ids[i] + 1)
+                kp = FrameKeypoints(kp.xy, kp.conf, kp.boxes, kp.scores, ids)
+                for writer in writers:
+                    writer.append(kp)
+                tail.append(kp)
+            frames += len(tail)
+        return frames
@@ -1,9 +1,21 @@
-import torch
 from src.core.log import logger
 
 class Device:
+    # 已解析的设备名 → 设备, 每个进程只探测一次
+    _resolved = {}
+
     @classmethod
     def get_device(cls, device_name='auto'):
+        device = cls._resolved.get(device_name)
+        if device is None:
+            device = cls._resolved[device_name] = cls.probe(device_name)
+        return device
+
+    @staticmethod
+    def probe(device_name='auto'):
+        """探测可用的加速设备 (导入 torch)"""
+        import torch
+
         logger.info(f"🚀 使用MAC mps加速: {torch.mps.is_available()}")
         if device_name == 'auto':
             # 自动选择最佳设备
@@ -0,0 +1,256 @@
+import os
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+
+class FrameReader:
+    """常驻的随机帧读取器
+    每个视频保持一个打开的 VideoCapture, 打开时扫描一次数据包 (不解码) 建立关键帧索引.
+    目标帧在当前解码位置之后时比较两种代价: 顺序解码前进, 或直接定位 (解码器从目标之前最近的关键帧解码到目标,
+    另加约一个关键帧间隔的定位开销); 取解码帧数较少者.
+    解码结果 (可缩放) 放入按内存上限淘汰的 LRU 缓存. 可选从缩略图条读取预览帧, 不经过解码器.
+    """
+
+    MAX_READERS = 4
+    CACHE_BYTES = 256 << 20
+
+    # 已打开的读取器 (路径, 大小, 修改时间) → FrameReader
+    _readers = OrderedDict()
+    _readers_lock = threading.Lock()
+
+    def __init__(self, path, max_width=None, cache_bytes=CACHE_BYTES, forward_limit=None, use_thumbnails=False):
+        """
+        Args:
+            path: 视频路径
+            max_width: 缓存帧的最大宽度, 超过时等比缩小; 为空时保留原尺寸
+            cache_bytes: LRU 缓存内存上限
+            forward_limit: 无法建立关键帧索引时顺序解码前进的最大帧数, 默认约两秒 (常见关键帧间隔)
+            use_thumbnails: 存在缩略图条时读取缩略图 (低分辨率预览)
+        """
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        self.total_frames = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = self.capture.get(cv2.CAP_PROP_FPS) or 30
+        self.forward_limit = forward_limit if forward_limit is not None else int(fps * 2)
+        self.max_width = max_width
+        self.position = 0  # 下一次 read 将解码的帧号
+        self.keyframes = self.keyframe_index(path)
+        # 定位本身的代价 (帧数): 约为一个关键帧间隔
+        self.seek_cost = int(np.median(np.diff(self.keyframes))) if len(self.keyframes) > 1 else self.forward_limit
+        self.thumbnails = ThumbnailStrip.open(path) if use_thumbnails else None
+        self.cache = OrderedDict()
+        self.cache_bytes = cache_bytes
+        self.cached_bytes = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def keyframe_index(path):
+        """扫描容器中的数据包 (不解码) 得到关键帧号
+        Returns:
+            ndarray: 升序的关键帧号, 后端不支持读取数据包时为空
+        """
+        capture = cv2.VideoCapture(path)
+        try:
+            if not capture.set(cv2.CAP_PROP_FORMAT, -1):
+                return np.zeros(0, np.int64)
+            keyframes = []
+            index = 0
+            while capture.grab():
+                if capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME):
+                    keyframes.append(index)
+                index += 1
+            return np.asarray(keyframes, np.int64)
+        finally:
+            capture.release()
+
+    def keyframe_before(self, frame_number):
+        """目标帧之前 (含) 最近的关键帧号, 没有索引时返回 None"""
+        index = np.searchsorted(self.keyframes, frame_number, side='right') - 1
+        return int(self.keyframes[index]) if index >= 0 else None
+
+    @classmethod
+    def open(cls, path, **kwargs):
+        """获取视频对应的常驻读取器, 文件被覆盖后自动重新打开"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns, tuple(sorted(kwargs.items())))
+        with cls._readers_lock:
+            reader = cls._readers.pop(key, None) or cls(path, **kwargs)
+            cls._readers[key] = reader
+            while len(cls._readers) > cls.MAX_READERS:
+                cls._readers.popitem(last=False)[1].close()
+        return reader
+
+    def close(self):
+        with self.lock:
+            self.capture.release()
+            if self.thumbnails is not None:
+                self.thumbnails.file.close()
+            self.cache.clear()
+            self.cached_bytes = 0
+
+    def read(self, frame_number):
+        """读取指定帧
+        Returns:
+            ndarray: RGB 格式的帧 (只读), 读取失败时返回 None
+        """
+        with self.lock:
+            frame = self.cache.get(frame_number)
+            if frame is not None:
+                self.cache.move_to_end(frame_number)
+                return frame
+            if self.thumbnails is not None:
+                frame = self.thumbnails.read(frame_number)
+            if frame is None:
+                frame = self._decode(frame_number)
+            if frame is not None:
+                frame.flags.writeable = False
+                self._cache_put(frame_number, frame)
+            return frame
+
+    def _decode(self, frame_number):
+        if frame_number < 0:
+            return None
+        keyframe = self.keyframe_before(frame_number)
+        if keyframe is not None:
+            # 向后, 或顺序前进要解码的帧多于从前一个关键帧解码时才重新定位
+            if frame_number < self.position or frame_number - self.position > frame_number - keyframe + self.seek_cost:
+                self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+                self.position = frame_number
+        elif frame_number < self.position or frame_number - self.position > self.forward_limit:
+            # 没有关键帧索引: 向后或跳跃过远时才重新定位, 其余情况顺序解码前进
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            self.position = frame_number
+        while self.position < frame_number:
+            if not self.capture.grab():
+                return None
+            self.position += 1
+        success, frame = self.capture.read()
+        if not success:
+            return None
+        self.position += 1
+        if self.max_width and frame.shape[1] > self.max_width:
+            height = round(frame.shape[0] * self.max_width / frame.shape[1])
+            frame = cv2.resize(frame, (self.max_width, height), interpolation=cv2.INTER_AREA)
+        # 原地转换为RGB格式, 避免额外拷贝
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+
+    def _cache_put(self, frame_number, frame):
+        if frame.nbytes > self.cache_bytes:
+            return
+        self.cache[frame_number] = frame
+        self.cached_bytes += frame.nbytes
+        while self.cached_bytes > self.cache_bytes:
+            _, evicted = self.cache.popitem(last=False)
+            self.cached_bytes -= evicted.nbytes
+
+
+class FramePool:
+    """固定大小的批帧缓冲环
+    每批帧解码进一块预分配的连续数组 (batch, H, W, 3), 不再逐帧分配新数组.
+    缓冲按取出顺序轮转: 第 n 次取出的缓冲在第 n + depth 次取出时被覆盖. depth 由调用方按流水线中
+    同时在用的最大批数 (队列中、推理中、标注中) 确定, 保证在用的批不会被覆盖.
+    """
+
+    def __init__(self, batch_size, frame_shape, depth=1):
+        """
+        Args:
+            batch_size: 每块缓冲的帧数
+            frame_shape: 单帧形状 (H, W, 3)
+            depth: 缓冲块数, 即同时在用的最大批数
+        """
+        self.shape = (batch_size, *frame_shape)
+        self.depth = max(1, depth)
+        self.buffers = []
+        self.acquired = 0
+
+    def __len__(self):
+        return len(self.buffers)
+
+    @property
+    def nbytes(self):
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+    def acquire(self):
+        """按顺序取出下一块缓冲, 未满 depth 块时新分配
+        Returns:
+            ndarray: (batch, H, W, 3) uint8 缓冲, 内容未初始化 (可能是 depth 次之前取出的缓冲)
+        """
+        index = self.acquired % self.depth
+        self.acquired += 1
+        if index == len(self.buffers):
+            self.buffers.append(np.empty(self.shape, np.uint8))
+        return self.buffers[index]
+
+
+class ThumbnailStrip:
+    """逐帧JPEG缩略图条
+    处理时随输出视频一同写入 (<视频名>_thumbs.bin 与偏移索引 <视频名>_thumbs.npy), 拖动进度条时无需解码视频.
+    """
+
+    QUALITY = 80
+
+    def __init__(self, data_path, offsets):
+        self.data_path = data_path
+        self.offsets = offsets
+        self.file = open(data_path, 'rb')
+
+    @staticmethod
+    def paths(video_path):
+        base = video_path.rsplit('.', 1)[0]
+        return base + '_thumbs.bin', base + '_thumbs.npy'
+
+    @classmethod
+    def open(cls, video_path):
+        """打开视频对应的缩略图条, 不存在或早于视频时返回 None"""
+        data_path, index_path = cls.paths(video_path)
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(video_path):
+            return None
+        return cls(data_path, np.load(index_path, mmap_mode='r'))
+
+    @classmethod
+    def writer(cls, video_path, width):
+        return ThumbnailWriter(*cls.paths(video_path), width)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def read(self, frame_number):
+        """读取指定帧的缩略图 (RGB), 超出范围时返回 None"""
+        if not 0 <= frame_number < len(self):
+            return None
+        start, end = int(self.offsets[frame_number]), int(self.offsets[frame_number + 1])
+        self.file.seek(start)
+        frame = cv2.imdecode(np.frombuffer(self.file.read(end - start), np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            return None
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+
+
+class ThumbnailWriter:
+    """逐帧写入缩略图条, 关闭时写出偏移索引"""
+
+    def __init__(self, data_path, index_path, width):
+        self.data_path = data_path
+        self.index_path = index_path
+        self.width = width
+        self.offsets = [0]
+        self.file = open(data_path + '.part', 'wb')
+
+    def write(self, frame):
+        """写入一帧 (BGR)"""
+        height = round(frame.shape[0] * self.width / frame.shape[1])
+        thumbnail = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        success, data = cv2.imencode('.jpg', thumbnail, (cv2.IMWRITE_JPEG_QUALITY, ThumbnailStrip.QUALITY))
+        if success:
+            self.file.write(data.tobytes())
+        self.offsets.append(self.file.tell())
+
+    def close(self):
+        self.file.close()
+        os.replace(self.data_path + '.part', self.data_path)
+        with open(self.index_path + '.part', 'wb') as f:
+            np.save(f, np.asarray(self.offsets, dtype=np.int64))
+        os.replace(self.index_path + '.part', self.index_path)
@@ -0,0 +1,127 @@
+import numpy as np
+
+
+class FrameKeypoints:
+    """单帧关键点数据 (主机内存), 可由YOLO结果转换或从缓存中读取"""
+
+    NUM_KEYPOINTS = 17
+
+    def __init__(self, xy, conf=None, boxes=None, scores=None, ids=None, source=None):
+        """
+        Args:
+            xy: 关键点坐标 (persons, 17, 2)
+            conf: 关键点置信度 (persons, 17)
+            boxes: 检测框 xyxy (persons, 4)
+            scores: 检测框置信度 (persons,)
+            ids: 跟踪ID (persons,), 无跟踪ID时为 -1
+            source: 数据来源, 如模型名或 'interpolated'
+        """
+        persons = len(xy)
+        self.xy = np.asarray(xy, dtype=np.float32).reshape(persons, self.NUM_KEYPOINTS, 2)
+        self.conf = np.ones((persons, self.NUM_KEYPOINTS), np.float32) if conf is None else np.asarray(conf, np.float32)
+        self.boxes = np.zeros((persons, 4), np.float32) if boxes is None else np.asarray(boxes, np.float32)
+        self.scores = np.ones(persons, np.float32) if scores is None else np.asarray(scores, np.float32)
+        self.ids = np.full(persons, -1, np.int32) if ids is None else np.asarray(ids, np.int32)
+        self.source = source
+
+    def __len__(self):
+        return len(self.xy)
+
+    @classmethod
+    def empty(cls, source=None):
+        return cls(np.zeros((0, cls.NUM_KEYPOINTS, 2), np.float32), source=source)
+
+    @classmethod
+    def from_result(cls, result, source=None):
+        """由YOLO结果转换"""
+        keypoints = result.keypoints
+        if keypoints is None or keypoints.xy.ndim != 3 or keypoints.xy.shape[1] < cls.NUM_KEYPOINTS:
+            return cls.empty(source)
+        boxes = result.boxes
+        return cls(
+            keypoints.xy[:, :cls.NUM_KEYPOINTS].cpu().numpy(),
+            conf=keypoints.conf[:, :cls.NUM_KEYPOINTS].cpu().numpy() if keypoints.conf is not None else None,
+            boxes=boxes.xyxy.cpu().numpy() if boxes is not None else None,
+            scores=boxes.conf.cpu().numpy() if boxes is not None else None,
+            ids=boxes.id.int().cpu().numpy() if boxes is not None and boxes.id is not None else None,
+            source=source,
+        )
+
+    @classmethod
+    def from_results(cls, results, source=None):
+        """由一批YOLO结果转换
+        整批的关键点、置信度、检测框与跟踪ID先在设备上拼接为一个张量, 只做一次设备→主机拷贝;
+        已是 FrameKeypoints 的结果原样返回
+        Returns:
+            list: 每帧一个 FrameKeypoints
+        """
+        rows, counts = [], []
+        for result in results:
+            if isinstance(result, FrameKeypoints):
+                rows.append(result)
+                continue
+            keypoints, boxes = result.keypoints, result.boxes
+            if keypoints is None or keypoints.xy.ndim != 3 or keypoints.xy.shape[1] < cls.NUM_KEYPOINTS:
+                rows.append(cls.empty(source))
+                continue
+            xy = keypoints.xy[:, :cls.NUM_KEYPOINTS]
+            n = len(xy)
+            # 每人一行: xy (34) | conf (17) | xyxy (4) | score (1) | id (1)
+            row = xy.new_zeros((n, cls.NUM_KEYPOINTS * 3 + 6))
+            row[:, :cls.NUM_KEYPOINTS * 2] = xy.reshape(n, cls.NUM_KEYPOINTS * 2)
+            row[:, cls.NUM_KEYPOINTS * 2:cls.NUM_KEYPOINTS * 3] = keypoints.conf[:, :cls.NUM_KEYPOINTS] if keypoints.conf is not None else 1
+            if boxes is not None:
+                row[:, -6:-2] = boxes.xyxy
+                row[:, -2] = boxes.conf
+            row[:, -1] = boxes.id if boxes is not None and boxes.id is not None else -1
+            rows.append(row)
+            counts.append(n)
+        if not counts:
+            return rows
+        import torch
+
+        stacked = torch.cat([row for row in rows if not isinstance(row, FrameKeypoints)]).cpu().numpy()
+        offsets = np.cumsum([0] + counts)
+        tensors = iter(np.split(stacked, offsets[1:-1]))
+        k = cls.NUM_KEYPOINTS
+        for i, row in enumerate(rows):
+            if not isinstance(row, FrameKeypoints):
+                data = next(tensors)
+                rows[i] = cls(data[:, :k * 2], data[:, k * 2:k * 3], data[:, -6:-2], data[:, -2], data[:, -1].astype(np.int32), source)
+        return rows
+
+    def shifted(self, dx, dy, scale=1.0, source=None):
+        """坐标缩放后平移 (如裁剪区域坐标映射回整帧), 未检出的 (0, 0) 关键点保持不变"""
+        visible = (self.xy > 0).any(axis=-1, keepdims=True)
+        offset = np.array([dx, dy], np.float32)
+        return FrameKeypoints(
+            np.where(visible, self.xy * scale + offset, 0),
+            conf=self.conf,
+            boxes=self.boxes * scale + np.tile(offset, 2),
+            scores=self.scores,
+            ids=self.ids,
+            source=source or self.source,
+        )
+
+    def select(self, index):
+        """取出指定人的关键点"""
+        index = np.atleast_1d(index)
+        return FrameKeypoints(
+            self.xy[index], self.conf[index], self.boxes[index], self.scores[index], self.ids[index], self.source
+        )
+
+    @classmethod
+    def interpolate(cls, start, end, t):
+        """两帧关键点之间线性插值, 人数须一致
+        Args:
+            start, end: FrameKeypoints
+            t: 插值比例 (0-1)
+        """
+        return cls(
+            start.xy + (end.xy - start.xy) * t,
+            conf=np.minimum(start.conf, end.conf),
+            boxes=start.boxes + (end.boxes - start.boxes) * t,
+            scores=np.minimum(start.scores, end.scores),
+            ids=start.ids,
+            source='interpolated',
+        )
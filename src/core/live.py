@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from src.core.keypoints import FrameKeypoints
+from src.core.log import logger
+from src.core.metrics import Histogram, Metrics
+from src.core.phase import PhaseTracker
+from src.core.pose import Pose
+from src.core.video import Video
+
+
+class LatestFrameGrabber:
+    """实时取帧
+    后台线程持续读取摄像头/视频流, 只保留最新一帧, 未被取走就被新帧覆盖的旧帧计为丢弃.
+    输入为本地文件时按视频帧率实时播放, 用于本地模拟摄像头.
+    """
+
+    def __init__(self, source, realtime=True):
+        """
+        Args:
+            source: 摄像头序号、视频流地址或本地视频文件
+            realtime: 本地文件是否按帧率实时播放, 否则尽快读取 (仍只保留最新帧)
+        """
+        self.source = int(source) if str(source).isdigit() else source
+        self.is_file = isinstance(self.source, str) and os.path.isfile(self.source)
+        self.capture = cv2.VideoCapture(self.source)
+        if not self.capture.isOpened():
+            raise RuntimeError(f"无法打开输入: {source}")
+        if not self.is_file:
+            self.capture.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # 减少驱动内部缓存的旧帧
+        self.fps = self.capture.get(cv2.CAP_PROP_FPS) or 30
+        self.realtime = realtime and self.is_file
+        self.frame_size = (int(self.capture.get(3)), int(self.capture.get(4)))
+        self.captured = 0
+        self.dropped = 0
+        self.finished = False
+        self._latest = None  # (帧号, 帧, 采集时刻)
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='grabber', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        start = time.monotonic()
+        index = 0
+        try:
+            while not self._stop.is_set():
+                success, frame = self.capture.read()
+                if not success:
+                    break
+                if self.realtime:
+                    # 按帧率播放, 以该帧的预定显示时刻作为采集时刻
+                    captured_at = start + index / self.fps
+                    delay = captured_at - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    captured_at = time.monotonic()
+                with self._condition:
+                    if self._latest is not None:
+                        self.dropped += 1
+                    self._latest = (index, frame, captured_at)
+                    self.captured += 1
+                    self._condition.notify()
+                index += 1
+        finally:
+            with self._condition:
+                self.finished = True
+                self._condition.notify_all()
+
+    def get(self, timeout=1.0):
+        """取走最新一帧, 没有新帧时等待
+        Returns:
+            tuple: (帧号, 帧, 采集时刻), 输入结束或超时返回 None
+        """
+        with self._condition:
+            if self._latest is None and not self.finished:
+                self._condition.wait(timeout)
+            latest, self._latest = self._latest, None
+            return latest
+
+    def close(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.capture.release()
+
+
+class LiveAnalyzer:
+    """实时姿态分析
+    始终对最新一帧以批大小1推理 (推理期间到达的旧帧直接丢弃), 逐帧给出双臂姿态角、脊柱倾角与动作环节,
+    并统计从采集到出结果的端到端延迟.
+    """
+
+    # 延迟分位数统计的滚动窗口 (帧), 长时间运行时内存有界
+    LATENCY_WINDOW = 4096
+
+    def __init__(self, model, source, latency_budget=0.1, realtime=True, annotate=False):
+        """
+        Args:
+            model: 已加载的YOLO模型实例
+            source: 摄像头序号、视频流地址或本地视频文件
+            latency_budget: 端到端延迟预算 (秒), 超出的结果会被标记并计数
+            realtime: 本地文件是否按帧率实时播放
+            annotate: 是否在结果帧上绘制骨架与文本
+        """
+        self.model = model
+        self.source = source
+        self.latency_budget = latency_budget
+        self.realtime = realtime
+        self.annotate = annotate
+        self.tracker = PhaseTracker()
+        self.latency = Histogram(self.LATENCY_WINDOW)
+        self.over_budget = 0
+        self._grabber = None
+        self._stop = threading.Event()
+
+    def warmup(self, frame_size, runs=3):
+        """用空白帧预热模型, 避免首帧承担初始化开销"""
+        blank = np.zeros((frame_size[1], frame_size[0], 3), np.uint8)
+        for _ in range(runs):
+            Video.track(self.model, [blank])
+
+    def results(self, max_frames=None):
+        """逐帧产出分析结果
+        Args:
+            max_frames: 最多分析的帧数, 为空时直到输入结束或 stop
+        Yields:
+            tuple: (结果字典, 帧) 结果含帧号、角度、动作环节、延迟 (毫秒) 与累计丢帧数
+        """
+        self._stop.clear()
+        self.tracker.reset()
+        self.latency = Histogram(self.LATENCY_WINDOW)
+        self.over_budget = 0
+        grabber = self._grabber = LatestFrameGrabber(self.source, self.realtime)
+        analyzed = 0
+        try:
+            self.warmup(grabber.frame_size)
+            # 常驻模型的跟踪器可能留有上一会话 (及预热) 的轨迹
+            Video.reset_tracker(self.model)
+            grabber.start()
+            while not self._stop.is_set() and (max_frames is None or analyzed < max_frames):
+                latest = grabber.get()
+                if latest is None:
+                    if grabber.finished:
+                        break
+                    continue
+                index, frame, captured_at = latest
+                keypoints = FrameKeypoints.from_results(Video.track(self.model, [frame]))[0]
+                metrics = Pose.compute_metrics(keypoints.xy)
+                arm_angle, spine_angle, action_state = Pose.judge_persons(metrics['arm'], metrics['spine'], self.tracker)
+                if self.annotate:
+                    frame = Video.draw_texts(Pose.draw_skeleton(frame.copy(), keypoints.xy, keypoints.conf), (
+                        f"Arm Angle: {arm_angle:.2f} deg",
+                        f"Spine Tilt: {spine_angle:.2f} deg",
+                        f"Technical process: {action_state.value}"
+                    ))
+                latency = time.monotonic() - captured_at
+                self.latency.add(latency)
+                self.over_budget += latency > self.latency_budget
+                Metrics.observe('live_latency_seconds', latency)
+                Metrics.gauge('live_dropped_frames', grabber.dropped)
+                analyzed += 1
+                yield {
+                    'frame': index, 'persons': len(keypoints),
+                    'arm_angle': round(arm_angle, 2), 'spine_angle': round(spine_angle, 2), 'phase': action_state.value,
+                    'latency_ms': round(latency * 1000, 1), 'over_budget': latency > self.latency_budget,
+                    'dropped': grabber.dropped,
+                }, frame
+        finally:
+            grabber.close()
+
+    def run(self, callback=None, max_frames=None):
+        """运行实时分析, 每帧结果交给回调
+        Args:
+            callback: 回调函数 callback(result, frame)
+            max_frames: 最多分析的帧数
+        Returns:
+            dict: 延迟统计摘要
+        """
+        for result, frame in self.results(max_frames):
+            if callback:
+                callback(result, frame)
+            if self.latency.count % 30 == 0:
+                logger.info(
+                    f"⏱️ 实时: 帧 {result['frame']} | {result['phase']} | 双臂 {result['arm_angle']:.1f}° | "
+                    f"延迟 {result['latency_ms']:.0f}ms | 丢帧 {result['dropped']}"
+                )
+        summary = self.summary()
+        logger.info(
+            f"✅ 实时分析结束: 分析 {summary['analyzed']}帧 | 丢帧 {summary['dropped']} | "
+            f"延迟 p50 {summary['p50_ms']:.0f}ms p95 {summary['p95_ms']:.0f}ms p99 {summary['p99_ms']:.0f}ms | "
+            f"超出预算 {summary['over_budget']}帧"
+        )
+        return summary
+
+    def stop(self):
+        self._stop.set()
+
+    def summary(self):
+        """端到端延迟统计, 分位数取最近 LATENCY_WINDOW 帧"""
+        p50, p95, p99 = (q * 1000 for q in self.latency.quantiles((0.5, 0.95, 0.99)))
+        grabber = self._grabber
+        return {
+            'analyzed': self.latency.count, 'captured': grabber.captured if grabber else 0,
+            'dropped': grabber.dropped if grabber else 0, 'over_budget': int(self.over_budget),
+            'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+        }
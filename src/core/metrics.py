@@ -0,0 +1,252 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from src.core.log import logger
+
+
+class _NullSpan:
+    """指标关闭时复用的空计时区间"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """单调时钟计时区间, 退出时记入直方图"""
+    __slots__ = ('key', 'start')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        Metrics.record(self.key, time.perf_counter() - self.start)
+        return False
+
+
+class Histogram:
+    """滚动窗口耗时分布, 保留最近 window 个样本计算分位数, 计数与总和为累计值"""
+
+    def __init__(self, window):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.samples.append(value)
+        self.count += 1
+        self.sum += value
+
+    def quantiles(self, qs):
+        if not self.samples:
+            return [0.0] * len(qs)
+        return [float(v) for v in np.quantile(np.fromiter(self.samples, np.float64), qs)]
+
+
+class Metrics:
+    """进程内指标
+    各阶段耗时 (span, 单调时钟) 记入滚动直方图, 另有队列深度等瞬时值 (gauge) 与累计计数 (counter).
+    默认关闭, 关闭时 span 返回共享的空区间, 其余记录方法直接返回, 热路径开销可忽略.
+    快照可导出为 JSON 或 Prometheus 文本, 并可在本地 HTTP 端口提供.
+    """
+
+    PREFIX = 'archery'
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    enabled = False
+    window = 4096
+    _histograms = {}
+    _gauges = {}
+    _counters = {}
+    _lock = threading.Lock()
+    _server = None
+
+    @classmethod
+    def enable(cls, window=4096):
+        """开启指标采集
+        Args:
+            window: 每个直方图保留的最近样本数
+        """
+        cls.window = window
+        cls.enabled = True
+
+    @classmethod
+    def disable(cls):
+        cls.enabled = False
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._histograms.clear()
+            cls._gauges.clear()
+            cls._counters.clear()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    @classmethod
+    def span(cls, stage, **labels):
+        """阶段计时区间, 用法: with Metrics.span('decode'): ...
+        记入 stage_seconds{stage=...} 直方图
+        """
+        if not cls.enabled:
+            return _NULL_SPAN
+        return _Span(cls._key('stage_seconds', {'stage': stage, **labels}))
+
+    @classmethod
+    def observe(cls, name, value, **labels):
+        """向直方图记录一个样本"""
+        if cls.enabled:
+            cls.record(cls._key(name, labels), value)
+
+    @classmethod
+    def record(cls, key, value):
+        with cls._lock:
+            histogram = cls._histograms.get(key)
+            if histogram is None:
+                histogram = cls._histograms[key] = Histogram(cls.window)
+            histogram.add(value)
+
+    @classmethod
+    def gauge(cls, name, value, **labels):
+        """记录瞬时值, 如队列深度"""
+        if cls.enabled:
+            cls._gauges[cls._key(name, labels)] = value
+
+    @classmethod
+    def count(cls, name, value=1, **labels):
+        """累加计数"""
+        if cls.enabled:
+            key = cls._key(name, labels)
+            with cls._lock:
+                cls._counters[key] = cls._counters.get(key, 0) + value
+
+    @classmethod
+    def snapshot(cls):
+        """当前全部指标
+        Returns:
+            dict: histograms / gauges / counters, 每项含 name、labels 与取值
+        """
+        with cls._lock:
+            histograms = [
+                {'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.sum,
+                 **{f'p{round(q * 100)}': v for q, v in zip(cls.QUANTILES, h.quantiles(cls.QUANTILES))}}
+                for (name, labels), h in cls._histograms.items()
+            ]
+            gauges = [{'name': name, 'labels': dict(labels), 'value': v} for (name, labels), v in cls._gauges.items()]
+            counters = [{'name': name, 'labels': dict(labels), 'value': v} for (name, labels), v in cls._counters.items()]
+        return {'time': time.time(), 'pid': os.getpid(), 'histograms': histograms, 'gauges': gauges, 'counters': counters}
+
+    @classmethod
+    def prometheus(cls):
+        """Prometheus 文本格式的指标快照, 直方图以 summary 类型输出"""
+        def labels_text(labels):
+            return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}' if labels else ''
+
+        snapshot = cls.snapshot()
+        lines, typed = [], set()
+        for h in snapshot['histograms']:
+            name = f"{cls.PREFIX}_{h['name']}"
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} summary')
+            for q in cls.QUANTILES:
+                lines.append(f"{name}{labels_text({**h['labels'], 'quantile': q})} {h[f'p{round(q * 100)}']:.6g}")
+            lines.append(f"{name}_sum{labels_text(h['labels'])} {h['sum']:.6g}")
+            lines.append(f"{name}_count{labels_text(h['labels'])} {h['count']}")
+        for kind in ('gauges', 'counters'):
+            for item in snapshot[kind]:
+                name = f"{cls.PREFIX}_{item['name']}"
+                if name not in typed:
+                    typed.add(name)
+                    lines.append(f"# TYPE {name} {'gauge' if kind == 'gauges' else 'counter'}")
+                lines.append(f"{name}{labels_text(item['labels'])} {item['value']:.6g}")
+        return '\n'.join(lines) + '\n'
+
+    @classmethod
+    def write(cls, path):
+        """写出指标快照, .prom / .txt 后缀为 Prometheus 文本, 其余为 JSON"""
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = path + '.part'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            if path.endswith(('.prom', '.txt')):
+                f.write(cls.prometheus())
+            else:
+                json.dump(cls.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def serve(cls, port, host='127.0.0.1'):
+        """在后台线程中提供 HTTP 指标端点: /metrics (Prometheus 文本), /metrics.json (JSON)"""
+        if cls._server is not None:
+            return cls._server
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics':
+                    body, content_type = Metrics.prometheus(), 'text/plain; version=0.0.4'
+                elif self.path == '/metrics.json':
+                    body, content_type = json.dumps(Metrics.snapshot(), ensure_ascii=False), 'application/json'
+                else:
+                    self.send_error(404)
+                    return
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        cls._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=cls._server.serve_forever, name='metrics', daemon=True).start()
+        logger.info(f"📈 指标端点: http://{host}:{cls._server.server_port}/metrics")
+        return cls._server
+
+
+def instrument(f):
+    """帧生成器装饰器: 单调时钟计时, 累计帧数, 每30帧输出一次进度"""
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        start_time = time.monotonic()
+        processed = 0
+        video_instance = args[0]  # Video实例是第一个参数
+        total = max(video_instance.total_frames, 1)
+        for frame, result in f(*args, **kwargs):
+            yield frame, result
+            processed += 1
+            Metrics.count('frames_total', mode=f.__name__)
+            # 进度日志
+            if processed % 30 == 0:  # 每30帧输出一次进度
+                elapsed = time.monotonic() - start_time
+                fps_log = processed / elapsed if elapsed > 0 else 0
+                remain = (video_instance.total_frames - processed) / fps_log if fps_log > 0 else 0
+                Metrics.gauge('fps', fps_log, mode=f.__name__)
+                logger.info(
+                    f"⏳ 进度: {processed}/{video_instance.total_frames} "
+                    f"({processed / total:.0%}) | "
+                    f"耗时: {elapsed:.1f}s | "
+                    f"剩余: {remain:.1f}s"
+                )
+
+    return wrapper
@@ -1,14 +1,38 @@
+import importlib.util
 import os
+import shutil
 
-from ultralytics import YOLO
+import cv2
+import numpy as np
 
 from src.core.log import logger
+from src.core.video import Video
+
+class Model:
+    MODEL_DIR = os.path.join('data', 'models')
+    BACKENDS = ('torch', 'onnx', 'openvino')
+    # 非 torch 后端的可选依赖 (pyproject 中同名 extra), INT8 量化另需的依赖
+    BACKEND_REQUIREMENTS = {'onnx': ('onnx', 'onnxruntime'), 'openvino': ('openvino',)}
+    INT8_REQUIREMENTS = {'openvino': ('nncf',)}
 
-class Model: 
     @classmethod
-    def get_model(cls, model_name='yolo11x-pose'):
+    def get_model(cls, model_name='yolo11x-pose', backend='torch', int8=False, calibration_source=None):
+        """加载模型
+        Args:
+            model_name: 模型名称
+            backend: 推理后端 torch / onnx / openvino, 非 torch 后端首次使用时导出并缓存到 data/models
+            int8: 是否使用INT8量化 (仅 onnx / openvino)
+            calibration_source: INT8校准用的视频路径, 为空时 openvino 使用 ultralytics 默认校准数据, onnx 使用动态量化
+        """
+        from ultralytics import YOLO
+
+        cls.check_backend(backend, int8)
         # 初始化模型
-        model_path = f'data/models/{model_name}.pt'
+        model_path = os.path.join(cls.MODEL_DIR, f'{model_name}.pt')
+        exported_path = cls.export_path(model_name, backend, int8)
+        if exported_path and os.path.exists(exported_path):
+            logger.info(f"📂 使用已导出的 {os.path.basename(exported_path)} 模型")
+            return YOLO(exported_path, task='pose')
         # 如果本地没有模型文件,则下载
         if not os.path.exists(model_path):
             logger.info(f"⏬ 下载 {model_name} 模型...")
@@ -19,4 +43,122 @@ class Model:
         else:
             logger.info(f"📂 使用本地 {model_name} 模型")
             model = YOLO(model_path)
-        return model
\ No newline at end of file
+        if backend == 'torch':
+            return model
+        return YOLO(cls.export(model, model_path, backend, int8, calibration_source), task='pose')
+
+    @classmethod
+    def check_backend(cls, backend, int8=False):
+        """检查推理后端的可选依赖是否已安装
+        Raises:
+            ImportError: 缺少依赖时给出对应的 extra 安装命令
+        """
+        modules = cls.BACKEND_REQUIREMENTS.get(backend, ()) + (cls.INT8_REQUIREMENTS.get(backend, ()) if int8 else ())
+        missing = [module for module in modules if importlib.util.find_spec(module) is None]
+        if missing:
+            raise ImportError(f"推理后端 {backend}{' (INT8)' if int8 else ''} 缺少依赖 {', '.join(missing)}, "
+                              f"请安装: pip install 'archery_vision[{backend}]'")
+
+    @staticmethod
+    def label(model_name, backend='torch', int8=False):
+        """模型标识, 区分后端与量化方式 (用于缓存键等)"""
+        if backend == 'torch':
+            return model_name
+        return f"{model_name}-{backend}{'-int8' if int8 else ''}"
+
+    @classmethod
+    def export_path(cls, model_name, backend, int8=False):
+        """导出模型的缓存路径, torch 后端返回 None"""
+        if backend not in cls.BACKENDS:
+            raise ValueError(f"不支持的推理后端: {backend}")
+        suffix = '_int8' if int8 else ''
+        if backend == 'onnx':
+            return os.path.join(cls.MODEL_DIR, f'{model_name}{suffix}.onnx')
+        if backend == 'openvino':
+            return os.path.join(cls.MODEL_DIR, f'{model_name}{suffix}_openvino_model')
+        return None
+
+    @classmethod
+    def export(cls, model, model_path, backend, int8=False, calibration_source=None):
+        """导出模型到指定后端并缓存, 返回导出路径"""
+        model_name = os.path.splitext(os.path.basename(model_path))[0]
+        target = cls.export_path(model_name, backend, int8)
+        logger.info(f"📦 导出 {model_name} 模型到 {backend}{' (INT8)' if int8 else ''}...")
+        if backend == 'openvino':
+            data = cls.calibration_dataset(calibration_source) if int8 and calibration_source else None
+            exported = model.export(format='openvino', imgsz=Video.IMGSZ, dynamic=True, int8=int8, data=data, verbose=False)
+        else:
+            exported = model.export(format='onnx', imgsz=Video.IMGSZ, dynamic=True, verbose=False)
+            if int8:
+                exported = cls.quantize_onnx(exported, target, calibration_source)
+        if os.path.abspath(exported) != os.path.abspath(target):
+            if os.path.isdir(target):
+                shutil.rmtree(target)
+            shutil.move(exported, target)
+        logger.info(f"✅ 导出完成: {target}")
+        return target
+
+    @classmethod
+    def calibration_frames(cls, video_path, count=64):
+        """从视频中均匀抽取校准帧"""
+        capture = cv2.VideoCapture(video_path)
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        frames = []
+        for index in np.linspace(0, max(total - 1, 0), count).astype(int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            success, frame = capture.read()
+            if success:
+                frames.append(frame)
+        capture.release()
+        return frames
+
+    @classmethod
+    def calibration_dataset(cls, video_path):
+        """将校准帧写为 ultralytics 数据集, 返回数据集配置文件路径"""
+        root = os.path.abspath(os.path.join(cls.MODEL_DIR, 'calibration'))
+        images = os.path.join(root, 'images')
+        shutil.rmtree(root, ignore_errors=True)
+        os.makedirs(images)
+        for k, frame in enumerate(cls.calibration_frames(video_path)):
+            cv2.imwrite(os.path.join(images, f'{k:04d}.jpg'), frame)
+        config = os.path.join(root, 'calibration.yaml')
+        with open(config, 'w', encoding='utf-8') as f:
+            f.write(
+                f"path: {root}\ntrain: images\nval: images\n"
+                "kpt_shape: [17, 3]\nflip_idx: [0, 2, 1, 4, 3, 6, 5, 8, 7, 10, 9, 12, 11, 14, 13, 16, 15]\n"
+                "names:\n  0: person\n"
+            )
+        return config
+
+    @classmethod
+    def quantize_onnx(cls, onnx_path, target, calibration_source=None):
+        """ONNX INT8量化: 有校准视频时静态量化, 否则动态量化"""
+        from onnxruntime.quantization import CalibrationDataReader, QuantType, quantize_dynamic, quantize_static
+
+        if calibration_source is None:
+            quantize_dynamic(onnx_path, target, weight_type=QuantType.QInt8)
+            return target
+
+        class FrameReader(CalibrationDataReader):
+            def __init__(self, frames, input_name):
+                self.samples = iter([{input_name: Model.preprocess(frame)} for frame in frames])
+
+            def get_next(self):
+                return next(self.samples, None)
+
+        import onnx
+        input_name = onnx.load(onnx_path).graph.input[0].name
+        quantize_static(onnx_path, target, FrameReader(cls.calibration_frames(calibration_source), input_name),
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+        return target
+
+    @staticmethod
+    def preprocess(frame):
+        """与推理一致的预处理: 等比缩放并填充到 IMGSZ, BGR→RGB, 归一化, NCHW"""
+        size = Video.IMGSZ
+        scale = size / max(frame.shape[:2])
+        height, width = round(frame.shape[0] * scale), round(frame.shape[1] * scale)
+        image = np.full((size, size, 3), 114, np.uint8)
+        top, left = (size - height) // 2, (size - width) // 2
+        image[top:top + height, left:left + width] = cv2.resize(frame, (width, height), interpolation=cv2.INTER_LINEAR)
+        return image[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) / 255
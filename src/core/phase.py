@@ -0,0 +1,181 @@
+from collections import deque
+
+import numpy as np
+
+from src.enums.action_state import ActionState
+
+
+class PhaseTracker:
+    """动作环节状态机
+    每次分析 (每个视频/每个射手) 使用独立实例, 只保留判断所需的最近几帧角度, 可在多线程/多进程中并发使用.
+    """
+
+    RELEASE_ANGLE_THRESHOLD = 4.5  # 固势->撒放 角度骤增差值阈值
+    RELEASE_JUMP_LIMIT = 20  # 超过该差值视为检测跳变而非撒放
+    LOOKBACK = 3  # 回看帧数
+    BOUNDARIES = (0, 12, 150, 185, 215, 330)  # 各环节角度分界
+
+    def __init__(self):
+        self.previous_angles = deque(maxlen=self.LOOKBACK)
+        self.release_angle = None
+
+    @classmethod
+    def boundary_distance(cls, arm_angle):
+        """双臂姿态角到最近环节分界的角度距离"""
+        return min(min(abs(arm_angle - b), 360 - abs(arm_angle - b)) for b in cls.BOUNDARIES)
+
+    def reset(self):
+        self.previous_angles.clear()
+        self.release_angle = None
+
+    def update(self, arm_angle):
+        """
+        根据双臂姿态角判断动作环节
+        参数:
+            arm_angle (float): 计算出的双臂姿态角 (0-360范围)
+        """
+        action_state = self._judge(arm_angle)
+        self.previous_angles.append(arm_angle)
+        return action_state
+
+    def _judge(self, arm_angle):
+        threshold = self.RELEASE_ANGLE_THRESHOLD
+        if 330 <= arm_angle < 360 or 0 < arm_angle < 12:
+            self.release_angle = None  # 重置撒放角
+            return ActionState.LIFT  # 举弓
+        elif 12 <= arm_angle < 150:
+            return ActionState.DRAW  # 开弓
+        elif self.release_angle and self.release_angle - threshold <= arm_angle <= 185:
+            return ActionState.RELEASE  # 撒放
+        elif 150 <= arm_angle < 185:
+            if len(self.previous_angles) == self.LOOKBACK:
+                previous_angle = sum(self.previous_angles) / self.LOOKBACK  # 取前三帧的平均值
+                # 固势下骤增角度可视为进入撒发环节 (撒放角)
+                if min(self.previous_angles) >= 150 and self.RELEASE_JUMP_LIMIT > arm_angle - previous_angle >= threshold:
+                    self.release_angle = arm_angle
+                    return ActionState.RELEASE  # 撒放
+            return ActionState.SOLID  # 固势
+        elif 185 <= arm_angle < 215:
+            return ActionState.RELEASE  # 撒放
+        else:
+            return ActionState.UNKNOWN
+
+    @classmethod
+    def label(cls, arm_angles):
+        """离线批量标注整段角度序列, 结果与逐帧调用 update 一致
+        无状态的区间判断全部向量化, 仅对举弓/撒放角变化点按顺序处理.
+        Args:
+            arm_angles: 双臂姿态角数组, 按调用 update 的顺序排列
+        Returns:
+            np.ndarray: 动作环节取值 (ActionState.value) 数组
+        """
+        a = np.asarray(arm_angles, dtype=np.float64)
+        n = len(a)
+        threshold = cls.RELEASE_ANGLE_THRESHOLD
+        lift = ((a >= 330) & (a < 360)) | ((a > 0) & (a < 12))
+        draw = (a >= 12) & (a < 150)
+        solid = (a >= 150) & (a < 185)
+
+        labels = np.full(n, ActionState.UNKNOWN.value, dtype='<U16')
+        labels[(a >= 185) & (a < 215)] = ActionState.RELEASE.value
+        labels[solid] = ActionState.SOLID.value
+        labels[draw] = ActionState.DRAW.value
+        labels[lift] = ActionState.LIFT.value
+
+        # 固势下相对前三帧均值的角度骤增
+        jump = np.zeros(n, dtype=bool)
+        if n > cls.LOOKBACK:
+            windows = np.lib.stride_tricks.sliding_window_view(a[:-1], cls.LOOKBACK)
+            diff = a[cls.LOOKBACK:] - windows.mean(axis=1)
+            jump[cls.LOOKBACK:] = (windows.min(axis=1) >= 150) & (diff >= threshold) & (diff < cls.RELEASE_JUMP_LIMIT)
+        jump &= solid
+
+        # 撒放角在举弓时重置、在非延续的骤增处更新, 其间角度不低于 撒放角-阈值 的固势帧均为撒放
+        release_angle = None
+        start = 0
+
+        def mark_release(end):
+            if release_angle is not None:
+                segment = slice(start, end)
+                labels[segment][solid[segment] & (a[segment] >= release_angle - threshold)] = ActionState.RELEASE.value
+
+        for i in np.flatnonzero(lift | jump):
+            if lift[i]:
+                mark_release(i)
+                release_angle = None
+                start = i
+            elif release_angle is None or a[i] < release_angle - threshold:
+                mark_release(i)
+                release_angle = a[i]
+                start = i
+        mark_release(n)
+        return labels
+
+
+class TrackPhases:
+    """多射手动作环节: 每个跟踪目标一个 PhaseTracker, 互不干扰
+    无跟踪ID的检测 (ID为-1) 按其在帧内的顺序编号为 -1, -2, ...
+    """
+
+    MAX_IDLE = 300  # 超过该帧数未出现的目标释放其状态
+
+    def __init__(self):
+        self.trackers = {}
+        self.last_seen = {}
+        self.frames = 0
+
+    @staticmethod
+    def keys(ids):
+        """跟踪ID → 状态机键 (目标ID), 无跟踪ID时按帧内顺序编号为负数"""
+        ids = np.asarray(ids, dtype=np.int64)
+        return np.where(ids >= 0, ids, -1 - np.arange(len(ids)))
+
+    def reset(self):
+        self.trackers.clear()
+        self.last_seen.clear()
+        self.frames = 0
+
+    def update(self, keys, arm_angles):
+        """判断一帧内各目标的动作环节
+        Args:
+            keys: 目标ID数组 (keys 的结果)
+            arm_angles: 对应的双臂姿态角数组
+        Returns:
+            list: 各目标的 ActionState
+        """
+        self.frames += 1
+        states = []
+        for key, arm_angle in zip(keys.tolist(), arm_angles.tolist()):
+            tracker = self.trackers.get(key)
+            if tracker is None:
+                tracker = self.trackers[key] = PhaseTracker()
+            states.append(tracker.update(arm_angle))
+            self.last_seen[key] = self.frames
+        if self.frames % self.MAX_IDLE == 0:
+            for key in [k for k, seen in self.last_seen.items() if self.frames - seen > self.MAX_IDLE]:
+                del self.trackers[key], self.last_seen[key]
+        return states
+
+    @classmethod
+    def label(cls, keys, arm_angles, frames):
+        """离线批量标注, 结果与逐帧调用 update 一致
+        按目标分组, 并按 update 的释放规则在目标长时间未出现处切分, 各段分别调用 PhaseTracker.label (状态机重新开始)
+        Args:
+            keys: 每行的目标ID
+            arm_angles: 每行的双臂姿态角, 同一目标按帧顺序排列
+            frames: 每行的帧号 (从0开始, 每帧调用一次 update)
+        Returns:
+            np.ndarray: 动作环节取值数组
+        """
+        keys = np.asarray(keys)
+        arm_angles = np.asarray(arm_angles, dtype=np.float64)
+        counters = np.asarray(frames, dtype=np.int64) + 1  # update 计数从1开始
+        labels = np.full(len(keys), ActionState.UNKNOWN.value, dtype='<U16')
+        for key in np.unique(keys):
+            rows = np.flatnonzero(keys == key)
+            seen = counters[rows]
+            # 上次出现后, 第一次能释放该目标的检查帧 (MAX_IDLE 的倍数且间隔超过 MAX_IDLE) 早于再次出现则重新开始
+            release = ((seen[:-1] + cls.MAX_IDLE) // cls.MAX_IDLE + 1) * cls.MAX_IDLE
+            for segment in np.split(rows, np.flatnonzero(release < seen[1:]) + 1):
+                labels[segment] = PhaseTracker.label(arm_angles[segment])
+        return labels
@@ -0,0 +1,116 @@
+import queue
+import threading
+
+from src.core.metrics import Metrics
+
+# 队列结束标记
+_END = object()
+
+
+class Stage:
+    """后台线程阶段: 在独立线程中迭代上游, 经有界队列按序交给下游"""
+
+    def __init__(self, source, maxsize=4, name='stage'):
+        """
+        Args:
+            source: 上游可迭代对象 (在后台线程中迭代)
+            maxsize: 队列深度, 限制上游最多领先下游的元素数
+            name: 线程名
+        """
+        self.name = name
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self._source = source
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for item in self._source:
+                if not self._put(item):
+                    break
+        except BaseException as e:
+            self._error = e
+        finally:
+            if hasattr(self._source, 'close'):
+                self._source.close()
+            self._put(_END)
+
+    def _put(self, item):
+        # 下游提前结束时不再阻塞
+        while not self._stop.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                Metrics.gauge('queue_depth', self.queue.qsize(), queue=self.name)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self.queue.get()
+                Metrics.gauge('queue_depth', self.queue.qsize(), queue=self.name)
+                if item is _END:
+                    break
+                yield item
+            if self._error is not None:
+                raise self._error
+        finally:
+            self.close()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+
+class Sink:
+    """后台线程消费者: 有界队列 + 单线程按序写出"""
+
+    def __init__(self, write, maxsize=4, name='sink'):
+        """
+        Args:
+            write: 写出函数, 在后台线程中按入队顺序调用
+            maxsize: 队列深度
+            name: 线程名
+        """
+        self.name = name
+        self.queue = queue.Queue(maxsize=max(1, maxsize))
+        self._write = write
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            Metrics.gauge('queue_depth', self.queue.qsize(), queue=self.name)
+            if item is _END:
+                break
+            if self._error is not None:
+                continue  # 出错后丢弃剩余数据, 由 close 抛出
+            try:
+                self._write(item)
+            except BaseException as e:
+                self._error = e
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def put(self, item):
+        if self._error is not None:
+            raise self._error
+        self.queue.put(item)
+        Metrics.gauge('queue_depth', self.queue.qsize(), queue=self.name)
+
+    def close(self):
+        self.queue.put(_END)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
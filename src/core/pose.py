@@ -1,13 +1,34 @@
 import numpy as np
 import cv2
 
+from src.core.keypoints import FrameKeypoints
+from src.core.phase import TrackPhases
 from src.enums.action_state import ActionState
 
 class Pose:
-    
-    angle_list = []
-    release_angle = None
-    
+    # COCO 关键点索引
+    NOSE = 0
+    LEFT_SHOULDER, RIGHT_SHOULDER = 5, 6
+    LEFT_ELBOW, RIGHT_ELBOW = 7, 8
+    LEFT_WRIST, RIGHT_WRIST = 9, 10
+    LEFT_HIP, RIGHT_HIP = 11, 12
+    NUM_KEYPOINTS = 17
+
+    # 骨架连线与配色 (与 ultralytics 姿态绘制一致)
+    SKELETON = (
+        (15, 13), (13, 11), (16, 14), (14, 12), (11, 12), (5, 11), (6, 12), (5, 6), (5, 7), (6, 8),
+        (7, 9), (8, 10), (1, 2), (0, 1), (0, 2), (1, 3), (2, 4), (3, 5), (4, 6),
+    )
+    PALETTE = (
+        (255, 128, 0), (255, 153, 51), (255, 178, 102), (230, 230, 0), (255, 153, 255), (153, 204, 255),
+        (255, 102, 255), (255, 51, 255), (102, 178, 255), (51, 153, 255), (255, 153, 153), (255, 102, 102),
+        (255, 51, 51), (153, 255, 153), (102, 255, 102), (51, 255, 51), (0, 255, 0), (0, 0, 255),
+        (255, 0, 0), (255, 255, 255),
+    )
+    LIMB_COLORS = (9, 9, 9, 9, 7, 7, 7, 0, 0, 0, 0, 0, 16, 16, 16, 16, 16, 16, 16)
+    KEYPOINT_COLORS = (16, 16, 16, 16, 16, 0, 0, 0, 0, 0, 0, 9, 9, 9, 9, 9, 9)
+    KEYPOINT_CONF = 0.25
+
     @staticmethod
     def calculate_angle(c, d, a, b) -> float:
         """计算两向量夹角（0-360度）"""
@@ -32,76 +53,159 @@ class Pose:
         angle_deg = np.degrees(angle_rad)
         return angle_deg if cross >= 0 else 360 - angle_deg
 
+    @staticmethod
+    def calculate_angles(c, d, a, b):
+        """向量化计算两向量夹角（0-360度）
+        Args:
+            c, d, a, b: 形状为 (..., 2) 的坐标数组, 含义同 calculate_angle
+        Returns:
+            np.ndarray: 形状为 (...) 的角度数组, 输入含NaN处结果为NaN
+        """
+        vec_ab = b - a
+        vec_cd = d - c
+        norm = np.linalg.norm(vec_ab, axis=-1) * np.linalg.norm(vec_cd, axis=-1)
+        dot = np.sum(vec_ab * vec_cd, axis=-1)
+        cross = vec_ab[..., 0] * vec_cd[..., 1] - vec_ab[..., 1] * vec_cd[..., 0]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            angle_deg = np.degrees(np.arccos(np.clip(dot / norm, -1.0, 1.0)))
+        angle_deg = np.where(cross >= 0, angle_deg, 360 - angle_deg)
+        return np.where(norm == 0, 0.0, angle_deg)
+
+    @classmethod
+    def calculate_joint_angles(cls, a, joint, b):
+        """向量化计算关节内角（0-180度）, 即 joint→a 与 joint→b 的夹角"""
+        angle_deg = cls.calculate_angles(joint, a, joint, b)
+        return np.where(angle_deg > 180, 360 - angle_deg, angle_deg)
+
     @classmethod
-    def judge_action(cls, arm_angle):
+    def compute_metrics(cls, xy):
+        """向量化计算姿态指标
+        Args:
+            xy: 关键点坐标数组 (..., 17, 2), 如 (frames, persons, 17, 2)
+        Returns:
+            dict: 指标名 → 形状为 (...) 的角度数组
+                arm: 双臂姿态角 (0-360)
+                spine: 脊柱倾角 (-180, 180], 相对竖直方向
+                head: 头部与脊柱夹角 (-180, 180]
+                left_elbow / right_elbow: 肘角 (0-180)
+                left_shoulder / right_shoulder: 肩角, 上臂与肩线夹角 (0-180)
         """
-        根据双臂姿态角判断动作环节
-        参数:
-            arm_angle (float): 计算出的双臂姿态角 (0-360范围)
+        xy = np.asarray(xy, dtype=np.float32)
+        left_shoulder, right_shoulder = xy[..., cls.LEFT_SHOULDER, :], xy[..., cls.RIGHT_SHOULDER, :]
+        left_elbow, right_elbow = xy[..., cls.LEFT_ELBOW, :], xy[..., cls.RIGHT_ELBOW, :]
+        left_wrist, right_wrist = xy[..., cls.LEFT_WRIST, :], xy[..., cls.RIGHT_WRIST, :]
+        shoulder_midpoint = (left_shoulder + right_shoulder) / 2
+        hip_midpoint = (xy[..., cls.LEFT_HIP, :] + xy[..., cls.RIGHT_HIP, :]) / 2
+        vertical_vector = np.array([0, -1], dtype=np.float32)
+
+        spine = cls.calculate_angles(hip_midpoint, shoulder_midpoint, hip_midpoint, hip_midpoint + vertical_vector)
+        head = cls.calculate_angles(shoulder_midpoint, xy[..., cls.NOSE, :], hip_midpoint, shoulder_midpoint)
+        return {
+            'arm': cls.calculate_angles(left_shoulder, left_elbow, right_shoulder, right_elbow),
+            'spine': np.where(spine > 180, spine - 360, spine),
+            'head': np.where(head > 180, head - 360, head),
+            'left_elbow': cls.calculate_joint_angles(left_shoulder, left_elbow, left_wrist),
+            'right_elbow': cls.calculate_joint_angles(right_shoulder, right_elbow, right_wrist),
+            'left_shoulder': cls.calculate_joint_angles(left_elbow, left_shoulder, right_shoulder),
+            'right_shoulder': cls.calculate_joint_angles(right_elbow, right_shoulder, left_shoulder),
+        }
+
+    @classmethod
+    def analyze_frame(cls, frame, result, tracker, draw=True):
+        """分析单帧中的姿态数据
+        Args:
+            frame: 原始帧
+            result: YOLO处理结果, 或 FrameKeypoints (缓存/插值等无YOLO结果的场景)
+            tracker: 本次分析的 PhaseTracker
+            draw: 是否绘制骨架与脊柱线段, 仅输出数据时跳过全部绘制 (frame 可为 None)
         """
-        cls.angle_list.append(arm_angle)
-        
-        release_angle_threshold = 4.5  # 固势->撒放 角度骤增差值阈值
-
-        if 330 <= arm_angle < 360 or 0 < arm_angle < 12:
-            cls.release_angle = None  # 重置撒放角
-            return ActionState.LIFT  # 举弓
-        elif 12 <= arm_angle < 150:
-            return ActionState.DRAW  # 开弓
-        elif cls.release_angle and cls.release_angle - release_angle_threshold <= arm_angle <= 185:
-            return ActionState.RELEASE  # 撒放
-        elif 150 <= arm_angle < 185:
-            previous_angles = cls.angle_list[-4:-1]
-            previous_angle = sum(previous_angles) / 3  # 取前三帧的平均值
-            if min(previous_angles) >= 150 and 20 > arm_angle - previous_angle >= release_angle_threshold:  # 固势下骤增角度可视为进入撒发环节 (撒放角)
-                cls.release_angle = arm_angle
-                return ActionState.RELEASE  # 撒放
-            return ActionState.SOLID  # 固势
-        elif 185 <= arm_angle < 215:
-            return ActionState.RELEASE  # 撒放
-        else:
-            return ActionState.UNKNOWN
+        if isinstance(result, FrameKeypoints):
+            if draw:
+                frame = cls.draw_skeleton(frame.copy(), result.xy, result.conf)
+            return cls.analyze_keypoints(frame, result.xy, tracker, draw)
+
+        if draw:
+            frame = result.plot(boxes=False)
+        keypoints = result.keypoints
+        if keypoints is not None and keypoints.xy.ndim == 3 and keypoints.xy.shape[1] >= cls.NUM_KEYPOINTS:
+            # 一次性拷贝全部关键点到主机并向量化计算
+            return cls.analyze_keypoints(frame, keypoints.xy.cpu().numpy(), tracker, draw)
+        return frame, 0, 0, ActionState.UNKNOWN
+
+    @classmethod
+    def analyze_keypoints(cls, frame, xy, tracker, draw=True):
+        """由关键点数组 (persons, 17, 2) 计算姿态数据并绘制脊柱线段"""
+        metrics = cls.compute_metrics(xy)
+        if draw:
+            cls.draw_spines(frame, xy)
+        return (frame, *cls.judge_persons(metrics['arm'], metrics['spine'], tracker))
+
+    @classmethod
+    def analyze_tracks(cls, frame, result, phases, draw=True):
+        """多射手: 向量化计算帧内全部人的姿态指标, 按跟踪ID分别判断动作环节
+        Args:
+            frame: 原始帧
+            result: YOLO处理结果或 FrameKeypoints
+            phases: 本次分析的 TrackPhases
+            draw: 是否绘制骨架与脊柱线段
+        Returns:
+            tuple: (frame, keypoints, rows) rows 为 [(目标ID, 双臂姿态角, 脊柱倾角, 动作环节)]
+        """
+        keypoints = result if isinstance(result, FrameKeypoints) else FrameKeypoints.from_result(result)
+        if draw:
+            frame = cls.draw_spines(cls.draw_skeleton(frame.copy(), keypoints.xy, keypoints.conf), keypoints.xy)
+        if not len(keypoints):
+            phases.update(TrackPhases.keys([]), np.empty(0))  # 空帧也计入, 目标空闲帧数按帧号计算
+            return frame, keypoints, []
+        metrics = cls.compute_metrics(keypoints.xy)
+        keys = TrackPhases.keys(keypoints.ids)
+        states = phases.update(keys, metrics['arm'])
+        return frame, keypoints, list(zip(keys.tolist(), metrics['arm'].tolist(), metrics['spine'].tolist(), states))
 
     @classmethod
-    def analyze_frame(cls, frame, result):
-        """分析单帧中的姿态数据"""
-        frame = result.plot(boxes=False)
+    def draw_spines(cls, frame, xy):
+        """绘制每个人的脊柱线段 (髋中点→肩中点)"""
+        shoulder_midpoints = (xy[:, cls.LEFT_SHOULDER] + xy[:, cls.RIGHT_SHOULDER]) / 2
+        hip_midpoints = (xy[:, cls.LEFT_HIP] + xy[:, cls.RIGHT_HIP]) / 2
+        for i in range(len(xy)):
+            cls.draw_line(frame, hip_midpoints[i], shoulder_midpoints[i])
+        return frame
+
+    @classmethod
+    def judge_persons(cls, arm_angles, spine_angles, tracker):
+        """依次判断帧内每个人的动作环节, 返回最后一人的 (双臂姿态角, 脊柱倾角, 动作环节)"""
         arm_angle = 0
         spine_angle = 0
         action_state = ActionState.UNKNOWN
+        for i in range(len(arm_angles)):
+            arm_angle = float(arm_angles[i])
+            spine_angle = float(spine_angles[i])
+            action_state = tracker.update(arm_angle)
+        return arm_angle, spine_angle, action_state
 
-        keypoints = result.keypoints
-        if keypoints is not None:
-            for person in keypoints.xy:
-                if len(person) < 1:
-                    continue
-                # 提取关键点数据
-                left_shoulder = person[5].cpu().numpy()
-                right_shoulder = person[6].cpu().numpy()
-                left_elbow = person[7].cpu().numpy()
-                right_elbow = person[8].cpu().numpy()
-                left_hip = person[11].cpu().numpy()
-                right_hip = person[12].cpu().numpy()
-
-                # 计算关键点
-                shoulder_midpoint = (left_shoulder + right_shoulder) / 2
-                hip_midpoint = (left_hip + right_hip) / 2
-                
-                # 计算脊柱倾角
-                spine_vector = shoulder_midpoint - hip_midpoint
-                vertical_vector = np.array([0, -1])
-                spine_angle = cls.calculate_angle(hip_midpoint, shoulder_midpoint, hip_midpoint, hip_midpoint + vertical_vector)
-                if spine_angle > 180:
-                    spine_angle = spine_angle - 360
-
-                # 绘制脊柱线段
-                cls.draw_line(frame, hip_midpoint, shoulder_midpoint)
-
-                # 计算双臂姿态角并判断动作环节
-                arm_angle = cls.calculate_angle(left_shoulder, left_elbow, right_shoulder, right_elbow)
-                action_state = cls.judge_action(arm_angle)
-
-        return frame, arm_angle, spine_angle, action_state
+    @classmethod
+    def draw_skeleton(cls, frame, xy, conf=None):
+        """绘制人体关键点与骨架
+        Args:
+            frame: 视频帧
+            xy: 关键点坐标 (persons, 17, 2)
+            conf: 关键点置信度 (persons, 17)
+        Returns:
+            frame: 绘制后的帧
+        """
+        thickness = int(np.ceil(max(round(sum(frame.shape[:2]) / 2 * 0.003), 2) / 2))
+        for p in range(len(xy)):
+            visible = (xy[p, :, 0] > 0) & (xy[p, :, 1] > 0)
+            if conf is not None:
+                visible &= conf[p] >= cls.KEYPOINT_CONF
+            points = [(int(x), int(y)) for x, y in xy[p]]
+            for (i, j), color in zip(cls.SKELETON, cls.LIMB_COLORS):
+                if visible[i] and visible[j]:
+                    cv2.line(frame, points[i], points[j], cls.PALETTE[color], thickness, lineType=cv2.LINE_AA)
+            for i, color in enumerate(cls.KEYPOINT_COLORS):
+                if visible[i]:
+                    cv2.circle(frame, points[i], 5, cls.PALETTE[color], -1, lineType=cv2.LINE_AA)
+        return frame
 
     @staticmethod
     def draw_line(frame, point_1, point_2):
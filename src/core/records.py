@@ -0,0 +1,181 @@
+import os
+
+import numpy as np
+
+from src.core.log import logger
+
+
+class Records:
+    """分块列式数据记录
+    按列预分配类型化数组, 写满一块即追加写入CSV (及可选的 Parquet), 结束时原子替换为正式文件.
+    可选 .npz 二进制列式输出, 长视频加载远快于CSV.
+    """
+
+    # 数据记录 帧序号、双臂姿态角、脊柱倾角、技术环节、双臂角速度、双臂角加速度
+    COLUMNS = (
+        ('帧号', np.int64),
+        ('双臂姿态角', np.float64),
+        ('脊柱倾角', np.float64),
+        ('动作环节', '<U16'),
+        ('角速度', np.float64),
+        ('角加速度', np.float64),
+    )
+    # 多射手模式按 (帧号, 目标ID) 每人一行
+    TRACK_COLUMNS = COLUMNS[:1] + (('目标ID', np.int64),) + COLUMNS[1:]
+    # 级联推理时追加: 产出该帧关键点的模型
+    SOURCE_COLUMNS = (('推理模型', '<U32'),)
+    FORMATS = ('csv', 'npz', 'parquet')
+
+    def __init__(self, csv_path, formats=('csv',), columns=None, chunk_size=4096):
+        """
+        Args:
+            csv_path: CSV文件路径, 其他格式使用同名不同后缀
+            formats: 输出格式, 可选 csv / npz / parquet
+            columns: 列定义 ((列名, dtype), ...), 默认 COLUMNS
+            chunk_size: 每块行数
+        """
+        self.csv_path = csv_path
+        self.columns = tuple(columns or self.COLUMNS)
+        self.names = [name for name, _ in self.columns]
+        self.chunk_size = chunk_size
+        self.formats = [f for f in formats if self._check_format(f)]
+        self.paths = {f: self.path_for(csv_path, f) for f in self.FORMATS}
+        # 清理本次不输出的旧格式, 避免 load 读到过期数据
+        for f, path in self.paths.items():
+            if f not in self.formats and os.path.exists(path):
+                os.remove(path)
+
+        self._buffers = [np.empty(chunk_size, dtype=dtype) for _, dtype in self.columns]
+        self._size = 0
+        self._chunks = []  # npz 已写满的块
+        self._csv_header = True
+        self._parquet_writer = None
+        self.total = 0
+        for f in self.formats:
+            if os.path.exists(self._part(f)):
+                os.remove(self._part(f))
+
+    @staticmethod
+    def path_for(csv_path, fmt):
+        """CSV路径对应的指定格式文件路径"""
+        return csv_path if fmt == 'csv' else csv_path.rsplit('.', 1)[0] + f'.{fmt}'
+
+    @classmethod
+    def _check_format(cls, fmt):
+        if fmt not in cls.FORMATS:
+            raise ValueError(f"不支持的数据格式: {fmt}")
+        if fmt == 'parquet':
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                logger.warning("⚠️ 未安装 pyarrow, 跳过 Parquet 输出")
+                return False
+        return True
+
+    def _part(self, fmt):
+        return self.paths[fmt] + '.part'
+
+    def append(self, *values):
+        """追加一行, 按列顺序传入"""
+        for buffer, value in zip(self._buffers, values):
+            buffer[self._size] = value
+        self._size += 1
+        self.total += 1
+        if self._size == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        """将当前块写出"""
+        if not self._size:
+            return
+        chunk = {name: buffer[:self._size].copy() for name, buffer in zip(self.names, self._buffers)}
+        self._size = 0
+        if 'npz' in self.formats:
+            self._chunks.append(chunk)
+        if 'csv' in self.formats or 'parquet' in self.formats:
+            import pandas as pd
+
+            df = pd.DataFrame(chunk, columns=self.names)
+            if 'csv' in self.formats:
+                df.to_csv(self._part('csv'), mode='a', header=self._csv_header, index=False, encoding='utf-8')
+                self._csv_header = False
+            if 'parquet' in self.formats:
+                self._write_parquet(df)
+
+    def _write_parquet(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self._part('parquet'), table.schema)
+        self._parquet_writer.write_table(table)
+
+    def close(self):
+        """写出剩余数据并替换为正式文件"""
+        import pandas as pd
+
+        self.flush()
+        if 'csv' in self.formats:
+            if self._csv_header:  # 无数据时仍输出表头
+                pd.DataFrame(columns=self.names).to_csv(self._part('csv'), index=False, encoding='utf-8')
+            os.replace(self._part('csv'), self.paths['csv'])
+        if 'npz' in self.formats:
+            with open(self._part('npz'), 'wb') as f:
+                np.savez(f, **self._concat())
+            os.replace(self._part('npz'), self.paths['npz'])
+        if 'parquet' in self.formats:
+            if self._parquet_writer is None:
+                self._write_parquet(pd.DataFrame({n: np.empty(0, dtype=d) for n, d in self.columns}))
+            self._parquet_writer.close()
+            os.replace(self._part('parquet'), self.paths['parquet'])
+
+    def abort(self):
+        """放弃本次记录: 关闭写入器并删除 .part 文件, 不发布正式文件"""
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
+        self._chunks.clear()
+        self._size = 0
+        for f in self.formats:
+            if os.path.exists(self._part(f)):
+                os.remove(self._part(f))
+
+    def _concat(self):
+        if not self._chunks:
+            return {name: np.empty(0, dtype=dtype) for name, dtype in self.columns}
+        return {name: np.concatenate([chunk[name] for chunk in self._chunks]) for name in self.names}
+
+    @classmethod
+    def publish(cls, staged_path, csv_path):
+        """把暂存的数据文件 (各格式) 替换为正式文件, CSV 最后替换; 正式路径上本次未输出的旧格式一并删除
+        Returns:
+            str: 正式数据文件路径
+        """
+        for fmt in reversed(cls.FORMATS):
+            staged, target = cls.path_for(staged_path, fmt), cls.path_for(csv_path, fmt)
+            if os.path.exists(staged):
+                os.replace(staged, target)
+            elif os.path.exists(target):
+                os.remove(target)
+        return csv_path
+
+    @classmethod
+    def load(cls, csv_path):
+        """读取数据记录, 优先使用二进制列式文件
+        Returns:
+            DataFrame: 数据记录
+        """
+        import pandas as pd
+
+        parquet_path = cls.path_for(csv_path, 'parquet')
+        npz_path = cls.path_for(csv_path, 'npz')
+        if os.path.exists(npz_path):
+            with np.load(npz_path) as data:
+                return pd.DataFrame({name: data[name] for name in data.files})
+        if os.path.exists(parquet_path):
+            try:
+                return pd.read_parquet(parquet_path)
+            except ImportError:
+                pass
+        return pd.read_csv(csv_path, encoding='utf8')
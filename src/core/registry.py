@@ -0,0 +1,111 @@
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import numpy as np
+
+from src.core.device import Device
+from src.core.log import logger
+from src.core.model import Model
+from src.core.video import Video
+
+
+class ModelRegistry:
+    """进程内常驻模型表
+    按 (模型, 设备, 后端, INT8) 缓存已加载并预热的模型实例, 命令行、WebUI 与库调用共用, 同一模型在进程内只加载一次.
+    同一实例同一时刻只借给一个调用方 (跟踪器状态不共享), 并发借用时按需加载新实例, 归还后留待复用;
+    每个模型键最多保留 MAX_IDLE_PER_KEY 个空闲实例, 并发高峰后多出的实例归还时直接释放.
+    """
+
+    MAX_IDLE_PER_KEY = 2
+    _idle = {}  # 模型键 → 空闲实例列表
+    _keys = weakref.WeakKeyDictionary()  # 实例 → 模型键, 实例释放后自动移除
+    _lock = threading.Lock()
+
+    @staticmethod
+    def key(model_name='yolo11x-pose', device_name='auto', backend='torch', int8=False):
+        """模型键, 'auto' 解析为实际设备, 与显式指定同一设备时共用实例; 导出的 onnx / openvino 模型在CPU上推理"""
+        device = Device.get_device(device_name) if backend == 'torch' else 'cpu'
+        return model_name, device, backend, bool(int8)
+
+    @staticmethod
+    def load(model_name='yolo11x-pose', device_name='auto', backend='torch', int8=False, calibration_source=None):
+        """加载新的模型实例到指定设备 (不经过缓存)"""
+        model = Model.get_model(model_name, backend, int8, calibration_source)
+        if backend != 'torch':
+            logger.info(f"✅ 加载 {Model.label(model_name, backend, int8)} 模型到 cpu 设备")
+            return model
+        device = Device.get_device(device_name)
+        model.to(device)
+        logger.info(f"✅ 加载 {model.model_name} 模型到 {device} 设备")
+        return model
+
+    @staticmethod
+    def warmup(model):
+        """空白帧推理一次, 完成推理器初始化, 避免首个请求承担"""
+        start = time.monotonic()
+        Video.predict(model, [np.zeros((Video.IMGSZ, Video.IMGSZ, 3), np.uint8)])
+        logger.info(f"🔥 模型预热完成: {time.monotonic() - start:.2f}s")
+
+    @classmethod
+    def acquire(cls, model_name='yolo11x-pose', device_name='auto', backend='torch', int8=False, calibration_source=None):
+        """借出空闲的常驻模型, 没有时加载并预热新实例
+        Args:
+            calibration_source: INT8 首次导出时的校准视频
+        Returns:
+            模型实例, 用完后须 release
+        """
+        key = cls.key(model_name, device_name, backend, int8)
+        with cls._lock:
+            idle = cls._idle.setdefault(key, [])
+            if idle:
+                return idle.pop()
+        model = cls.load(model_name, key[1], backend, int8, calibration_source)
+        cls.warmup(model)
+        with cls._lock:
+            cls._keys[model] = key
+        return model
+
+    @classmethod
+    def release(cls, model):
+        """归还借出的模型, 该模型键的空闲实例已满时释放该实例"""
+        with cls._lock:
+            key = cls._keys.get(model)
+            if key is None:
+                return
+            idle = cls._idle.setdefault(key, [])
+            if any(m is model for m in idle):
+                return
+            if len(idle) < cls.MAX_IDLE_PER_KEY:
+                idle.append(model)
+                return
+            del cls._keys[model]
+        logger.info(f"🗑️ 空闲 {key[0]} 实例已有 {cls.MAX_IDLE_PER_KEY} 个, 释放归还的实例")
+
+    @classmethod
+    @contextmanager
+    def lease(cls, *args, **kwargs):
+        """借用模型的上下文, 退出时归还
+        Yields:
+            模型实例
+        """
+        model = cls.acquire(*args, **kwargs)
+        try:
+            yield model
+        finally:
+            cls.release(model)
+
+    @classmethod
+    def preload(cls, *args, **kwargs):
+        """提前加载并预热一个实例 (如 WebUI 启动时在后台加载默认模型)"""
+        cls.release(cls.acquire(*args, **kwargs))
+
+    @classmethod
+    def clear(cls):
+        """丢弃全部空闲实例"""
+        with cls._lock:
+            for models in cls._idle.values():
+                for model in models:
+                    cls._keys.pop(model, None)
+            cls._idle.clear()
@@ -0,0 +1,143 @@
+import multiprocessing as mp
+import os
+import shutil
+import subprocess
+import tempfile
+
+import cv2
+import numpy as np
+
+from src.core.cache import KeypointCache
+from src.core.log import logger
+from src.core.pose import Pose
+from src.core.records import Records
+from src.core.video import Video
+
+
+class Renderer:
+    """标注视频渲染
+    由已保存的逐帧数据 (数据记录 + 逐帧关键点) 重新绘制骨架、脊柱线段与文本, 不执行推理.
+    视频按帧区间切分为若干段, 多进程各自解码、绘制、编码, 最后拼接为完整视频.
+    输出先写入临时文件, 完成后才替换为正式路径, 中断时不会留下截断的视频.
+    """
+
+    MIN_SEGMENT_FRAMES = 60  # 每段最少帧数, 避免过短的分段
+
+    def __init__(self, input_path, output_path, csv_path, keypoints_path):
+        """
+        Args:
+            input_path: 原始视频路径
+            output_path: 输出标注视频路径
+            csv_path: 数据记录路径
+            keypoints_path: 逐帧关键点目录 (关键点缓存格式)
+        """
+        self.input_path = input_path
+        self.output_path = output_path
+        self.csv_path = csv_path
+        self.keypoints_path = keypoints_path
+
+    def render(self, workers=None, pool=None):
+        """分段渲染并拼接
+        Args:
+            workers: 并行进程数, 默认CPU核数
+            pool: 复用的进程池 (如分段处理的工作进程池), 为空时按需新建
+        Returns:
+            str: 输出视频路径
+        """
+        frames = len(KeypointCache.read(self.keypoints_path))
+        workers = workers or os.cpu_count() or 1
+        count = max(1, min(workers, frames // self.MIN_SEGMENT_FRAMES))
+        bounds = np.linspace(0, frames, count + 1).astype(int)
+        stem, ext = os.path.splitext(self.output_path)
+        target = f'{stem}.rendering{ext}'
+        # 只有一段时直接写入临时输出
+        parts = [target] if count == 1 else [f'{stem}.part{k}{ext}' for k in range(count)]
+        tasks = [
+            (self.input_path, part, self.csv_path, self.keypoints_path, int(bounds[k]), int(bounds[k + 1]))
+            for k, part in enumerate(parts)
+        ]
+        logger.info(f"🎞️ 渲染标注视频: {frames}帧 | {count}段")
+        if count == 1:
+            self.render_segment(tasks[0])
+        else:
+            if pool is not None:
+                pool.map(self.render_segment, tasks)
+            else:
+                with mp.get_context('spawn').Pool(count) as pool:
+                    pool.map(self.render_segment, tasks)
+            self.concat(parts, target)
+            for part in parts:
+                os.remove(part)
+        os.replace(target, self.output_path)
+        logger.info(f"✅ 渲染完成: {self.output_path}")
+        return self.output_path
+
+    @staticmethod
+    def render_segment(task):
+        """渲染一段 [start, end) 帧, 返回分段视频路径"""
+        input_path, part_path, csv_path, keypoints_path, start, end = task
+        records = Records.load(csv_path)
+        keypoints = KeypointCache.read(keypoints_path)
+        capture = cv2.VideoCapture(input_path)
+        fps = int(capture.get(cv2.CAP_PROP_FPS))
+        frame_size = (int(capture.get(3)), int(capture.get(4)))
+        writer = Video.open_writer(part_path, fps, frame_size)
+        if start:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+        multi_archer = '目标ID' in records
+        if multi_archer:
+            # 多射手数据每帧多行, 按帧号定位该帧的各目标 (与关键点同序)
+            frame_numbers = records['帧号'].to_numpy()
+            track_rows = records[['目标ID', '双臂姿态角', '脊柱倾角', '动作环节']]
+        else:
+            rows = records[['帧号', '双臂姿态角', '脊柱倾角', '动作环节']].iloc[start:end].itertuples(index=False)
+        for index in range(start, end):
+            success, frame = capture.read()
+            if not success:
+                break
+            kp = keypoints.frame(index)
+            Pose.draw_skeleton(frame, kp.xy, kp.conf)
+            Pose.draw_spines(frame, kp.xy)
+            if multi_archer:
+                lo, hi = np.searchsorted(frame_numbers, (index, index + 1))
+                Video.draw_track_labels(frame, kp.boxes, list(track_rows.iloc[lo:hi].itertuples(index=False)))
+                Video.draw_texts(frame, Video.track_frame_texts(index, hi - lo))
+            else:
+                row = next(rows, None)
+                if row is None:
+                    break
+                frame_number, arm_angle, spine_angle, action_state = row
+                Video.draw_texts(frame, Video.frame_texts(frame_number, arm_angle, spine_angle, action_state))
+            writer.write(frame)
+        capture.release()
+        writer.release()
+        return part_path
+
+    @staticmethod
+    def concat(parts, output_path):
+        """拼接分段视频, 有 ffmpeg 时直接复制码流, 否则逐帧重新编码"""
+        if shutil.which('ffmpeg'):
+            with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False, encoding='utf-8') as f:
+                f.writelines(f"file '{os.path.abspath(part)}'\n" for part in parts)
+            try:
+                subprocess.run(
+                    ['ffmpeg', '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0', '-i', f.name, '-c', 'copy', output_path],
+                    check=True,
+                )
+                return
+            except subprocess.CalledProcessError:
+                logger.warning("⚠️ ffmpeg 拼接失败, 改为逐帧重新编码")
+            finally:
+                os.remove(f.name)
+        writer = None
+        for part in parts:
+            capture = cv2.VideoCapture(part)
+            if writer is None:
+                writer = Video.open_writer(output_path, int(capture.get(cv2.CAP_PROP_FPS)), (int(capture.get(3)), int(capture.get(4))))
+            while True:
+                success, frame = capture.read()
+                if not success:
+                    break
+                writer.write(frame)
+            capture.release()
+        writer.release()
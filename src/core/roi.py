@@ -0,0 +1,115 @@
+import numpy as np
+
+from src.core.keypoints import FrameKeypoints
+
+
+class ArcherRoi:
+    """射手区域跟踪
+    记录射手检测框与移动速度, 给出带边距的裁剪区域; 裁剪区域内有多人时选取与上一帧检测框重叠最大者.
+    裁剪区域的推理尺寸按区域大小缩放, 射手的像素密度与整帧检测一致, 推理开销随区域面积下降.
+    """
+
+    STRIDE = 32  # 推理尺寸须为模型步长的整数倍
+
+    def __init__(self, redetect_every=60, padding=0.3, imgsz=320, detect_imgsz=640, max_misses=3, min_imgsz=128):
+        """
+        Args:
+            redetect_every: 整帧重新检测的间隔帧数
+            padding: 裁剪区域相对检测框长边的边距比例
+            imgsz: 裁剪区域推理尺寸上限
+            detect_imgsz: 整帧检测推理尺寸
+            max_misses: 连续未检出多少帧后视为跟丢
+            min_imgsz: 裁剪区域推理尺寸下限
+        """
+        self.redetect_every = redetect_every
+        self.padding = padding
+        self.imgsz = imgsz
+        self.detect_imgsz = detect_imgsz
+        self.max_misses = max_misses
+        self.min_imgsz = min_imgsz
+        self.box = None
+        self.velocity = np.zeros(2, np.float32)  # 检测框中心每帧位移 (x, y)
+        self.misses = 0
+        self.detected_at = None
+        self.updated_at = None
+
+    def needs_detection(self, index):
+        return self.box is None or index - self.detected_at >= self.redetect_every
+
+    def region(self, frame_shape, frames=1):
+        """当前裁剪区域 (x0, y0, x1, y1), 尚未定位射手时返回 None
+        Args:
+            frame_shape: 整帧形状
+            frames: 区域要覆盖的帧数, 按射手移动速度沿移动方向的反向与正向额外扩展
+        """
+        if self.box is None:
+            return None
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = self.box
+        pad = self.padding * max(x1 - x0, y1 - y0)
+        drift_x, drift_y = np.abs(self.velocity) * frames
+        return (
+            int(max(0, x0 - pad - drift_x)), int(max(0, y0 - pad - drift_y)),
+            int(min(width, x1 + pad + drift_x)), int(min(height, y1 + pad + drift_y)),
+        )
+
+    def crop_imgsz(self, region, frame_shape):
+        """裁剪区域的推理尺寸: 与整帧检测相同的缩放比例, 限制在 [min_imgsz, imgsz] 内并对齐到步长"""
+        x0, y0, x1, y1 = region
+        size = self.detect_imgsz * max(x1 - x0, y1 - y0) / max(frame_shape[:2])
+        size = int(np.ceil(size / self.STRIDE)) * self.STRIDE
+        return int(min(self.imgsz, max(self.min_imgsz, size)))
+
+    def at_edge(self, region, frame_shape, margin=2):
+        """射手检测框贴到裁剪区域的内侧边缘 (画面边界除外), 可能已部分移出裁剪区域"""
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = region
+        bx0, by0, bx1, by1 = self.box
+        return bool(
+            (x0 > 0 and bx0 - x0 < margin) or (y0 > 0 and by0 - y0 < margin)
+            or (x1 < width and x1 - bx1 < margin) or (y1 < height and y1 - by1 < margin)
+        )
+
+    def update(self, keypoints, index, detection=False):
+        """根据一帧的检测结果更新射手位置
+        Args:
+            keypoints: 整帧坐标的 FrameKeypoints
+            index: 帧号
+            detection: 是否为整帧检测结果
+        Returns:
+            FrameKeypoints: 仅包含射手的关键点, 未检出时为空
+        """
+        if not len(keypoints):
+            self.misses += 1
+            if self.misses >= self.max_misses:
+                self.box = None
+                self.velocity[:] = 0
+            return FrameKeypoints.empty(source=keypoints.source)
+
+        if self.box is None:
+            areas = (keypoints.boxes[:, 2] - keypoints.boxes[:, 0]) * (keypoints.boxes[:, 3] - keypoints.boxes[:, 1])
+            best = int(np.argmax(areas))
+        else:
+            best = int(np.argmax(self.iou(self.box, keypoints.boxes)))
+        if detection:
+            self.detected_at = index
+        box = keypoints.boxes[best].copy()
+        if self.box is not None and self.updated_at is not None and index > self.updated_at:
+            shift = (box[:2] + box[2:] - self.box[:2] - self.box[2:]) / 2
+            self.velocity = shift / (index - self.updated_at)
+        self.box = box
+        self.updated_at = index
+        self.misses = 0
+        return keypoints.select(best)
+
+    @staticmethod
+    def iou(box, boxes):
+        """一个框与多个框的交并比"""
+        x0 = np.maximum(box[0], boxes[:, 0])
+        y0 = np.maximum(box[1], boxes[:, 1])
+        x1 = np.minimum(box[2], boxes[:, 2])
+        y1 = np.minimum(box[3], boxes[:, 3])
+        inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+        area = (box[2] - box[0]) * (box[3] - box[1])
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        return inter / np.maximum(area + areas - inter, 1e-6)
@@ -0,0 +1,75 @@
+import numpy as np
+
+
+class AngleRate:
+    """双臂姿态角的角速度 (度/帧) 与角加速度 (度/帧^2)
+    逐帧增量计算, 跨越 0/360 度时按最短转角计算; 首帧角速度、前两帧角加速度为 NaN.
+    """
+
+    def __init__(self):
+        self.angle = None
+        self.velocity = np.nan
+
+    @staticmethod
+    def wrap(diff):
+        """角度差超过180度时视为跨越 0/360 度"""
+        diff = np.asarray(diff, dtype=np.float64)
+        return np.where(diff > 180, diff - 360, np.where(diff < -180, diff + 360, diff))
+
+    def update(self, angle):
+        """
+        Args:
+            angle: 当前帧双臂姿态角
+        Returns:
+            tuple: (角速度, 角加速度)
+        """
+        velocity = float(self.wrap(angle - self.angle)) if self.angle is not None else np.nan
+        acceleration = velocity - self.velocity
+        self.angle, self.velocity = angle, velocity
+        return velocity, acceleration
+
+    @classmethod
+    def compute(cls, angles):
+        """整段角度序列批量计算, 结果与逐帧调用 update 一致
+        Returns:
+            tuple: (角速度数组, 角加速度数组)
+        """
+        angles = np.asarray(angles, dtype=np.float64)
+        velocity = np.full(len(angles), np.nan)
+        velocity[1:] = cls.wrap(np.diff(angles))
+        acceleration = np.full(len(angles), np.nan)
+        acceleration[1:] = np.diff(velocity)
+        return velocity, acceleration
+
+
+def lttb(x, y, threshold):
+    """Largest-Triangle-Three-Buckets 降采样, 保留折线的峰谷形状
+    Args:
+        x, y: 数据点 (x 单调递增), y 中的 NaN 按 0 参与面积计算
+        threshold: 保留的点数
+    Returns:
+        np.ndarray: 保留点的下标 (含首尾点)
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.nan_to_num(np.asarray(y, dtype=np.float64))
+    # 首尾点之外的点均分为 threshold-2 个桶, 每桶选出与前一选中点、下一桶均值点构成最大三角形的点
+    bounds = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for k in range(threshold - 2):
+        start, end = bounds[k], bounds[k + 1]
+        if k + 2 < len(bounds):
+            next_x = x[end:bounds[k + 2]].mean()
+            next_y = y[end:bounds[k + 2]].mean()
+        else:
+            next_x, next_y = x[-1], y[-1]
+        areas = np.abs(
+            (x[a] - next_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (next_y - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[k + 1] = a
+    return selected
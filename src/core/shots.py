@@ -0,0 +1,81 @@
+import numpy as np
+
+from src.core.phase import PhaseTracker
+from src.enums.action_state import ActionState
+
+
+class ShotSegmenter:
+    """按逐帧动作环节把视频切分为单次射箭 (举弓→开弓→固势→撒放), 并计算每箭的统计量
+    未知环节视为间隙; 撒放之后再出现其他环节即开始下一箭, 未撒放就重新举弓的 (放弃的) 一箭丢弃.
+    """
+
+    PHASES = (ActionState.LIFT, ActionState.DRAW, ActionState.SOLID, ActionState.RELEASE)
+
+    @staticmethod
+    def runs(states):
+        """连续相同环节的区间
+        Returns:
+            list: [(环节取值, 起始下标, 结束下标(不含))]
+        """
+        states = np.asarray(states)
+        if not len(states):
+            return []
+        change = np.flatnonzero(states[1:] != states[:-1]) + 1
+        starts = np.concatenate(([0], change))
+        ends = np.concatenate((change, [len(states)]))
+        return [(states[s], int(s), int(e)) for s, e in zip(starts, ends)]
+
+    @classmethod
+    def segment(cls, records, fps=30):
+        """切分并统计
+        Args:
+            records: 数据记录 DataFrame (帧号、双臂姿态角、脊柱倾角、动作环节)
+            fps: 视频帧率
+        Returns:
+            list: 每箭的统计字典
+        """
+        states = records['动作环节'].to_numpy().astype(str)
+        shots, current, released = [], [], False
+        for run in cls.runs(states):
+            phase = run[0]
+            if phase == ActionState.UNKNOWN.value:
+                continue
+            if released and phase != ActionState.RELEASE.value:
+                shots.append(current)
+                current, released = [], False
+            if phase == ActionState.LIFT.value and any(r[0] != ActionState.LIFT.value for r in current):
+                current = []  # 未撒放就重新举弓
+            if not current and phase == ActionState.RELEASE.value:
+                continue  # 没有开弓过程的撒放
+            current.append(run)
+            released = phase == ActionState.RELEASE.value
+        if released:
+            shots.append(current)
+        return [cls.summarize(records, runs, k, fps) for k, runs in enumerate(shots)]
+
+    @classmethod
+    def summarize(cls, records, runs, index, fps):
+        """一箭的统计: 各环节时长、脊柱倾角统计、撒放角与撒放时的角度骤增"""
+        start, end = runs[0][1], runs[-1][2]
+        frames = records['帧号'].to_numpy()
+        arm = records['双臂姿态角'].to_numpy(dtype=np.float64)
+        spine = records['脊柱倾角'].to_numpy(dtype=np.float64)[start:end]
+        durations = {phase: 0 for phase in cls.PHASES}
+        for phase, s, e in runs:
+            durations[ActionState(phase)] += e - s
+        release = next(s for phase, s, _ in runs if phase == ActionState.RELEASE.value)
+        lookback = arm[max(start, release - PhaseTracker.LOOKBACK):release]
+        return {
+            'shot': index,
+            'start_frame': int(frames[start]),
+            'end_frame': int(frames[end - 1]),
+            'start_seconds': round(float(frames[start]) / fps, 3),
+            'duration': round(float(frames[end - 1] - frames[start] + 1) / fps, 3),
+            **{f'{phase.name.lower()}_seconds': round(durations[phase] / fps, 3) for phase in cls.PHASES},
+            'spine_mean': round(float(spine.mean()), 2),
+            'spine_min': round(float(spine.min()), 2),
+            'spine_max': round(float(spine.max()), 2),
+            'spine_std': round(float(spine.std()), 2),
+            'release_angle': round(float(arm[release]), 2),
+            'release_jump': round(float(arm[release] - lookback.mean()), 2) if len(lookback) else None,
+        }
@@ -0,0 +1,187 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+import cv2
+
+from src.core.cache import KeypointCache
+from src.core.log import logger
+from src.core.records import Records
+from src.core.shots import ShotSegmenter
+
+
+class SessionStore:
+    """训练记录库 (SQLite)
+    每个视频切分为单次射箭后写入 shots 表, 射手与日期冗余到每箭上并建索引,
+    跨视频的统计 (如最近500箭的平均开弓时长) 直接查询, 不再重新读取各视频的数据文件.
+    """
+
+    DEFAULT_PATH = os.path.join('data', 'sessions.db')
+    SHOT_COLUMNS = (
+        'shot', 'start_frame', 'end_frame', 'start_seconds', 'duration',
+        'lift_seconds', 'draw_seconds', 'solid_seconds', 'release_seconds',
+        'spine_mean', 'spine_min', 'spine_max', 'spine_std', 'release_angle', 'release_jump',
+    )
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS videos (
+            id INTEGER PRIMARY KEY,
+            key TEXT UNIQUE NOT NULL,
+            video TEXT NOT NULL,
+            csv TEXT,
+            archer TEXT,
+            recorded_at TEXT,
+            fps REAL,
+            frames INTEGER,
+            indexed_at TEXT
+        );
+        CREATE TABLE IF NOT EXISTS shots (
+            id INTEGER PRIMARY KEY,
+            video_id INTEGER NOT NULL REFERENCES videos(id) ON DELETE CASCADE,
+            track INTEGER,
+            archer TEXT,
+            recorded_at TEXT,
+            shot INTEGER, start_frame INTEGER, end_frame INTEGER, start_seconds REAL, duration REAL,
+            lift_seconds REAL, draw_seconds REAL, solid_seconds REAL, release_seconds REAL,
+            spine_mean REAL, spine_min REAL, spine_max REAL, spine_std REAL,
+            release_angle REAL, release_jump REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_videos_archer ON videos(archer, recorded_at);
+        CREATE INDEX IF NOT EXISTS idx_videos_date ON videos(recorded_at);
+        CREATE INDEX IF NOT EXISTS idx_shots_archer_date ON shots(archer, recorded_at);
+        CREATE INDEX IF NOT EXISTS idx_shots_date ON shots(recorded_at);
+        CREATE INDEX IF NOT EXISTS idx_shots_video ON shots(video_id, shot);
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        """
+        Args:
+            path: 数据库文件路径
+        """
+        self.path = path
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._lock = threading.Lock()
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        self.connection.execute('PRAGMA journal_mode = WAL')  # 查询与写入互不阻塞
+        self.connection.executescript(self.SCHEMA)
+        if 'track' not in {row[1] for row in self.connection.execute('PRAGMA table_info(shots)')}:
+            # 旧版记录库没有目标ID列
+            self.connection.execute('ALTER TABLE shots ADD COLUMN track INTEGER')
+
+    def close(self):
+        self.connection.close()
+
+    @staticmethod
+    def video_info(video_path):
+        """视频帧率与录制时间 (文件修改时间)"""
+        capture = cv2.VideoCapture(video_path)
+        fps = capture.get(cv2.CAP_PROP_FPS) or 30
+        capture.release()
+        recorded_at = datetime.fromtimestamp(os.path.getmtime(video_path)).isoformat(sep=' ', timespec='seconds')
+        return fps, recorded_at
+
+    def add_video(self, video_path, csv_path, archer=None, recorded_at=None, fps=None):
+        """切分视频的动作环节并写入 (同一视频内容重复写入时替换原记录)
+        Args:
+            video_path: 原始视频路径
+            csv_path: 数据记录路径
+            archer: 射手名称
+            recorded_at: 录制时间 (ISO格式), 默认取视频文件修改时间
+            fps: 帧率, 默认读取视频
+        Returns:
+            int: 识别出的箭数
+        """
+        video_fps, video_time = self.video_info(video_path)
+        fps = fps or video_fps
+        recorded_at = recorded_at or video_time
+        records = Records.load(csv_path)
+        if '目标ID' in records:
+            # 多射手数据按目标分别切分
+            shots = [
+                {**shot, 'track': int(track)}
+                for track, group in records.groupby('目标ID', sort=True)
+                for shot in ShotSegmenter.segment(group, fps)
+            ]
+        else:
+            shots = [{**shot, 'track': None} for shot in ShotSegmenter.segment(records, fps)]
+        with self._lock, self.connection:
+            self.connection.execute('DELETE FROM videos WHERE key = ?', (KeypointCache.file_hash(video_path),))
+            video_id = self.connection.execute(
+                'INSERT INTO videos (key, video, csv, archer, recorded_at, fps, frames, indexed_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (KeypointCache.file_hash(video_path), os.path.basename(video_path), csv_path, archer, recorded_at, fps,
+                 len(records), datetime.now().isoformat(sep=' ', timespec='seconds')),
+            ).lastrowid
+            columns = ('video_id', 'archer', 'recorded_at', 'track') + self.SHOT_COLUMNS
+            self.connection.executemany(
+                f"INSERT INTO shots ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                [(video_id, archer, recorded_at, shot['track'], *(shot[c] for c in self.SHOT_COLUMNS)) for shot in shots],
+            )
+        logger.info(f"🗂️ 写入训练记录: {os.path.basename(video_path)} | {len(shots)}箭 | 射手 {archer or '未指定'}")
+        return len(shots)
+
+    @staticmethod
+    def _filters(archer=None, since=None, until=None, video=None, track=None):
+        clauses, params = [], []
+        if track is not None:
+            clauses.append('s.track = ?')
+            params.append(int(track))
+        if archer:
+            clauses.append('s.archer = ?')
+            params.append(archer)
+        if since:
+            clauses.append('s.recorded_at >= ?')
+            params.append(since)
+        if until:
+            clauses.append('s.recorded_at < ?')
+            params.append(until)
+        if video:
+            clauses.append('v.video = ?')
+            params.append(video)
+        return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+    def shots(self, archer=None, since=None, until=None, video=None, last=None, track=None):
+        """查询单箭记录, 按录制时间从新到旧
+        Args:
+            archer: 射手
+            since, until: 录制时间区间 [since, until), 如 '2024-05-01'
+            video: 视频文件名
+            last: 只取最近的若干箭
+            track: 多射手视频中的目标ID
+        Returns:
+            DataFrame: 单箭记录
+        """
+        import pandas as pd
+
+        where, params = self._filters(archer, since, until, video, track)
+        sql = (f"SELECT v.video, s.archer, s.recorded_at, s.track, {', '.join('s.' + c for c in self.SHOT_COLUMNS)} "
+               f"FROM shots s JOIN videos v ON v.id = s.video_id{where} ORDER BY s.recorded_at DESC, s.start_frame DESC")
+        if last:
+            sql += ' LIMIT ?'
+            params.append(int(last))
+        with self._lock:
+            return pd.read_sql_query(sql, self.connection, params=params)
+
+    def summary(self, archer=None, since=None, until=None, last=None, track=None):
+        """统计筛选范围内 (或最近 last 箭) 的平均各环节时长、脊柱倾角与撒放数据
+        Returns:
+            dict: 箭数与各项平均值
+        """
+        where, params = self._filters(archer, since, until, track=track)
+        inner = f"SELECT s.* FROM shots s JOIN videos v ON v.id = s.video_id{where} ORDER BY s.recorded_at DESC, s.start_frame DESC"
+        if last:
+            inner += ' LIMIT ?'
+            params.append(int(last))
+        averaged = ('duration', 'lift_seconds', 'draw_seconds', 'solid_seconds', 'release_seconds',
+                    'spine_mean', 'spine_std', 'release_angle', 'release_jump')
+        sql = f"SELECT COUNT(*), {', '.join(f'AVG({c})' for c in averaged)}, MAX(spine_max), MIN(spine_min) FROM ({inner})"
+        with self._lock:
+            row = self.connection.execute(sql, params).fetchone()
+        return dict(zip(('shots', *averaged, 'spine_max', 'spine_min'), row))
+
+    def archers(self):
+        """已记录的射手"""
+        with self._lock:
+            return [r[0] for r in self.connection.execute(
+                'SELECT DISTINCT archer FROM videos WHERE archer IS NOT NULL ORDER BY archer'
+            )]
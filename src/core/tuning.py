@@ -0,0 +1,227 @@
+import json
+import os
+import time
+from datetime import datetime
+
+import cv2
+
+from src.core.log import logger
+from src.core.video import Video
+
+
+class AutoTuner:
+    """批大小与线程数自动调优
+    首次以某个 (模型, 设备, 推理分辨率, 线程预算) 处理视频时, 用视频开头的几帧做短时推理校准,
+    在内存上限内选出 FPS 最高的批大小与 torch/OpenCV 线程数, 写入本地配置文件, 之后直接复用.
+    线程数是进程级设置, 只在进程 (工作进程、WebUI 调度器) 启动时由 startup 设置一次, 处理单个视频时不修改;
+    校准中临时尝试的线程数在调优结束后恢复. torch 的 inter-op 线程数在进程开始并行计算后无法再修改, 不参与调优.
+    """
+
+    PROFILE_PATH = os.path.join('data', 'tuning.json')
+    BATCH_SIZES = (1, 2, 4, 8, 12, 16, 24, 32)
+    CALIBRATION_FRAMES = 4  # 校准时解码的帧数, 批内循环复用
+    CALIBRATION_RUNS = 2  # 每个候选配置计时的批数
+    MEMORY_FRACTION = 0.5  # 内存上限: 调优开始时可用内存 (CUDA 为显存) 的比例
+    MIN_GAIN = 0.03  # 更大的批须至少提升3%才采用, 线程数同理
+    FALLBACK_BATCH_SIZE = 12  # 无法读取校准帧时的批大小
+
+    @staticmethod
+    def key(model_label, device, frame_size, threads):
+        """配置键: 模型 (含后端与量化)、设备、推理分辨率与线程预算"""
+        return f"{model_label}|{device}|{frame_size[0]}x{frame_size[1]}|t{threads}"
+
+    @classmethod
+    def load(cls, path=PROFILE_PATH):
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f"⚠️ 调优配置无法读取, 将重新调优: {path}")
+            return {}
+
+    @classmethod
+    def save(cls, key, profile, path=PROFILE_PATH):
+        """合并写入一项配置 (先写临时文件再替换, 多进程同时写入时不会损坏文件)"""
+        profiles = cls.load(path)
+        profiles[key] = profile
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.part'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(profiles, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def clear(cls, path=PROFILE_PATH):
+        """删除已保存的调优结果, 下次处理时重新调优"""
+        if os.path.exists(path):
+            os.remove(path)
+            logger.info(f"🗑️ 已清除调优配置: {path}")
+
+    @staticmethod
+    def apply(threads):
+        """设置 torch intra-op 与 OpenCV 线程数"""
+        if threads:
+            import torch
+
+            torch.set_num_threads(threads)
+            cv2.setNumThreads(threads)
+
+    @classmethod
+    def startup(cls, threads=0):
+        """进程启动时设置一次线程数: 本机已有相同线程预算的调优结果时取其中最常选出的线程数, 否则为线程预算
+        Args:
+            threads: 进程的线程预算, 0 表示CPU核数
+        Returns:
+            int: 设置的线程数
+        """
+        threads = threads or os.cpu_count() or 1
+        tuned = [profile['threads'] for key, profile in cls.load().items()
+                 if key.endswith(f'|t{threads}') and profile.get('threads')]
+        chosen = max(sorted(set(tuned)), key=tuned.count) if tuned else threads
+        cls.apply(chosen)
+        logger.info(f"🎛️ 线程数 {chosen} (预算 {threads})")
+        return chosen
+
+    @classmethod
+    def resolve(cls, model, model_label, input_path, batch_size=0, threads=0, decode_width=0, backend='torch'):
+        """确定批大小: batch_size 大于0时原样使用, 否则读取或生成调优配置 (不修改进程的线程数)
+        Args:
+            model: 已加载的模型实例
+            model_label: 模型标识 (Model.label)
+            input_path: 用于校准的视频
+            batch_size: 指定的批大小, 0 表示自动
+            threads: 线程预算, 0 表示CPU核数
+            decode_width: 推理前缩小宽度 (见 Video)
+            backend: 推理后端, 仅 torch CPU 推理调优线程数
+        Returns:
+            int: 批大小
+        """
+        if batch_size > 0:
+            return batch_size
+        threads = threads or os.cpu_count() or 1
+        device = str(getattr(model, 'device', None) or 'cpu')
+        video = Video(input_path, None, decode_width=decode_width)
+        try:
+            key = cls.key(model_label, device, video.inference_size, threads)
+            profile = cls.load().get(key)
+            if profile is None:
+                frames = cls.calibration_frames(video)
+                if not frames:
+                    return cls.FALLBACK_BATCH_SIZE
+                tune_threads = backend == 'torch' and device == 'cpu'
+                profile = cls.tune(model, frames, device, threads if tune_threads else None)
+                cls.save(key, profile)
+            else:
+                logger.info(f"🎛️ 使用调优配置 {key}: 批大小 {profile['batch_size']} | 线程 {profile['threads'] or '默认'}")
+        finally:
+            video.close()
+        return profile['batch_size']
+
+    @classmethod
+    def calibration_frames(cls, video):
+        """视频开头的几帧 (推理尺寸)"""
+        frame_buffer = next(video.read_batches(cls.CALIBRATION_FRAMES), None)
+        if frame_buffer is None:
+            return []
+        return [frame.copy() for frame in video.inference_frames(frame_buffer)]
+
+    @classmethod
+    def tune(cls, model, frames, device, max_threads=None):
+        """先以全部线程预算按从小到大逐一计时各批大小, 再在选出的批大小下尝试更少的线程数, 结束后恢复原线程数
+        Args:
+            frames: 校准帧
+            device: 设备名称
+            max_threads: 线程预算, 为空时不调优线程数
+        Returns:
+            dict: 调优结果 (批大小、线程数、FPS、内存占用)
+        """
+        import torch
+
+        start_time = time.monotonic()
+        baseline, limit = cls.memory_baseline(device)
+        previous = torch.get_num_threads(), cv2.getNumThreads()
+        try:
+            best = cls._search(model, frames, device, max_threads, baseline, limit)
+        finally:
+            torch.set_num_threads(previous[0])
+            cv2.setNumThreads(previous[1])
+        best['tuned_at'] = datetime.now().isoformat(sep=' ', timespec='seconds')
+        logger.info(
+            f"🎛️ 调优完成: 批大小 {best['batch_size']} | 线程 {best['threads'] or '默认'} | "
+            f"{best['fps']:.1f} FPS | 耗时 {time.monotonic() - start_time:.1f}s"
+        )
+        return best
+
+    @classmethod
+    def _search(cls, model, frames, device, max_threads, baseline, limit):
+        """在内存上限内搜索批大小与线程数 (会修改进程的线程数, 由 tune 恢复)"""
+        cls.apply(max_threads)
+        best = None
+        for batch_size in cls.BATCH_SIZES:
+            fps = cls.measure(model, frames, batch_size)
+            if fps is None:
+                break
+            memory = cls.memory_used(device, baseline) + batch_size * frames[0].nbytes
+            logger.debug(f"🎛️ 调优 批大小 {batch_size} | 线程 {max_threads} | {fps:.1f} FPS | {memory / 2 ** 20:.0f}MB")
+            if memory > limit:
+                break
+            if best is None or fps > best['fps'] * (1 + cls.MIN_GAIN):
+                best = {'batch_size': batch_size, 'threads': max_threads, 'fps': round(fps, 2),
+                        'memory_mb': round(memory / 2 ** 20, 1)}
+            elif fps < best['fps'] * (1 - cls.MIN_GAIN * 2):
+                break  # 吞吐已明显下降, 不再尝试更大的批
+        if best is None:
+            best = {'batch_size': 1, 'threads': max_threads, 'fps': 0.0, 'memory_mb': 0.0}
+        # 超出实际可用核数等情况下, 更少的线程可能更快
+        for threads in (max_threads // 2, max_threads // 4) if max_threads else ():
+            if threads < 1 or threads == best['threads']:
+                continue
+            cls.apply(threads)
+            fps = cls.measure(model, frames, best['batch_size'])
+            logger.debug(f"🎛️ 调优 批大小 {best['batch_size']} | 线程 {threads} | {fps or 0:.1f} FPS")
+            if fps is not None and fps > best['fps'] * (1 + cls.MIN_GAIN):
+                best.update(threads=threads, fps=round(fps, 2))
+        return best
+
+    @classmethod
+    def measure(cls, model, frames, batch_size):
+        """预热一批后计时 CALIBRATION_RUNS 批
+        Returns:
+            float: FPS, 显存不足时返回 None
+        """
+        import torch
+
+        batch = [frames[i % len(frames)] for i in range(batch_size)]
+        try:
+            Video.predict(model, batch)
+            start = time.perf_counter()
+            for _ in range(cls.CALIBRATION_RUNS):
+                Video.predict(model, batch)
+            elapsed = time.perf_counter() - start
+        except torch.cuda.OutOfMemoryError:
+            return None
+        return batch_size * cls.CALIBRATION_RUNS / elapsed if elapsed > 0 else float('inf')
+
+    @staticmethod
+    def memory_baseline(device):
+        """调优前的内存占用与允许增加的上限 (字节)"""
+        import psutil
+        import torch
+
+        if device.startswith('cuda'):
+            torch.cuda.reset_peak_memory_stats(device)
+            free, _ = torch.cuda.mem_get_info(device)
+            return torch.cuda.memory_allocated(device), free * AutoTuner.MEMORY_FRACTION
+        return psutil.Process().memory_info().rss, psutil.virtual_memory().available * AutoTuner.MEMORY_FRACTION
+
+    @staticmethod
+    def memory_used(device, baseline):
+        """自调优开始以来增加的内存占用 (CUDA 为峰值显存)"""
+        import psutil
+        import torch
+
+        if device.startswith('cuda'):
+            return max(0, torch.cuda.max_memory_allocated(device) - baseline)
+        return max(0, psutil.Process().memory_info().rss - baseline)
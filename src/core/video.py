@@ -1,11 +1,30 @@
 import os
+from contextlib import contextmanager
+from itertools import islice, repeat
+
 import cv2
 
-from src.core.log import logger, log_process
+from src.core.frames import FramePool, FrameReader, ThumbnailStrip
+from src.core.keypoints import FrameKeypoints
+from src.core.log import logger
+from src.core.metrics import Metrics, instrument
+from src.core.pipeline import Stage, Sink
 
 
 class Video:
-    def __init__(self, input_path, output_path) -> None:
+    # 推理参数
+    IMGSZ = 320
+    CONF = 0.5
+
+    def __init__(self, input_path, output_path, queue_size=0, thumbnail_width=0, decode_width=0) -> None:
+        """
+        Args:
+            input_path: 输入视频路径
+            output_path: 输出视频路径, 为空时不输出视频 (仅分析数据)
+            queue_size: 编码线程队列深度, 0 表示在调用线程中同步写入
+            thumbnail_width: 缩略图条宽度, 0 表示不生成
+            decode_width: 整帧推理前把帧缩小到的宽度, 0 表示原尺寸推理; 关键点映射回原始坐标, 标注仍绘制在原始帧上
+        """
         self.input_path = input_path
         self.output_path = output_path
          # 视频输入
@@ -15,71 +34,402 @@ class Video:
         self.fps = int(self.capture.get(cv2.CAP_PROP_FPS))
         self.frame_size = (int(self.capture.get(3)), int(self.capture.get(4)))
         logger.info(f"📊 视频信息: {self.total_frames}帧 | {self.fps}FPS | 尺寸 {self.frame_size}")
+        # 解码端缩小: 推理尺寸与映射回原始坐标的比例
+        self.scale = 1.0
+        self.inference_size = self.frame_size
+        if decode_width and self.frame_size[0] > decode_width:
+            self.scale = self.frame_size[0] / decode_width
+            self.inference_size = (decode_width, round(self.frame_size[1] / self.scale))
+            logger.info(f"🔽 推理前缩小: {self.frame_size} → {self.inference_size}")
+        self.pool = None  # 原始帧缓冲池
+        self.inference_pool = None  # 缩小帧缓冲池
         # 视频输出
-        self.writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'avc1'), self.fps, self.frame_size)
+        self.writer = self.open_writer(output_path, self.fps, self.frame_size) if output_path else None
+        self.thumbnails = ThumbnailStrip.writer(output_path, thumbnail_width) if output_path and thumbnail_width else None
+        self.encoder = Sink(self._write, queue_size, name='encoder') if output_path and queue_size > 0 else None
         self.processed = 0
+        self.inferred = 0  # 实际送入模型推理的帧数
 
     def close(self):
-        self.capture.release()
-        self.writer.release()
+        try:
+            if self.encoder:
+                self.encoder.close()
+        finally:
+            self.capture.release()
+            if self.writer:
+                self.writer.release()
+            if self.thumbnails:
+                self.thumbnails.close()
+
+    @staticmethod
+    def open_writer(output_path, fps, frame_size):
+        """创建输出视频编码器 (H.264), 当前 OpenCV 不支持时退回 mp4v"""
+        writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'avc1'), fps, frame_size)
+        if not writer.isOpened():
+            logger.warning("⚠️ H.264 编码器不可用, 改用 mp4v")
+            writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+        return writer
 
     @staticmethod
     def extract_frame(video_path, frame_number):
-        """从视频中提取指定帧号的图像"""
+        """从视频中提取指定帧号的图像 (RGB, 原分辨率)
+        通过常驻的 FrameReader 读取, 按关键帧索引选择顺序解码或定位, 并命中帧缓存
+        """
         if not video_path or not os.path.exists(video_path):
             return None
 
         try:
-            cap = cv2.VideoCapture(video_path)
-            # 设置帧位置
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            # 读取指定帧
-            success, frame = cap.read()
-            cap.release()
-            
-            if success:
-                # 将BGR格式转换为RGB格式
-                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                return frame_rgb
-            else:
+            frame = FrameReader.open(video_path).read(int(frame_number))
+            if frame is None:
                 print(f"无法读取帧 {frame_number}")
-                return None
+            return frame
         except Exception as e:
             print(f"提取帧时发生错误: {str(e)}")
             return None
 
-    @log_process
+    def seek(self, frame_number):
+        """跳转到指定帧, 之后从该帧开始解码"""
+        if frame_number:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+
+    def read_frames(self):
+        """逐帧解码视频
+        Yields:
+            ndarray: 原始帧
+        """
+        while self.capture.isOpened():
+            with Metrics.span('decode'):
+                success, frame = self.capture.read()
+            if not success:
+                break
+            yield frame
+
+    def read_batches(self, batch_size, depth=1):
+        """按批解码视频帧, 直接解码进帧缓冲池的连续数组
+        Args:
+            batch_size: 批处理大小
+            depth: 同时在用的最大批数 (缓冲池块数), 产出的批在之后第 depth 批解码时被覆盖
+        Yields:
+            ndarray: 原始帧批 (n, H, W, 3), 最后一批可能不足 batch_size
+        """
+        width, height = self.frame_size
+        if self.pool is None or self.pool.shape[0] != batch_size or self.pool.depth != depth:
+            self.pool = FramePool(batch_size, (height, width, 3), depth)
+            if self.scale != 1.0:
+                # 缩小帧只在推理调用内使用
+                self.inference_pool = FramePool(batch_size, (self.inference_size[1], self.inference_size[0], 3))
+        while self.capture.isOpened():
+            frame_buffer = self.pool.acquire()
+            count = 0
+            while count < batch_size:
+                with Metrics.span('decode'):
+                    success, _ = self.capture.read(frame_buffer[count])
+                if not success:
+                    break
+                count += 1
+            if count:
+                yield frame_buffer[:count]
+            if count < batch_size:
+                break
+        Metrics.gauge('frame_pool_bytes', self.pool.nbytes)
+
+    def inference_frames(self, frame_buffer):
+        """推理输入帧: 未设置缩小时即原始帧, 否则缩小到 inference_size (同样复用缓冲池)"""
+        if self.scale == 1.0:
+            return frame_buffer
+        resized = self.inference_pool.acquire()[:len(frame_buffer)]
+        with Metrics.span('resize'):
+            for frame, target in zip(frame_buffer, resized):
+                cv2.resize(frame, self.inference_size, dst=target, interpolation=cv2.INTER_AREA)
+        return resized
+
+    def track_batch(self, model, frame_buffer, reset=False):
+        """对一批原始帧执行跟踪推理, 缩小推理时关键点映射回原始坐标
+        Args:
+            reset: 是否先重置跟踪器 (视频的第一批)
+        Returns:
+            list: 原始坐标的 FrameKeypoints, 整批只做一次设备→主机拷贝
+        """
+        results = FrameKeypoints.from_results(self.track(model, self.inference_frames(frame_buffer), reset=reset))
+        self.inferred += len(frame_buffer)
+        if self.scale != 1.0:
+            results = [keypoints.shifted(0, 0, self.scale) for keypoints in results]
+        return results
+
+    @classmethod
+    def track(cls, model, frames, reset=False):
+        """对一批帧执行跟踪推理
+        总是以 persist=True 调用: 帧列表按 image0、image1... 命名, persist=False 时跟踪器每帧都会因"换了视频"而重置,
+        且部分 ultralytics 版本只按首次调用的 persist 注册跟踪回调. 跟踪器只在 reset 时 (新视频开始) 显式重置.
+        Args:
+            model: YOLO模型实例
+            frames: 帧列表或连续的帧批数组
+            reset: 是否先重置跟踪器 (常驻模型会被多个视频复用)
+        Returns:
+            list: YOLO处理结果
+        """
+        if reset:
+            cls.reset_tracker(model)
+        with Metrics.span('inference'):
+            return list(model.track(list(frames), imgsz=cls.IMGSZ, conf=cls.CONF, verbose=False, stream=True, persist=True))
+
+    @staticmethod
+    def reset_tracker(model):
+        """清空模型上已有跟踪器的轨迹并从1重新编号; 尚未跟踪过的模型在首次跟踪时新建跟踪器"""
+        for tracker in getattr(getattr(model, 'predictor', None), 'trackers', None) or ():
+            tracker.reset()
+
+    @classmethod
+    def predict(cls, model, frames, imgsz=None):
+        """对一批帧执行推理 (不更新跟踪器)
+        predict 与 track 共用模型的预测器和回调, 推理期间临时摘除跟踪回调, 跟踪器的轨迹与编号保持不变
+        Returns:
+            list: YOLO处理结果
+        """
+        with Metrics.span('inference'), cls.untracked(model):
+            return list(model.predict(list(frames), imgsz=imgsz or cls.IMGSZ, conf=cls.CONF, verbose=False, stream=True))
+
+    @staticmethod
+    @contextmanager
+    def untracked(model):
+        """临时摘除模型上注册的跟踪回调
+        部分 ultralytics 版本的跟踪回调不区分 predict / track, 探测推理会更新跟踪器并按跟踪结果过滤检测
+        """
+        callbacks = getattr(model, 'callbacks', None) or {}
+        saved = {event: callbacks[event] for event in ('on_predict_start', 'on_predict_postprocess_end') if event in callbacks}
+        for event, funcs in saved.items():
+            callbacks[event] = [f for f in funcs if getattr(getattr(f, 'func', f), '__module__', '') != 'ultralytics.trackers.track']
+        try:
+            yield
+        finally:
+            callbacks.update(saved)
+
+    @instrument
     def process_frames_batch(self, model, batch_size):
         """批量处理视频帧
         Args:
             model: YOLO模型实例
             batch_size: 批处理大小
         Yields:
-            tuple: (frame, result) 原始帧和YOLO处理结果
+            tuple: (frame, keypoints) 原始帧和原始坐标的 FrameKeypoints
         """
-        frame_buffer = []
-        while self.capture.isOpened():
-            success, frame = self.capture.read()
-            if not success: 
-                if frame_buffer:
-                    results = model.track(frame_buffer, imgsz=320, conf=0.5, verbose=False, stream=True)
-                    for k, result in enumerate(results):
-                        yield frame_buffer[k], result
+        for k, frame_buffer in enumerate(self.read_batches(batch_size)):
+            results = self.track_batch(model, frame_buffer, reset=k == 0)
+            for i, result in enumerate(results):
+                yield frame_buffer[i], result
+
+    @instrument
+    def process_frames_pipeline(self, model, batch_size, queue_size=4):
+        """流水线处理视频帧: 解码线程 → 推理线程 → 调用方(标注) → 编码线程
+        各阶段之间为有界队列, 推理在单线程内按帧序执行以保持跟踪器连续
+        Args:
+            model: YOLO模型实例
+            batch_size: 批处理大小
+            queue_size: 阶段间队列深度 (以批为单位)
+        Yields:
+            tuple: (frame, keypoints) 原始帧和原始坐标的 FrameKeypoints
+        """
+        # 在用的批: 解码队列与推理队列各 queue_size 批, 解码线程、推理线程与调用方各一批
+        decoder = Stage(self.read_batches(batch_size, 2 * queue_size + 3), queue_size, name='decoder')
+
+        def infer():
+            try:
+                for k, frame_buffer in enumerate(decoder):
+                    results = self.track_batch(model, frame_buffer, reset=k == 0)
+                    yield frame_buffer, results
+            finally:
+                decoder.close()
+
+        for frame_buffer, results in Stage(infer(), queue_size, name='inference'):
+            for i, result in enumerate(results):
+                yield frame_buffer[i], result
+
+    @instrument
+    def process_frames_adaptive(self, model, batch_size, sampler):
+        """自适应跳帧处理视频帧
+        平稳阶段每 sampler.stride 帧探测推理一次, 探测帧与上一推理帧之间平稳则插值中间帧,
+        否则整组逐帧推理并保持逐帧模式, 直到一批帧重新平稳.
+        Args:
+            model: YOLO模型实例
+            batch_size: 逐帧模式下的批处理大小
+            sampler: AdaptiveSampler 跳帧策略
+        Yields:
+            tuple: (frame, keypoints) 原始帧和 FrameKeypoints (插值帧 source 为 'interpolated')
+        """
+        frames = self.read_frames()
+        calls = 0
+        previous = None  # 最近一个推理帧的关键点
+        dense = True
+
+        def infer(frame_buffer):
+            nonlocal calls
+            results = self.track(model, frame_buffer, reset=calls == 0)
+            calls += 1
+            self.inferred += len(frame_buffer)
+            return FrameKeypoints.from_results(results, source='model')
+
+        while True:
+            frame_buffer = list(islice(frames, batch_size if dense else sampler.stride))
+            if not frame_buffer:
                 break
-            frame_buffer.append(frame)
-            if len(frame_buffer) == batch_size:
-                results = model.track(frame_buffer, imgsz=320, conf=0.5, verbose=False, stream=True)
+            moving = sampler.motion(frame_buffer) > sampler.motion_threshold
+            if dense or moving:
+                keypoints = infer(frame_buffer)
+                dense = moving or any(
+                    not sampler.is_stable(a, b) for a, b in zip([previous] + keypoints[:-1], keypoints)
+                )
+            else:
+                # 仅探测组内最后一帧, 探测推理不经过跟踪器, 沿用上一推理帧的跟踪ID
+                probe = FrameKeypoints.from_result(self.predict(model, frame_buffer[-1:])[0], source='model')
+                self.inferred += 1
+                if sampler.is_stable(previous, probe):
+                    probe.ids = previous.ids.copy()
+                    keypoints = sampler.interpolate(previous, probe, len(frame_buffer) - 1) + [probe]
+                else:
+                    keypoints = infer(frame_buffer)
+                    dense = True
+            previous = keypoints[-1]
+            for i, frame in enumerate(frame_buffer):
+                yield frame, keypoints[i]
+
+    @instrument
+    def process_frames_roi(self, model, batch_size, roi, depth=1):
+        """射手区域裁剪推理
+        每隔 roi.redetect_every 帧 (或跟丢时) 整帧检测定位射手, 其余帧只对射手周围的裁剪区域推理,
+        推理尺寸按裁剪区域缩放, 关键点映射回整帧坐标. 裁剪区域按射手移动速度覆盖整批帧;
+        某帧裁剪区域内未检出射手或射手贴近区域边缘时, 该帧改为整帧检测并更新区域.
+        Args:
+            model: YOLO模型实例
+            batch_size: 批处理大小
+            roi: ArcherRoi 裁剪区域跟踪器
+            depth: 同时在用的最大批数, 下游按帧缓冲 (如流水线队列) 时需大于1
+        Yields:
+            tuple: (frame, keypoints) 原始帧和整帧坐标的 FrameKeypoints
+        """
+        index = 0
+        for frame_buffer in self.read_batches(batch_size, depth):
+            if roi.needs_detection(index):
+                detected = FrameKeypoints.from_result(self.predict(model, frame_buffer[:1], roi.detect_imgsz)[0])
+                self.inferred += 1
+                roi.update(detected, index, detection=True)
+            region = roi.region(frame_buffer[0].shape, len(frame_buffer))
+            if region is None:
+                # 未找到射手, 本批输出空结果, 下一批重新检测
+                keypoints = [FrameKeypoints.empty(source='roi') for _ in frame_buffer]
+            else:
+                x0, y0, x1, y1 = region
+                crops = [frame[y0:y1, x0:x1] for frame in frame_buffer]
+                results = FrameKeypoints.from_results(self.predict(model, crops, roi.crop_imgsz(region, frame_buffer[0].shape)))
+                self.inferred += len(crops)
+                keypoints = []
                 for k, result in enumerate(results):
-                    yield frame_buffer[k], result
-                frame_buffer = []
+                    if roi.box is None:
+                        # 本批内已跟丢, 余下帧等待下一批重新检测
+                        keypoints.append(FrameKeypoints.empty(source='roi'))
+                        continue
+                    found = result.shifted(x0, y0, source='roi')
+                    archer = roi.update(found, index + k) if len(found) else found
+                    if not len(archer) or roi.at_edge(region, frame_buffer[k].shape):
+                        detected = self.predict(model, frame_buffer[k:k + 1], roi.detect_imgsz)[0]
+                        self.inferred += 1
+                        archer = roi.update(FrameKeypoints.from_result(detected, source='roi'), index + k, detection=True)
+                    keypoints.append(archer)
+            for k, frame in enumerate(frame_buffer):
+                yield frame, keypoints[k]
+            index += len(frame_buffer)
+
+    @instrument
+    def process_frames_cascade(self, light_model, heavy_model, batch_size, cascade, depth=1):
+        """轻量/重量模型级联处理视频帧
+        轻量模型跟踪每一帧, cascade 判定需要升级的帧再由重量模型推理 (同一批内合并为一次推理).
+        Args:
+            light_model: 轻量YOLO模型实例 (负责跟踪)
+            heavy_model: 重量YOLO模型实例
+            batch_size: 批处理大小
+            cascade: ModelCascade 级联策略
+            depth: 同时在用的最大批数, 下游按帧缓冲 (如流水线队列) 时需大于1
+        Yields:
+            tuple: (frame, keypoints) 原始帧和原始坐标的 FrameKeypoints (source 为产出该帧结果的模型)
+        """
+        for k, frame_buffer in enumerate(self.read_batches(batch_size, depth)):
+            inputs = self.inference_frames(frame_buffer)
+            results = self.track(light_model, inputs, reset=k == 0)
+            keypoints = FrameKeypoints.from_results(results, source=cascade.light_name)
+            escalate = [i for i, light in enumerate(keypoints) if cascade.needs_heavy(light)]
+            if escalate:
+                heavy = FrameKeypoints.from_results(self.predict(heavy_model, [inputs[i] for i in escalate]))
+                for i, result in zip(escalate, heavy):
+                    keypoints[i] = cascade.merge(keypoints[i], result)
+            self.inferred += len(frame_buffer) + len(escalate)
+            for i, frame in enumerate(frame_buffer):
+                yield frame, keypoints[i].shifted(0, 0, self.scale) if self.scale != 1.0 else keypoints[i]
+        Metrics.count('cascade_escalated_total', cascade.escalated)
+        logger.info(f"🪜 级联推理: {cascade.escalated}/{cascade.frames} 帧升级到 {cascade.heavy_name}")
+
+    @instrument
+    def process_frames_cached(self, cached, decode=True):
+        """使用缓存的关键点回放视频帧, 不执行推理
+        Args:
+            cached: CachedKeypoints 缓存数据
+            decode: 是否解码视频帧, 仅分析数据时无需原始帧
+        Yields:
+            tuple: (frame, keypoints) 原始帧 (不解码时为 None) 和 FrameKeypoints
+        """
+        frames = self.read_frames() if decode else repeat(None)
+        for k, frame in enumerate(frames):
+            if k >= len(cached):
+                break
+            yield frame, cached.frame(k)
 
     def write_frame(self, frame):
-        """写入处理后的帧到输出视频
+        """写入处理后的帧到输出视频, 不输出视频时只计数
         Args:
             frame: 处理后的帧
         """
         self.processed += 1
-        self.writer.write(frame)
+        if self.writer is None:
+            return
+        if self.encoder:
+            self.encoder.put(frame)
+        else:
+            self._write(frame)
+
+    def _write(self, frame):
+        with Metrics.span('encode'):
+            self.writer.write(frame)
+        if self.thumbnails:
+            self.thumbnails.write(frame)
+
+    @staticmethod
+    def frame_texts(index, arm_angle, spine_angle, action_state):
+        """标注视频每帧叠加的文本
+        Args:
+            action_state: 动作环节取值 (ActionState.value)
+        """
+        return (
+            f"processed: {index}",
+            f"Arm Angle: {arm_angle:.2f} deg",
+            f"Spine Tilt: {spine_angle:.2f} deg",
+            f"Technical process: {action_state}"
+        )
+
+    @staticmethod
+    def track_frame_texts(index, archers):
+        """多射手模式下每帧叠加的文本"""
+        return f"processed: {index}", f"Archers: {archers}"
+
+    @staticmethod
+    def draw_track_labels(frame, boxes, rows):
+        """多射手模式下在每个人的检测框上方标注目标ID、动作环节与双臂姿态角
+        Args:
+            boxes: 检测框 xyxy (persons, 4)
+            rows: [(目标ID, 双臂姿态角, 脊柱倾角, 动作环节取值)], 与 boxes 一一对应
+        """
+        for box, (track, arm_angle, spine_angle, action_state) in zip(boxes, rows):
+            x, y = int(box[0]), max(int(box[1]) - 10, 20)
+            cv2.putText(frame, f"ID {track} | {action_state} | {arm_angle:.1f} deg", (x, y),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+        return frame
 
     @staticmethod
     def draw_texts(frame, texts):
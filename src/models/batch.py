@@ -0,0 +1,320 @@
+import multiprocessing as mp
+import os
+import shutil
+import time
+
+from src.core.cache import KeypointCache, KeypointCacheWriter
+from src.core.chunks import VideoChunks
+from src.core.log import logger
+from src.core.metrics import Metrics
+from src.core.model import Model
+from src.core.records import Records
+from src.core.render import Renderer
+from src.core.registry import ModelRegistry
+from src.core.store import SessionStore
+from src.core.tuning import AutoTuner
+from src.core.video import Video
+from src.models.yolo_bow import YoloBow
+
+
+class BatchRunner:
+    """多视频并行批处理
+    进程池中每个工作进程只加载一次模型, 从共享任务队列中领取视频; 已有完整输出的视频自动跳过.
+    """
+
+    VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+    # 工作进程内常驻的模型与处理参数
+    _model = None
+    _options = None
+    _error = None
+    _metrics_path = None
+
+    def __init__(self, model_name='yolo11x-pose', device_name='auto', workers=1, threads_per_worker=None,
+                 metrics_path=None, metrics_port=0, store_path=None, archer=None, **options):
+        """
+        Args:
+            model_name: 模型名称
+            device_name: 设备名称
+            workers: 工作进程数
+            threads_per_worker: 每个工作进程的 torch/OpenCV 线程数, 默认均分CPU核数
+            metrics_path: 指标快照文件 (.json / .prom), 每处理完一个视频更新一次; 多进程时每个工作进程一个文件
+            metrics_port: 本地HTTP指标端口, 0 表示不开启; 多进程时第 k 个工作进程使用 端口+k-1
+            store_path: 训练记录库路径, 处理完成的视频切分为单次射箭后写入; 为空时不写入
+            archer: 写入训练记录库的射手名称
+            options: 透传给 YoloBow.process_video 的处理参数
+        """
+        self.model_name = model_name
+        self.device_name = device_name
+        self.workers = max(1, workers)
+        self.threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // self.workers)
+        self.metrics_path = metrics_path
+        self.metrics_port = metrics_port
+        self.store_path = store_path
+        self.archer = archer
+        self.options = {'model_name': model_name, 'device_name': device_name, 'threads': self.threads_per_worker, **options}
+
+    @classmethod
+    def list_videos(cls, input_dir):
+        """列出输入目录中的视频文件"""
+        return sorted(
+            os.path.join(input_dir, filename) for filename in os.listdir(input_dir)
+            if filename.lower().endswith(cls.VIDEO_EXTENSIONS)
+        )
+
+    @staticmethod
+    def output_path(input_path, output_dir):
+        return os.path.join(output_dir, f'output_{os.path.basename(input_path)}')
+
+    @staticmethod
+    def is_complete(output_path, annotate=True):
+        """输出是否完整: 数据文件在其余输出写完后才原子落盘, 另需标注视频 (仅数据模式为供渲染的逐帧关键点) 存在
+        Args:
+            annotate: 是否输出标注视频
+        """
+        if not os.path.exists(YoloBow.csv_path(output_path)):
+            return False
+        if annotate:
+            return os.path.exists(output_path)
+        return os.path.exists(os.path.join(YoloBow.keypoints_path(output_path), 'meta.json'))
+
+    def run(self, input_dir, output_dir, force=False, chunks=0):
+        """处理输入目录中的全部视频
+        Args:
+            input_dir: 输入目录
+            output_dir: 输出目录
+            force: 是否重新处理已完成的视频
+            chunks: 大于0时逐个视频处理, 每个视频切分为若干段由各工作进程并行推理
+        Returns:
+            list: 每个视频的处理摘要
+        """
+        summaries, tasks = [], []
+        annotate = self.options.get('annotate', True)
+        for input_path in self.list_videos(input_dir):
+            output_path = self.output_path(input_path, output_dir)
+            if not force and self.is_complete(output_path, annotate):
+                logger.info(f"⏭️ 跳过已完成: {input_path}")
+                summaries.append({'input': input_path, 'status': 'skipped'})
+            else:
+                if not force and os.path.exists(YoloBow.csv_path(output_path)):
+                    logger.warning(f"⚠️ 输出不完整, 重新处理: {input_path}")
+                tasks.append((input_path, output_path))
+
+        if tasks and self.options.get('int8') and not self.options.get('calibration_source'):
+            # INT8 默认使用第一个待处理视频做校准
+            self.options['calibration_source'] = tasks[0][0]
+        if chunks > 0 and tasks:
+            if self.workers == 1:
+                summaries.extend(self.run_chunked(input_path, output_path, chunks) for input_path, output_path in tasks)
+            else:
+                # 各视频共用一个工作进程池, 模型只在启动时加载一次
+                with self._pool(self.workers) as pool:
+                    summaries.extend(self.run_chunked(input_path, output_path, chunks, pool=pool) for input_path, output_path in tasks)
+        elif tasks and (self.workers == 1 or len(tasks) == 1):
+            self._init_worker(*self._worker_args())
+            summaries.extend(self._process(task) for task in tasks)
+        elif tasks:
+            with self._pool(len(tasks)) as pool:
+                summaries.extend(pool.imap_unordered(self._process, tasks, chunksize=1))
+
+        self.log_summary(summaries)
+        if self.store_path:
+            self.index_sessions(summaries)
+        return summaries
+
+    def index_sessions(self, summaries):
+        """处理完成的视频写入训练记录库 (在主进程中统一写入)"""
+        store = SessionStore(self.store_path)
+        try:
+            for s in summaries:
+                if s['status'] == 'ok':
+                    store.add_video(s['input'], s['csv'], archer=self.archer)
+        finally:
+            store.close()
+
+    def run_chunked(self, input_path, output_path, chunks=None, overlap_seconds=1.0, pool=None):
+        """单个长视频分段并行处理
+        各段在工作进程中推理, 按帧顺序拼接关键点后统一计算数据记录; 需要标注视频时再分段并行渲染.
+        数据文件在标注视频渲染完成后才落盘, 中断时不会被当作已完成.
+        Args:
+            input_path: 输入视频
+            output_path: 输出视频路径
+            chunks: 分段数, 默认等于工作进程数
+            overlap_seconds: 每段提前开始推理的时长 (秒), 用于预热跟踪器
+            pool: 已加载模型的工作进程池 (见 _pool), 推理与渲染共用; 为空且多进程时新建
+        Returns:
+            dict: 处理摘要
+        """
+        if pool is None and self.workers > 1:
+            with self._pool(self.workers) as pool:
+                return self.run_chunked(input_path, output_path, chunks, overlap_seconds, pool)
+        start_time = time.monotonic()
+        options = self.options
+        model_label = Model.label(self.model_name, options.get('backend', 'torch'), options.get('int8', False))
+        use_cache = options.get('use_cache', True)
+        annotate = options.get('annotate', True)
+        decode_width = options.get('decode_width', 0)
+        cache_key = YoloBow.cache_key(input_path, model_label, decode_width)
+        ignored = [name for name, enabled in (
+            ('级联推理', options.get('cascade_model')), ('裁剪推理', options.get('roi')),
+            ('自适应跳帧', options.get('adaptive_stride', 0) > 1), ('流水线', options.get('pipeline')),
+        ) if enabled]
+        if ignored:
+            logger.warning(f"⚠️ 分段处理不支持{'、'.join(ignored)}, 已忽略: 全部帧由 {self.model_name} 逐帧整帧推理")
+        if options.get('int8') and not options.get('calibration_source'):
+            options['calibration_source'] = input_path
+        try:
+            cached = KeypointCache.load(cache_key) if use_cache else None
+            keypoints_path = KeypointCache.path(cache_key)
+            inferred = 0
+            if cached is not None and not annotate:
+                shutil.copytree(keypoints_path, YoloBow.keypoints_path(output_path), dirs_exist_ok=True)
+            if cached is None:
+                video = Video(input_path, None)
+                video.close()
+                plan = VideoChunks.plan(video.total_frames, chunks or self.workers, round(video.fps * overlap_seconds))
+                chunk_dir = output_path.rsplit('.', 1)[0] + '_chunks'
+                tasks = [
+                    (input_path, os.path.join(chunk_dir, f'chunk{k}'), *bounds, options.get('batch_size', 12), decode_width)
+                    for k, bounds in enumerate(plan)
+                ]
+                logger.info(f"✂️ 分段处理 {input_path}: {video.total_frames}帧 | {len(plan)}段 | 预热 {plan[-1][1] - plan[-1][0]}帧")
+                if pool is None:
+                    if self._model is None:
+                        self._init_worker(*self._worker_args())
+                    inferred = sum(map(self._process_chunk, tasks))
+                else:
+                    inferred = sum(pool.imap(self._process_chunk, tasks))
+                # 拼接结果写入关键点缓存; 仅数据模式另存逐帧关键点供之后渲染
+                writers = []
+                if use_cache:
+                    writers.append(KeypointCache.writer(cache_key, model=model_label, imgsz=Video.IMGSZ, conf=Video.CONF))
+                if not annotate or not use_cache:
+                    writers.append(KeypointCacheWriter(YoloBow.keypoints_path(output_path), model=model_label))
+                VideoChunks.stitch([task[1] for task in tasks], writers)
+                for writer in writers:
+                    writer.close()
+                shutil.rmtree(chunk_dir, ignore_errors=True)
+                keypoints_path = writers[0].path
+                cached = KeypointCache.read(keypoints_path)
+            record_formats = options.get('record_formats', ('csv',))
+            multi_archer = options.get('multi_archer', False)
+            if annotate:
+                # 渲染读取暂存的数据文件, 视频完成后再替换为正式数据文件
+                stem, ext = os.path.splitext(output_path)
+                staged_csv = YoloBow.write_records(cached, f'{stem}.staging{ext}', record_formats, multi_archer)
+                Renderer(input_path, output_path, staged_csv, keypoints_path).render(self.workers, pool)
+                csv_path = Records.publish(staged_csv, YoloBow.csv_path(output_path))
+            else:
+                csv_path = YoloBow.write_records(cached, output_path, record_formats, multi_archer)
+        except Exception as e:
+            logger.exception(f"❌ 处理失败: {input_path}")
+            return {'input': input_path, 'status': 'failed', 'error': str(e)}
+
+        total_time = time.monotonic() - start_time
+        fps = len(cached) / total_time if total_time > 0 else 0
+        logger.info(f"✅ 分段处理完成: {len(cached)}帧 | 总耗时 {total_time:.1f}s | 平均FPS {fps:.1f} | 数据文件: {csv_path}")
+        return {
+            'input': input_path, 'status': 'ok', 'frames': len(cached), 'inferred': inferred, 'seconds': total_time,
+            'fps': fps, 'output': output_path if annotate else None, 'csv': csv_path,
+        }
+
+    def _worker_args(self):
+        return self.model_name, self.device_name, self.threads_per_worker, self.options, (self.metrics_path, self.metrics_port)
+
+    def _pool(self, tasks):
+        """创建加载好模型的工作进程池"""
+        workers = min(self.workers, tasks)
+        logger.info(f"🚀 启动 {workers} 个工作进程, 每进程 {self.threads_per_worker} 线程")
+        if self.options.get('backend', 'torch') != 'torch':
+            # 先在主进程中导出并缓存模型, 避免各工作进程同时导出
+            Model.get_model(self.model_name, self.options['backend'], self.options.get('int8', False),
+                            self.options.get('calibration_source'))
+        context = mp.get_context('spawn')
+        args = self._worker_args() + (context.Value('i', 0),)
+        return context.Pool(workers, initializer=self._init_worker, initargs=args)
+
+    @classmethod
+    def _init_worker(cls, model_name, device_name, threads, options, metrics=(None, 0), counter=None):
+        AutoTuner.startup(threads)
+        cls._options = options
+        cls._init_metrics(*metrics, counter)
+        if cls._model is not None:
+            # 同一进程内再次初始化 (单进程模式的多次运行) 时归还后重新借用, 相同模型直接复用
+            ModelRegistry.release(cls._model)
+            cls._model = None
+        try:
+            cls._model = ModelRegistry.acquire(
+                model_name, device_name, options.get('backend', 'torch'), options.get('int8', False),
+                options.get('calibration_source'),
+            )
+        except Exception as e:
+            # 初始化失败时进程池会不断重建进程, 改为在任务中上报
+            logger.exception("❌ 模型加载失败")
+            cls._error = e
+
+    @classmethod
+    def _init_metrics(cls, path, port, counter=None):
+        """开启指标采集; 多进程时按工作进程序号区分快照文件与端口"""
+        if not path and not port:
+            return
+        Metrics.enable()
+        worker = 0
+        if counter is not None:
+            with counter.get_lock():
+                counter.value += 1
+                worker = counter.value
+        if path:
+            stem, ext = os.path.splitext(path)
+            cls._metrics_path = f'{stem}.worker{worker}{ext}' if worker else path
+        if port:
+            Metrics.serve(port + max(worker - 1, 0))
+
+    @classmethod
+    def _process(cls, task):
+        input_path, output_path = task
+        if cls._error is not None:
+            return {'input': input_path, 'status': 'failed', 'error': f"模型加载失败: {cls._error}"}
+        try:
+            summary = YoloBow.process_video(input_path, output_path, model=cls._model, **cls._options)
+            return {'input': input_path, 'status': 'ok', **summary}
+        except Exception as e:
+            logger.exception(f"❌ 处理失败: {input_path}")
+            Metrics.count('videos_failed_total')
+            return {'input': input_path, 'status': 'failed', 'error': str(e)}
+        finally:
+            if cls._metrics_path:
+                Metrics.write(cls._metrics_path)
+
+    @classmethod
+    def _process_chunk(cls, task):
+        if cls._error is not None:
+            raise RuntimeError(f"模型加载失败: {cls._error}")
+        try:
+            input_path, chunk_path, warm_start, start, end, batch_size, decode_width = task
+            if batch_size <= 0:
+                options = cls._options
+                backend = options.get('backend', 'torch')
+                batch_size = AutoTuner.resolve(
+                    cls._model, Model.label(options['model_name'], backend, options.get('int8', False)),
+                    input_path, batch_size, options.get('threads', 0), decode_width, backend,
+                )
+            return VideoChunks.process_chunk(cls._model, input_path, chunk_path, warm_start, start, end, batch_size, decode_width)
+        finally:
+            if cls._metrics_path:
+                Metrics.write(cls._metrics_path)
+
+    @staticmethod
+    def log_summary(summaries):
+        """输出每个文件的处理汇总"""
+        lines = []
+        for s in summaries:
+            name = os.path.basename(s['input'])
+            if s['status'] == 'ok':
+                lines.append(f"  ✅ {name}: {s['frames']}帧 (推理 {s['inferred']}帧) | {s['seconds']:.1f}s | FPS {s['fps']:.1f}")
+            elif s['status'] == 'skipped':
+                lines.append(f"  ⏭️ {name}: 已跳过")
+            else:
+                lines.append(f"  ❌ {name}: {s['error']}")
+        failed = sum(s['status'] == 'failed' for s in summaries)
+        logger.info(f"📋 批处理汇总: 共 {len(summaries)} 个, 失败 {failed} 个\n" + "\n".join(lines))
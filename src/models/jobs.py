@@ -0,0 +1,260 @@
+import hashlib
+import inspect
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from src.core.cache import KeypointCache
+from src.core.log import logger
+from src.core.model import Model
+from src.core.registry import ModelRegistry
+from src.core.tuning import AutoTuner
+from src.models.yolo_bow import YoloBow
+
+
+class JobCancelled(Exception):
+    """任务在处理过程中被取消"""
+
+
+class Job:
+    """后台视频分析任务, 帧循环通过 progress 上报进度并检查取消"""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __init__(self, key, input_path, output_path, options):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.input_path = input_path
+        self.output_path = output_path
+        self.options = options
+        self.status = self.QUEUED
+        self.processed = 0
+        self.total = 0
+        self.started_at = None
+        self.result = None
+        self.error = None
+        self.cached = False  # 是否直接复用了已有结果
+        self.subscribers = 0  # 等待该任务的会话数, 全部取消时才真正中止
+        self.finished_at = None
+        self._cancel = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def finished(self):
+        return self._done.is_set()
+
+    @property
+    def fps(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def progress(self, processed, total):
+        """帧循环进度回调, 已请求取消时抛出 JobCancelled 中止处理"""
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self.processed = processed
+        self.total = total
+
+    def cancel(self):
+        self._cancel.set()
+
+    def wait(self, timeout=None):
+        """等待任务结束
+        Returns:
+            bool: 是否已结束
+        """
+        return self._done.wait(timeout)
+
+    def finish(self, status, result=None, error=None):
+        self.status = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.monotonic()
+        self._done.set()
+
+
+class JobScheduler:
+    """WebUI 后台任务调度
+    任务进入先进先出队列, 由最多 max_concurrency 个后台线程处理; 模型从 ModelRegistry 借用,
+    按 (模型, 设备, 后端, INT8) 常驻复用, 不随任务重新加载.
+    以 (视频内容哈希, 影响输出的处理参数) 去重: 相同任务排队或处理中时共享同一任务, 已有完整输出时直接返回结果.
+    共享任务按订阅数计数, 最后一个订阅者取消时才中止; 已结束的任务超过保留时长或数量上限后移出任务表.
+    """
+
+    # 只影响速度、不影响输出内容的处理参数, 不参与去重
+    RUNTIME_OPTIONS = ('device_name', 'batch_size', 'pipeline', 'queue_size', 'use_cache', 'threads', 'model', 'progress')
+    FINISHED_TTL = 3600  # 已结束任务的保留时长 (秒)
+    MAX_FINISHED = 256  # 保留的已结束任务数上限
+
+    def __init__(self, max_concurrency=1, output_dir=os.path.join('data', 'output'), finished_ttl=FINISHED_TTL,
+                 max_finished=MAX_FINISHED):
+        """
+        Args:
+            max_concurrency: 同时处理的任务数
+            output_dir: 输出目录
+            finished_ttl: 已结束任务的保留时长 (秒), 超时后 get 不再返回
+            max_finished: 保留的已结束任务数上限, 超出时先移除最早结束的
+        """
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.max_concurrency = max(1, max_concurrency)
+        self.threads = max(1, (os.cpu_count() or 1) // self.max_concurrency)  # 每个任务的线程预算 (自动调优用)
+        AutoTuner.startup(self.threads)  # 线程数为进程级设置, 在调度器创建时设置一次
+        self.output_dir = output_dir
+        os.makedirs(output_dir, exist_ok=True)
+        self._queue = deque()
+        self._jobs = {}  # 任务ID → 任务
+        self._by_key = {}  # 去重键 → 最近的任务
+        self._condition = threading.Condition()
+        self._workers = []
+
+    @classmethod
+    def job_key(cls, input_path, **options):
+        """任务去重键: 视频内容哈希、模型与所有影响输出的处理参数 (取默认值的参数省略)
+        Args:
+            input_path: 输入视频
+            options: YoloBow.process_video 的处理参数
+        Returns:
+            str: 去重键
+        """
+        defaults = {name: param.default for name, param in inspect.signature(YoloBow.process_video).parameters.items()
+                    if param.default is not inspect.Parameter.empty}
+        options = {**defaults, **options}
+        key = f"{KeypointCache.file_hash(input_path)}_{Model.label(options['model_name'], options['backend'], options['int8'])}"
+        excluded = {'input_path', 'output_path', 'model_name', 'backend', 'int8', *cls.RUNTIME_OPTIONS}
+        extra = [f"{name}={cls._normalize(value)}" for name, value in sorted(options.items())
+                 if name not in excluded and cls._normalize(value) != cls._normalize(defaults.get(name))]
+        return '_'.join([key, *extra])
+
+    @staticmethod
+    def _normalize(value):
+        """列表与元组等价, 便于比较"""
+        return tuple(value) if isinstance(value, list) else value
+
+    def output_path(self, input_path, key):
+        """按去重键生成输出路径, 同名的不同视频互不覆盖"""
+        base_name = os.path.splitext(os.path.basename(input_path))[0]
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=5).hexdigest()
+        return os.path.join(self.output_dir, f"{base_name}_{digest}_processed.mp4")
+
+    def submit(self, input_path, **options):
+        """提交分析任务
+        Args:
+            input_path: 输入视频
+            options: 透传给 YoloBow.process_video 的处理参数
+        Returns:
+            Job: 新建或复用的任务
+        """
+        key = self.job_key(input_path, **options)
+        output_path = self.output_path(input_path, key)
+        with self._condition:
+            self._evict()
+            job = self._by_key.get(key)
+            if job is not None and (not job.finished or job.status == Job.DONE and self.is_complete(output_path)):
+                job.subscribers += 1
+                logger.info(f"♻️ 复用任务 {job.id}: {input_path} (订阅 {job.subscribers})")
+                return job
+            job = Job(key, input_path, output_path, options)
+            job.subscribers = 1
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            if self.is_complete(output_path):
+                # 相同内容已有完整输出, 直接返回
+                job.cached = True
+                job.finish(Job.DONE, {'output': output_path, 'csv': YoloBow.csv_path(output_path)})
+                logger.info(f"♻️ 已有分析结果: {input_path} → {output_path}")
+                return job
+            self._queue.append(job)
+            self._ensure_workers()
+            self._condition.notify()
+        logger.info(f"📥 任务 {job.id} 排队: {input_path} (队列 {len(self._queue)})")
+        return job
+
+    @staticmethod
+    def is_complete(output_path):
+        return os.path.exists(output_path) and os.path.exists(YoloBow.csv_path(output_path))
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def position(self, job):
+        """任务前面还在排队的任务数, 不在队列中时返回 -1"""
+        with self._condition:
+            try:
+                return self._queue.index(job)
+            except ValueError:
+                return -1
+
+    def cancel(self, job_id):
+        """取消订阅任务: 其他会话仍在等待时只减少订阅数; 最后一个订阅者取消时, 排队中的直接移出队列, 处理中的在下一帧中止
+        Returns:
+            bool: 是否取消了未结束的任务 (含仅退订)
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.finished:
+            return False
+        with self._condition:
+            job.subscribers = max(0, job.subscribers - 1)
+            if job.subscribers:
+                logger.info(f"🔕 退订任务 {job.id}, 仍有 {job.subscribers} 个会话等待")
+                return True
+            job.cancel()
+            if job in self._queue:
+                self._queue.remove(job)
+                job.finish(Job.CANCELLED)
+        logger.info(f"🛑 取消任务 {job.id}")
+        return True
+
+    def _evict(self):
+        """移出超过保留时长或超出数量上限的已结束任务 (须持有锁)"""
+        now = time.monotonic()
+        finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.finished_at)
+        expired = len(finished) - self.max_finished
+        for i, job in enumerate(finished):
+            if i >= expired and now - job.finished_at <= self.finished_ttl:
+                break
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+
+    def _ensure_workers(self):
+        self._workers = [t for t in self._workers if t.is_alive()]
+        while len(self._workers) < self.max_concurrency:
+            thread = threading.Thread(target=self._work, name=f'job-worker{len(self._workers)}', daemon=True)
+            thread.start()
+            self._workers.append(thread)
+
+    def _work(self):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                job = self._queue.popleft()
+            self._run(job)
+
+    def _run(self, job):
+        options = job.options
+        job.status = Job.RUNNING
+        job.started_at = time.monotonic()
+        model = None
+        try:
+            model = ModelRegistry.acquire(options.get('model_name', 'yolo11x-pose'), options.get('device_name', 'auto'),
+                                          options.get('backend', 'torch'), options.get('int8', False))
+            result = YoloBow.process_video(job.input_path, job.output_path, model=model, progress=job.progress,
+                                           **{'threads': self.threads, **options})
+            job.finish(Job.DONE, result)
+        except JobCancelled:
+            logger.info(f"🛑 任务 {job.id} 已中止: {job.processed}/{job.total}帧")
+            job.finish(Job.CANCELLED)
+        except Exception as e:
+            logger.exception(f"❌ 任务 {job.id} 失败: {job.input_path}")
+            job.finish(Job.FAILED, error=str(e))
+        finally:
+            if model is not None:
+                ModelRegistry.release(model)
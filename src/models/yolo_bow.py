@@ -1,55 +1,344 @@
-from datetime import datetime
-import pandas as pd
+import os
+import time
 
-from src.core.device import Device
+import cv2
+import numpy as np
+
+from src.core.adaptive import AdaptiveSampler
+from src.core.cache import KeypointCache, KeypointCacheWriter
+from src.core.cascade import ModelCascade
+from src.core.frames import ThumbnailStrip
+from src.core.keypoints import FrameKeypoints
 from src.core.model import Model
+from src.core.phase import PhaseTracker, TrackPhases
+from src.core.pipeline import Stage
 from src.core.pose import Pose
+from src.core.records import Records
+from src.core.registry import ModelRegistry
+from src.core.render import Renderer
+from src.core.roi import ArcherRoi
+from src.core.series import AngleRate
+from src.core.tuning import AutoTuner
 from src.core.video import Video
 from src.core.log import logger
+from src.core.metrics import Metrics
+from src.enums.action_state import ActionState
 
 class YoloBow:
     @classmethod
-    def process_video(cls, input_path, output_path, model_name='yolo11x-pose', device_name='auto', batch_size=12):
-        start_time = datetime.now()
+    def load_model(cls, model_name='yolo11x-pose', device_name='auto', backend='torch', int8=False, calibration_source=None):
+        """加载新的模型实例到指定设备, 导出的 onnx / openvino 模型在CPU上推理; 需要复用时使用 ModelRegistry"""
+        return ModelRegistry.load(model_name, device_name, backend, int8, calibration_source)
+
+    @staticmethod
+    def csv_path(output_path):
+        """输出视频对应的数据文件路径"""
+        return output_path.rsplit('.', 1)[0] + '_data.csv'
+
+    @staticmethod
+    def keypoints_path(output_path):
+        """仅分析数据时保存的逐帧关键点目录, 供之后渲染标注视频"""
+        return output_path.rsplit('.', 1)[0] + '_keypoints'
+
+    @staticmethod
+    def cache_key(input_path, model_name, decode_width=0):
+        """关键点缓存键, 缩小推理的结果与原尺寸推理分开缓存"""
+        model_name = f"{model_name}_w{decode_width}" if decode_width else model_name
+        return KeypointCache.key(input_path, model_name, Video.IMGSZ, Video.CONF)
+
+    @staticmethod
+    def is_rendered(output_path, frames, thumbnail_width=0):
+        """标注视频是否已完整输出: 帧数一致且不晚于数据文件 (数据文件最后落盘), 需要缩略图时缩略图也已生成"""
+        csv_path = YoloBow.csv_path(output_path)
+        if not os.path.exists(output_path) or not os.path.exists(csv_path) or os.path.getmtime(output_path) > os.path.getmtime(csv_path):
+            return False
+        if thumbnail_width and not os.path.exists(ThumbnailStrip.paths(output_path)[1]):
+            return False
+        capture = cv2.VideoCapture(output_path)
+        try:
+            return int(capture.get(cv2.CAP_PROP_FRAME_COUNT)) == frames
+        finally:
+            capture.release()
+
+    @classmethod
+    def reanalyze(cls, input_path, output_path, model_name='yolo11x-pose', record_formats=('csv',), multi_archer=False,
+                  decode_width=0):
+        """仅使用关键点缓存重算姿态数据与动作环节, 不解码视频、不执行推理
+        Args:
+            multi_archer: 是否按跟踪目标分别分析 (见 process_video)
+            decode_width: 生成缓存时的推理缩小宽度 (见 process_video)
+        Returns:
+            dict: 处理摘要, 缓存未命中时返回 None
+        """
+        start_time = time.monotonic()
+        cached = KeypointCache.load(cls.cache_key(input_path, model_name, decode_width))
+        if cached is None:
+            return None
+
+        csv_path = cls.write_records(cached, output_path, record_formats, multi_archer)
+
+        total_time = time.monotonic() - start_time
+        logger.info(f"✅ 重新分析完成: {len(cached)}帧 | 总耗时 {total_time:.2f}s | 数据文件: {csv_path}")
+        return {'frames': len(cached), 'seconds': total_time, 'output': output_path, 'csv': csv_path}
+
+    @classmethod
+    def write_records(cls, cached, output_path, record_formats=('csv',), multi_archer=False):
+        """由整段视频的关键点批量计算姿态数据与动作环节并写出数据记录
+        Args:
+            cached: CachedKeypoints
+            multi_archer: 是否按跟踪目标分别分析, 每个 (帧, 目标) 一行
+        Returns:
+            str: 数据文件路径
+        """
+        metrics = Pose.compute_metrics(cached.xy)
+        counts = np.asarray(cached.counts)
+        # 按 (帧, 人) 顺序展开有效检测
+        valid = np.arange(metrics['arm'].shape[1]) < counts[:, None]
+        if multi_archer:
+            return cls._write_track_records(cached, metrics, valid, output_path, record_formats)
+        # 离线批量标注动作环节后取每帧最后一人
+        labels = PhaseTracker.label(metrics['arm'][valid])
+        arm_angles = np.zeros(len(counts))
+        spine_angles = np.zeros(len(counts))
+        action_states = np.full(len(counts), ActionState.UNKNOWN.value, dtype='<U16')
+        detected = counts > 0
+        last = np.cumsum(counts)[detected] - 1
+        arm_angles[detected] = metrics['arm'][valid][last]
+        spine_angles[detected] = metrics['spine'][valid][last]
+        action_states[detected] = labels[last]
+
+        velocities, accelerations = AngleRate.compute(arm_angles)
+
+        csv_path = cls.csv_path(output_path)
+        records = Records(csv_path, formats=record_formats)
+        for processed in range(len(counts)):
+            records.append(processed, round(arm_angles[processed], 2), round(spine_angles[processed], 2), action_states[processed],
+                           round(velocities[processed], 2), round(accelerations[processed], 2))
+        records.close()
+        return csv_path
+
+    @classmethod
+    def _write_track_records(cls, cached, metrics, valid, output_path, record_formats):
+        """多射手数据记录: 按目标分组批量标注动作环节与计算角速度, 按 (帧号, 目标) 顺序写出"""
+        frames, persons = np.nonzero(valid)
+        ids = np.asarray(cached.ids)[valid]
+        keys = np.where(ids >= 0, ids, -1 - persons)
+        arm_angles = metrics['arm'][valid].astype(np.float64)
+        spine_angles = metrics['spine'][valid]
+        action_states = TrackPhases.label(keys, arm_angles, frames)
+        velocities = np.full(len(keys), np.nan)
+        accelerations = np.full(len(keys), np.nan)
+        for key in np.unique(keys):
+            mask = keys == key
+            velocities[mask], accelerations[mask] = AngleRate.compute(arm_angles[mask])
+
+        csv_path = cls.csv_path(output_path)
+        records = Records(csv_path, formats=record_formats, columns=Records.TRACK_COLUMNS)
+        for i in range(len(keys)):
+            records.append(frames[i], keys[i], round(arm_angles[i], 2), round(spine_angles[i], 2), action_states[i],
+                           round(velocities[i], 2), round(accelerations[i], 2))
+        records.close()
+        return csv_path
+
+    @classmethod
+    def process_video(cls, input_path, output_path, model_name='yolo11x-pose', device_name='auto', batch_size=12,
+                      pipeline=False, queue_size=4, record_formats=('csv',), model=None, use_cache=True,
+                      thumbnail_width=0, adaptive_stride=0, roi=False, backend='torch', int8=False, calibration_source=None,
+                      annotate=True, progress=None, multi_archer=False, decode_width=0, threads=0, cascade_model=None,
+                      cascade_conf=ModelCascade.CONF_THRESHOLD):
+        """处理视频并输出标注视频与CSV数据
+        Args:
+            batch_size: 批处理大小, 0 表示按 (模型, 设备, 分辨率) 自动调优, 调优结果保存后复用
+            model: 已加载的模型实例, 为空时按 model_name / device_name 从 ModelRegistry 借用常驻模型
+            pipeline: 是否启用解码/推理/标注/编码流水线
+            queue_size: 流水线各阶段之间的队列深度
+            record_formats: 数据输出格式, 可选 csv / npz / parquet
+            use_cache: 是否使用关键点缓存, 命中时跳过推理
+            thumbnail_width: 随输出视频生成的逐帧缩略图宽度, 0 表示不生成
+            adaptive_stride: 自适应跳帧的最大推理间隔, 0 表示逐帧推理
+            roi: 是否只对射手周围的裁剪区域推理
+            backend: 推理后端 torch / onnx / openvino
+            int8: 是否使用INT8量化模型 (仅 onnx / openvino)
+            calibration_source: INT8校准用的视频, 为空时使用当前输入视频
+            annotate: 是否绘制并输出标注视频; 为 False 时只输出数据, 逐帧关键点另存供 render 渲染
+            progress: 进度回调 progress(已处理帧数, 总帧数), 每帧调用; 抛出异常即中止处理, 不生成数据文件
+            multi_archer: 多射手模式, 按跟踪ID分别判断每个人的动作环节, 数据记录按 (帧号, 目标ID) 每人一行
+            decode_width: 整帧推理前把帧缩小到的宽度 (如 4K 输入设为 1280), 0 表示原尺寸推理; 不影响裁剪/跳帧推理
+            threads: 自动调优时的线程预算, 0 表示CPU核数
+            cascade_model: 级联推理的轻量模型 (如 yolo11n-pose), 逐帧跟踪, 仅门控关键点置信度低或接近环节分界的帧
+                交给 model_name 重量模型; 数据记录追加"推理模型"列. 为空时不级联, 不与裁剪/跳帧推理同时使用
+            cascade_conf: 级联升级的肩、肘、髋关键点置信度阈值
+        Returns:
+            dict: 处理摘要 (帧数、耗时、FPS、输出路径)
+        """
+        start_time = time.monotonic()
         logger.info(f"▶️ 开始处理 {input_path} → {output_path}")
 
-        device = Device.get_device(device_name)
-        model = Model.get_model(model_name)
-        model.to(device)
-        logger.info(f"✅ 加载 {model.model_name} 模型到 {device} 设备")
+        model_label = Model.label(model_name, backend, int8)
+        if cascade_model and (roi or adaptive_stride > 1):
+            logger.warning("⚠️ 级联推理不与裁剪/跳帧推理同时使用, 已忽略级联")
+            cascade_model = None
+        cache_key = cls.cache_key(input_path, model_label, decode_width) if use_cache else None
+        cached = KeypointCache.load(cache_key) if cache_key else None
+        if cached is not None and annotate and not cascade_model and cls.is_rendered(output_path, len(cached), thumbnail_width):
+            # 标注视频已由同一份关键点完整输出, 只重写数据文件, 不再解码、绘制与编码
+            csv_path = cls.write_records(cached, output_path, record_formats, multi_archer)
+            total_time = time.monotonic() - start_time
+            logger.info(f"♻️ 复用标注视频, 仅重写数据: {len(cached)}帧 | 总耗时 {total_time:.2f}s | 数据文件: {csv_path}")
+            return {'frames': len(cached), 'inferred': 0, 'seconds': total_time, 'fps': len(cached) / total_time if total_time > 0 else 0,
+                    'output': output_path, 'csv': csv_path}
+        cache_writer = None
+        leased = []  # 从 ModelRegistry 借用的模型, 结束时归还
+        cascade = None
+
+        video = Video(input_path, output_path if annotate else None,
+                      queue_size=queue_size if pipeline else 0, thumbnail_width=thumbnail_width, decode_width=decode_width)
+        if cached is not None:
+            frames = video.process_frames_cached(cached, decode=annotate)
+        else:
+            if model is None:
+                model = ModelRegistry.acquire(model_name, device_name, backend, int8, calibration_source or input_path)
+                leased.append(model)
+            if cascade_model:
+                # 轻量模型处理每一帧, 按轻量模型调优批大小
+                light = ModelRegistry.acquire(cascade_model, device_name, backend, int8, calibration_source or input_path)
+                leased.append(light)
+                cascade = ModelCascade(Model.label(cascade_model, backend, int8), model_label, cascade_conf)
+                batch_size = AutoTuner.resolve(light, cascade.light_name, input_path, batch_size, threads, decode_width, backend)
+            else:
+                batch_size = AutoTuner.resolve(model, model_label, input_path, batch_size, threads, decode_width, backend)
+            if cascade or roi or adaptive_stride > 1:
+                # 流水线按帧排队 queue_size 批, 另有生成中与标注中各一批
+                depth = queue_size + 2 if pipeline else 1
+                if cascade:
+                    frames = video.process_frames_cascade(light, model, batch_size, cascade, depth)
+                elif roi:
+                    frames = video.process_frames_roi(model, batch_size, ArcherRoi(), depth)
+                else:
+                    frames = video.process_frames_adaptive(model, batch_size, AdaptiveSampler(stride=adaptive_stride))
+                if pipeline:
+                    frames = Stage(frames, queue_size * batch_size, name='inference')
+            else:
+                if pipeline:
+                    frames = video.process_frames_pipeline(model, batch_size, queue_size)
+                else:
+                    frames = video.process_frames_batch(model, batch_size)
+                # 仅缓存整帧逐帧推理的关键点, 裁剪/插值/级联结果不写入缓存
+                if cache_key:
+                    cache_writer = KeypointCache.writer(cache_key, model=model_label, imgsz=Video.IMGSZ, conf=Video.CONF)
+        # 数据记录 帧序号、双臂姿态角、脊柱倾角、技术环节
+        csv_path = cls.csv_path(output_path)
+        columns = Records.TRACK_COLUMNS if multi_archer else Records.COLUMNS
+        records = Records(csv_path, formats=record_formats, columns=columns + Records.SOURCE_COLUMNS if cascade_model else columns)
 
-        video = Video(input_path, output_path)
-        # 数据记录 双臂姿态角、脊柱倾角、技术环节、帧序号
-        records = pd.DataFrame(columns=['帧号', '双臂姿态角', '脊柱倾角', '动作环节'])
+        tracker = PhaseTracker()
+        rate = AngleRate()
+        phases = TrackPhases()  # 多射手模式下每个目标一个状态机
+        rates = {}
+        keypoints_writer = None if annotate else KeypointCacheWriter(cls.keypoints_path(output_path), model=model_label)
 
         # 处理循环
-        for processed, (frame, result) in enumerate(video.process_frames_batch(model, batch_size)):
-            # 分析姿态
-            frame, arm_angle, spine_angle, action_state = Pose.analyze_frame(frame, result)
-            
-            # 添加文本信息
-            frame = Video.draw_texts(frame, (
-                f"processed: {processed}", 
-                f"Arm Angle: {arm_angle:.2f} deg",
-                f"Spine Tilt: {spine_angle:.2f} deg", 
-                f"Technical process: {action_state.value}"
-            ))
-
-            # 记录数据
-            records.loc[len(records)] = [processed, round(arm_angle, 2), round(spine_angle, 2), action_state.value]
-            # 写入帧
-            video.write_frame(frame)
-
-        # 收尾工作
-        video.close()
-        # 创建CSV文件
-        csv_path = output_path.rsplit('.', 1)[0] + '_data.csv'
-        records.to_csv(csv_path, index=False, encoding='utf-8')
-
-        total_time = (datetime.now() - start_time).total_seconds()
+        try:
+            for processed, (frame, result) in enumerate(frames):
+                if cache_writer or keypoints_writer:
+                    keypoints = result if isinstance(result, FrameKeypoints) else FrameKeypoints.from_result(result)
+                    for writer in (cache_writer, keypoints_writer):
+                        if writer:
+                            writer.append(keypoints)
+                # 级联推理记录产出该帧的模型, 命中缓存时均为重量模型
+                source = (result.source if cascade else model_label,) if cascade_model else ()
+                if multi_archer:
+                    frame = cls._process_tracks(frame, result, processed, phases, rates, records, annotate, source)
+                else:
+                    # 分析姿态
+                    with Metrics.span('analyze'):
+                        frame, arm_angle, spine_angle, action_state = Pose.analyze_frame(frame, result, tracker, draw=annotate)
+
+                    # 添加文本信息
+                    if annotate:
+                        with Metrics.span('overlay'):
+                            frame = Video.draw_texts(frame, Video.frame_texts(processed, arm_angle, spine_angle, action_state.value))
+
+                    # 记录数据
+                    with Metrics.span('records'):
+                        velocity, acceleration = rate.update(arm_angle)
+                        records.append(processed, round(arm_angle, 2), round(spine_angle, 2), action_state.value,
+                                       round(velocity, 2), round(acceleration, 2), *source)
+                # 写入帧 (流水线模式下为入队耗时)
+                with Metrics.span('write'):
+                    video.write_frame(frame)
+                if progress:
+                    progress(processed + 1, video.total_frames)
+        except BaseException:
+            # 中止或出错时释放视频读写并丢弃未完成的数据文件
+            if hasattr(frames, 'close'):
+                frames.close()
+            video.close()
+            records.abort()
+            raise
+        finally:
+            for leased_model in leased:
+                ModelRegistry.release(leased_model)
+
+        # 收尾工作: 数据文件最后落盘, 存在即表示其余输出已完整
+        with Metrics.span('finalize'):
+            video.close()
+            if cache_writer:
+                cache_writer.close()
+            if keypoints_writer:
+                keypoints_writer.close()
+            records.close()
+
+        total_time = time.monotonic() - start_time
+        processed = video.processed
+        fps = processed / total_time if total_time > 0 else 0
+        Metrics.observe('video_seconds', total_time)
+        Metrics.gauge('video_fps', fps, video=os.path.basename(input_path))
+        Metrics.count('videos_total')
+        output = output_path if annotate else None
         logger.info(
-            f"✅ 处理完成: {processed}帧 | 总耗时 {total_time:.1f}s | "
-            f"平均FPS {processed/total_time:.1f}\n"
-            f"输出文件: {output_path}\n"
+            f"✅ 处理完成: {processed}帧 | 推理 {video.inferred}帧 | 总耗时 {total_time:.1f}s | "
+            f"平均FPS {fps:.1f}\n"
+            f"输出文件: {output or '无 (仅数据)'}\n"
             f"数据文件: {csv_path}"
-        )
\ No newline at end of file
+        )
+        return {
+            'frames': processed, 'inferred': video.inferred, 'seconds': total_time, 'fps': fps,
+            'output': output, 'csv': csv_path,
+        }
+
+    @staticmethod
+    def _process_tracks(frame, result, processed, phases, rates, records, annotate, source=()):
+        """多射手模式的单帧分析、标注与记录
+        Args:
+            source: 追加到每行末尾的列值 (级联推理的推理模型)
+        Returns:
+            frame: 标注后的帧 (不标注时为原始帧)
+        """
+        with Metrics.span('analyze'):
+            frame, keypoints, rows = Pose.analyze_tracks(frame, result, phases, draw=annotate)
+        if annotate:
+            with Metrics.span('overlay'):
+                Video.draw_track_labels(frame, keypoints.boxes, [(t, a, s, state.value) for t, a, s, state in rows])
+                Video.draw_texts(frame, Video.track_frame_texts(processed, len(rows)))
+        with Metrics.span('records'):
+            for track, arm_angle, spine_angle, action_state in rows:
+                rate = rates.get(track)
+                if rate is None:
+                    rate = rates[track] = AngleRate()
+                velocity, acceleration = rate.update(arm_angle)
+                records.append(processed, track, round(arm_angle, 2), round(spine_angle, 2), action_state.value,
+                               round(velocity, 2), round(acceleration, 2), *source)
+        return frame
+
+    @classmethod
+    def render(cls, input_path, output_path, workers=None):
+        """由仅数据模式保存的逐帧结果渲染标注视频, 多进程分段渲染后拼接
+        Returns:
+            str: 输出视频路径, 缺少逐帧结果时返回 None
+        """
+        keypoints_path = cls.keypoints_path(output_path)
+        if not os.path.exists(os.path.join(keypoints_path, 'meta.json')):
+            logger.warning(f"⚠️ 缺少逐帧关键点, 无法渲染: {output_path}")
+            return None
+        return Renderer(input_path, output_path, cls.csv_path(output_path), keypoints_path).render(workers)
@@ -1,74 +1,155 @@
+import cv2
 import gradio as gr
 import os
-import pandas as pd
+import threading
+from src.core.live import LiveAnalyzer
+from src.core.log import logger
+from src.core.model import Model
+from src.core.registry import ModelRegistry
+from src.core.store import SessionStore
 from src.core.video import Video
+from src.models.jobs import Job, JobScheduler
 from src.models.yolo_bow import YoloBow
+from src.webui.charts import ChartData
+
+# 后台任务调度, 同时处理的任务数由环境变量 ARCHERY_MAX_JOBS 配置
+scheduler = JobScheduler(max_concurrency=int(os.environ.get('ARCHERY_MAX_JOBS', '1')))
+# 训练记录库
+store = SessionStore()
+
+
+def job_status(job):
+    """任务状态文本"""
+    if job.status == Job.QUEUED:
+        return f"排队中: 前面还有 {max(scheduler.position(job), 0)} 个任务"
+    if job.status == Job.RUNNING:
+        percent = job.processed / job.total if job.total else 0
+        return f"处理中: {percent:.0%} ({job.processed}/{job.total}帧) | {job.fps:.1f} FPS"
+    if job.status == Job.CANCELLED:
+        return "已取消"
+    if job.status == Job.FAILED:
+        return f"处理失败: {job.error}"
+    return "处理完成 (复用已有结果)" if job.cached else "处理完成"
+
+
+def job_options(user_options):
+    """界面选项 → YoloBow.process_video 的处理参数"""
+    return dict(model_name=user_options.get('model_dropdown', 'yolo11x-pose'),
+                device_name=user_options.get('device_dropdown', 'auto'),
+                batch_size=user_options.get('batch_size', 0),
+                backend=user_options.get('backend_dropdown', 'torch'),
+                int8=user_options.get('int8_checkbox', False),
+                multi_archer=user_options.get('multi_archer', False),
+                cascade_model=user_options.get('cascade_dropdown') or None,
+                record_formats=('csv', 'npz'))
 
 
 def process_video(video_path, user_options):
-    """处理上传的视频文件"""
+    """提交上传的视频到后台任务队列, 持续推送进度, 完成后加载结果"""
     if not video_path:
-        return "请先上传视频", *[None]*8  # 修改为8个None，总共9个返回值
-
-    # 获取输入视频的文件名（不含扩展名）
-    base_name = os.path.splitext(os.path.basename(video_path))[0]
-    # 创建输出目录（如果不存在）
-    output_dir = os.path.join("data", "output")
-    os.makedirs(output_dir, exist_ok=True)
-    # 构建输出文件路径
-    output_path = os.path.join(output_dir, f"{base_name}_processed.mp4")
-    csv_path = os.path.join(output_dir, f"{base_name}_processed_data.csv")
-    # 处理视频
-    YoloBow.process_video(video_path, output_path, 
-                            model_name=user_options.get('model_dropdown', 'yolo11x-pose'), 
-                            device_name=user_options.get('device_dropdown', 'auto'),
-                            batch_size=user_options.get('batch_size', 8))
-    # 读取CSV数据
-    angles = pd.read_csv(csv_path, encoding='utf8')
-    
-    # 计算角速度，处理0-360度切换
-    def calculate_angle_diff(angles_series):
-        diff = angles_series.diff()
-        # 处理角度突变
-        mask = abs(diff) > 180
-        diff.loc[mask & (diff > 0)] -= 360
-        diff.loc[mask & (diff < 0)] += 360
-        return diff
-
-    # 计算双臂姿态角速度 (度/帧)
-    angles['角速度'] = calculate_angle_diff(angles['双臂姿态角'])
-    
-    # 计算角加速度 (度/帧^2)
-    angles['角加速度'] = angles['角速度'].diff()
-    
-    # 准备不同图表的数据
-    arm_angle_data = angles  # 双臂姿态角数据
-    
-    # 添加脊柱倾角警告标记
-    spine_angle_data = angles[['帧号', '脊柱倾角']].copy()
-    spine_angle_data['警告'] = spine_angle_data['脊柱倾角'].apply(lambda x: '正常')
-
-    # 添加参考线数据
-    reference_data = pd.DataFrame({
-        '帧号': [angles['帧号'].min(), angles['帧号'].max()],
-        '上限': [5, 5],
-        '下限': [-5, -5]
-    })
-    spine_angle_data = pd.concat([
-        reference_data[['帧号', '上限']].rename(columns={'上限': '脊柱倾角'}).assign(警告='上限'),
-        reference_data[['帧号', '下限']].rename(columns={'下限': '脊柱倾角'}).assign(警告='下限'),
-        spine_angle_data
-    ])
-
-    velocity_data = angles[['帧号', '角速度']]  # 角速度数据
-    acceleration_data = angles[['帧号', '角加速度']]  # 角加速度数据
-    phase_data = angles[['双臂姿态角', '角速度']]  # 相位图数据
-
-    # 准备折线图数据
-    slider = gr.Slider(minimum=0, maximum=len(angles), value=5, step=1, label="拖动滑块移动游标", interactive=True)
+        yield "请先上传视频", *[None]*8, None, None  # 状态 + 8个结果 + 任务ID + 图表数据
+        return
+
+    job = scheduler.submit(video_path, **job_options(user_options))
+    while not job.wait(0.5):
+        yield job_status(job), *[gr.skip()]*8, job.id, gr.skip()
+    if job.status != Job.DONE:
+        yield job_status(job), *[gr.skip()]*8, None, gr.skip()
+        return
+    try:
+        store.add_video(video_path, YoloBow.csv_path(job.output_path), archer=user_options.get('archer') or None)
+    except Exception:
+        logger.exception("❌ 写入训练记录失败")
+    output_path, *results, chart = load_results(job.output_path)
+    yield job_status(job), output_path, *results, None, chart
+
+
+def reanalyze_video(video_path, user_options):
+    """用关键点缓存重算已分析视频的姿态数据与动作环节, 不执行推理、不重新编码标注视频"""
+    if not video_path:
+        return "请先上传视频", *[gr.skip()]*8, gr.skip()
+    options = job_options(user_options)
+    output_path = scheduler.output_path(video_path, scheduler.job_key(video_path, **options))
+    summary = None
+    if scheduler.is_complete(output_path):
+        summary = YoloBow.reanalyze(video_path, output_path, Model.label(options['model_name'], options['backend'], options['int8']),
+                                    record_formats=options['record_formats'], multi_archer=options['multi_archer'])
+    if summary is None:
+        return "没有可复用的分析结果, 请先开始分析", *[gr.skip()]*8, gr.skip()
+    output_path, *results, chart = load_results(output_path)
+    return f"重新分析完成: {summary['frames']}帧 | {summary['seconds']:.2f}s", output_path, *results, chart
+
+
+def cancel_job(job_id):
+    """取消当前会话对任务的订阅, 其他会话仍在等待同一任务时任务继续处理"""
+    if job_id and scheduler.cancel(job_id):
+        return "已取消", None
+    return gr.skip(), gr.skip()
+
+
+def load_results(output_path):
+    """读取处理结果, 生成各图表数据 (降采样) 与全分辨率图表状态"""
+    chart = ChartData.load(YoloBow.csv_path(output_path))
+
+    # 准备折线图数据, 游标按帧号定位 (多射手数据每帧多行, 单个目标可能只覆盖部分帧)
+    maximum = int(chart.frames.max()) + 1 if len(chart) else 0
+    slider = gr.Slider(minimum=0, maximum=maximum, value=5, step=1, label="拖动滑块移动游标", interactive=True)
     initial_frame = Video.extract_frame(output_path, 5)
 
-    return ("处理完成", output_path, slider, initial_frame, arm_angle_data, spine_angle_data, velocity_data, acceleration_data, phase_data)
+    return (output_path, slider, initial_frame, *chart.plots(), chart)
+
+
+def zoom_plots(chart, evt: gr.SelectData):
+    """框选放大: 重新取可见区间的数据, 区间足够短时为全分辨率"""
+    if chart is None:
+        return [gr.skip()] * 5
+    return chart.plots(evt.index)
+
+
+def reset_plots(chart):
+    """双击恢复全片视图"""
+    if chart is None:
+        return [gr.skip()] * 5
+    return chart.plots()
+
+
+def frame_data(chart, frame_number):
+    """当前帧数据, 按帧号索引查询"""
+    return chart.row(frame_number) if chart is not None else None
+
+
+def query_history(archer, since, until, last):
+    """查询训练记录: 统计汇总、每箭开弓时长趋势与单箭明细"""
+    last = int(last) if last else None
+    archer, since, until = archer or None, since or None, until or None
+    summary = store.summary(archer, since, until, last)
+    shots = store.shots(archer, since, until, last=last)
+    trend = shots.iloc[::-1].reset_index(drop=True)
+    trend['序号'] = trend.index + 1
+    summary_rows = [[k, round(v, 2) if isinstance(v, float) else v] for k, v in summary.items()]
+    return summary_rows, trend[['序号', 'draw_seconds']], shots, gr.Dropdown(choices=[''] + store.archers())
+
+
+# 当前运行的实时分析
+live_session = {}
+
+
+def start_live(source, model_name, device_name, backend, int8, latency_budget):
+    """实时分析: 逐帧推送标注画面与结果"""
+    stop_live()
+    with ModelRegistry.lease(model_name, device_name, backend, int8) as model:
+        analyzer = live_session['analyzer'] = LiveAnalyzer(model, source, latency_budget=latency_budget / 1000, annotate=True)
+        for result, frame in analyzer.results():
+            # 标注帧已是副本, 原地转换为RGB格式
+            yield cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame), [[k, v] for k, v in result.items()]
+    summary = analyzer.summary()
+    yield gr.skip(), [[k, round(v, 1) if isinstance(v, float) else v] for k, v in summary.items()]
+
+
+def stop_live():
+    analyzer = live_session.pop('analyzer', None)
+    if analyzer:
+        analyzer.stop()
 
 
 # 视频播放时更新游标线
@@ -91,8 +172,13 @@ def create_ui():
                     user_options = gr.BrowserState({})
                     device_dropdown = gr.Dropdown( label="设备选择", choices=["auto", "cpu", "cuda", "mps"], value="auto", interactive=True)
                     bow_hand = gr.Dropdown( label="持弓手", choices=["left", "right"], value="left", interactive=True)
+                    archer = gr.Textbox(label="射手", value="", placeholder="写入训练记录的射手名称", interactive=True)
                     model_dropdown = gr.Dropdown( label="模型选择", choices=["yolov8x-pose-p6", "yolo11x-pose"], value="yolov8x-pose-p6", interactive=True)
-                    batch_size = gr.Number(label="Batch Size", value=8, minimum=1, maximum=64, step=2, precision=0, interactive=True)
+                    backend_dropdown = gr.Dropdown( label="推理后端", choices=["torch", "onnx", "openvino"], value="torch", interactive=True)
+                    int8_checkbox = gr.Checkbox(label="INT8量化", value=False, interactive=True)
+                    multi_archer = gr.Checkbox(label="多射手", value=False, info="按跟踪ID分别分析每个射手", interactive=True)
+                    cascade_dropdown = gr.Dropdown(label="级联轻量模型", choices=[("不级联", ""), "yolo11n-pose", "yolo11s-pose"], value="", info="逐帧跟踪, 难帧交给所选模型", interactive=True)
+                    batch_size = gr.Number(label="Batch Size", value=0, minimum=0, maximum=64, step=2, precision=0, info="0 为按设备自动调优", interactive=True)
                 with gr.Row():
                     with gr.Column():
                         input_video = gr.Video(label="上传视频", sources="upload", interactive=True)
@@ -100,6 +186,10 @@ def create_ui():
                         output_video = gr.Video(label="分析结果", format="mp4", interactive=False)
                 with gr.Row():         
                     process_btn = gr.Button("开始分析", variant="primary")
+                    cancel_btn = gr.Button("取消", variant="secondary")
+                    reanalyze_btn = gr.Button("重新分析数据", variant="secondary")
+                    job_id = gr.State(None)
+                    chart_data = gr.State(None)  # 全分辨率图表数据, 只保存在服务端
                 with gr.Row():         
                     status_text = gr.Textbox(label="处理状态", interactive=False, value="等待上传视频...")
 
@@ -131,8 +221,35 @@ def create_ui():
                     angular_acceleration_plot = gr.LinePlot(label="双臂角加速度", x="帧号", y="角加速度")
                 with gr.Row():
                     phase_plot = gr.ScatterPlot(label="相位图", x="双臂姿态角", y="角速度")
+
+            with gr.Tab("3.实时分析"):
+                with gr.Row():
+                    live_source = gr.Textbox(label="输入源", value="0", info="摄像头序号、视频流地址或本地视频路径", interactive=True)
+                    latency_budget = gr.Number(label="延迟预算 (ms)", value=100, minimum=10, precision=0, interactive=True)
+                    live_start_btn = gr.Button("开始", variant="primary")
+                    live_stop_btn = gr.Button("停止", variant="secondary")
+                with gr.Row():
+                    with gr.Column(scale=4):
+                        live_frame = gr.Image(label="实时画面", type="numpy", interactive=False)
+                    with gr.Column(scale=1):
+                        live_data = gr.Dataframe(headers=["指标", "数值"], label="实时结果", interactive=False)
+
+            with gr.Tab("4.训练记录"):
+                with gr.Row():
+                    history_archer = gr.Dropdown(label="射手", choices=[''] + store.archers(), value='', allow_custom_value=True, interactive=True)
+                    history_since = gr.Textbox(label="起始日期", placeholder="2024-05-01", interactive=True)
+                    history_until = gr.Textbox(label="截止日期 (不含)", placeholder="2024-06-01", interactive=True)
+                    history_last = gr.Number(label="最近箭数", value=500, minimum=0, precision=0, interactive=True)
+                    history_btn = gr.Button("查询", variant="primary")
+                with gr.Row():
+                    with gr.Column(scale=1):
+                        history_summary = gr.Dataframe(headers=["指标", "数值"], label="统计", interactive=False)
+                    with gr.Column(scale=3):
+                        history_plot = gr.LinePlot(label="每箭开弓时长 (秒)", x="序号", y="draw_seconds")
+                with gr.Row():
+                    history_shots = gr.Dataframe(label="单箭记录", interactive=False)
             
-        process_btn.click(
+        process_event = process_btn.click(
             fn=lambda user_options, x: user_options.update({'device_dropdown': x}), inputs=[user_options, device_dropdown], outputs=[user_options]
         ).then(
             fn=lambda user_options, x: user_options.update({'bow_hand': x}), inputs=[user_options, bow_hand], outputs=[user_options]
@@ -140,24 +257,52 @@ def create_ui():
             fn=lambda user_options, x: user_options.update({'model_dropdown': x}), inputs=[user_options, model_dropdown], outputs=[user_options]
         ).then(
             fn=lambda user_options, x: user_options.update({'batch_size': x}), inputs=[user_options, batch_size], outputs=[user_options]
+        ).then(
+            fn=lambda user_options, x: user_options.update({'backend_dropdown': x}), inputs=[user_options, backend_dropdown], outputs=[user_options]
+        ).then(
+            fn=lambda user_options, x: user_options.update({'int8_checkbox': x}), inputs=[user_options, int8_checkbox], outputs=[user_options]
+        ).then(
+            fn=lambda user_options, x: user_options.update({'archer': x}), inputs=[user_options, archer], outputs=[user_options]
+        ).then(
+            fn=lambda user_options, x: user_options.update({'multi_archer': x}), inputs=[user_options, multi_archer], outputs=[user_options]
+        ).then(
+            fn=lambda user_options, x: user_options.update({'cascade_dropdown': x}), inputs=[user_options, cascade_dropdown], outputs=[user_options]
         ).then(
             fn=process_video,
             inputs=[input_video, user_options],
-            outputs=[status_text, output_video, slider, current_frame, arm_plot, spine_plot, angular_velocity_plot, angular_acceleration_plot, phase_plot]
+            outputs=[status_text, output_video, slider, current_frame, arm_plot, spine_plot, angular_velocity_plot, angular_acceleration_plot, phase_plot, job_id, chart_data],
+            concurrency_limit=None,  # 并发由后台任务调度限制, 多个会话可同时排队查看进度
+        )
+        # 取消时同时停止本会话的进度推送
+        cancel_btn.click(fn=cancel_job, inputs=[job_id], outputs=[status_text, job_id], cancels=[process_event])
+        # 仅重算数据: 沿用上次"开始分析"的选项定位已有结果
+        reanalyze_btn.click(
+            fn=reanalyze_video,
+            inputs=[input_video, user_options],
+            outputs=[status_text, output_video, slider, current_frame, arm_plot, spine_plot, angular_velocity_plot, angular_acceleration_plot, phase_plot, chart_data],
         )
         
+        live_start_btn.click(
+            fn=start_live,
+            inputs=[live_source, model_dropdown, device_dropdown, backend_dropdown, int8_checkbox, latency_budget],
+            outputs=[live_frame, live_data]
+        )
+        live_stop_btn.click(fn=stop_live)
+
+        history_btn.click(
+            fn=query_history,
+            inputs=[history_archer, history_since, history_until, history_last],
+            outputs=[history_summary, history_plot, history_shots, history_archer]
+        )
+
         slider.change(
             fn=Video.extract_frame,inputs=[output_video, slider],outputs=[current_frame]
         ).then(
-            fn=lambda df, idx: list(zip(df['columns'], df['data'][idx])),
-            inputs=[arm_plot, slider],
-            outputs=[current_frame_data]
+            fn=frame_data, inputs=[chart_data, slider], outputs=[current_frame_data]
         )
 
         refresh_btn.click(
-            fn=lambda df, idx: list(zip(df['columns'], df['data'][idx])),
-            inputs=[arm_plot, slider],
-            outputs=[current_frame_data]
+            fn=frame_data, inputs=[chart_data, slider], outputs=[current_frame_data]
         ).then(
             fn=update_cursor, inputs=[arm_plot, slider], outputs=[arm_plot]
         ).then(
@@ -169,6 +314,12 @@ def create_ui():
         ).then(
             fn=update_cursor, inputs=[phase_plot, slider], outputs=[phase_plot]
         )
+
+        # 时序图表框选放大、双击还原, 各图表同步
+        chart_plots = [arm_plot, spine_plot, angular_velocity_plot, angular_acceleration_plot, phase_plot]
+        for plot in chart_plots[:4]:
+            plot.select(fn=zoom_plots, inputs=[chart_data], outputs=chart_plots)
+            plot.double_click(fn=reset_plots, inputs=[chart_data], outputs=chart_plots)
     # todo 脊柱倾角图表增加+-5°的参考线
     # todo 脊柱倾角超出范围时，在图表和当前帧数据中高亮显示
 
@@ -182,6 +333,8 @@ def create_ui():
 if __name__ == "__main__":
     # 创建并启动UI
     app = create_ui()
+    # 后台预加载默认模型, 首个请求无需等待模型加载与预热
+    threading.Thread(target=ModelRegistry.preload, args=('yolov8x-pose-p6',), daemon=True).start()
     app.queue()  # 启用队列处理以提高稳定性
     app.launch(
         server_name="127.0.0.1",  # 只监听本地连接
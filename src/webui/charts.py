@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from src.core.records import Records
+from src.core.series import AngleRate, lttb
+
+
+class ChartData:
+    """WebUI 图表数据
+    全分辨率数据保存在服务端会话状态中, 发送到浏览器的图表按显示点数以 LTTB 降采样;
+    框选放大时只取可见区间, 区间足够短时即为全分辨率. 当前帧数据按帧号索引查询, 不经过图表数据.
+    """
+
+    MAX_POINTS = 1000  # 每个图表最多发送的点数
+    SPINE_LIMIT = 5  # 脊柱倾角参考线 (度)
+
+    def __init__(self, records, track=None):
+        """
+        Args:
+            records: 数据记录 DataFrame
+            track: 多射手数据中要显示的目标ID, 默认取出现帧数最多的目标
+        """
+        if '目标ID' in records and len(records):
+            if track is None:
+                track = records['目标ID'].value_counts().idxmax()
+            records = records[records['目标ID'] == track]
+        self.track = track
+        records = records.reset_index(drop=True)
+        if '角速度' not in records:
+            # 旧版数据文件没有导数列, 读取时补算
+            records['角速度'], records['角加速度'] = AngleRate.compute(records['双臂姿态角'])
+        self.records = records
+        self.frames = records['帧号'].to_numpy()
+
+    @classmethod
+    def load(cls, csv_path, track=None):
+        return cls(Records.load(csv_path), track)
+
+    def __len__(self):
+        return len(self.records)
+
+    def row(self, frame_number):
+        """当前帧数据
+        Returns:
+            list: [[指标, 数值], ...], 无数据时为空
+        """
+        if not len(self.frames):
+            return []
+        index = min(int(np.searchsorted(self.frames, frame_number)), len(self.frames) - 1)
+        row = self.records.iloc[index]
+        return [[column, value.item() if isinstance(value, np.generic) else value] for column, value in row.items()]
+
+    def _window(self, x_range):
+        """可见区间内的数据"""
+        if x_range is None:
+            return self.records
+        start, end = np.searchsorted(self.frames, (min(x_range), max(x_range)))
+        return self.records.iloc[start:end + 1]
+
+    def _downsample(self, data, column):
+        return data.iloc[lttb(data['帧号'].to_numpy(), data[column].to_numpy(), self.MAX_POINTS)]
+
+    def plots(self, x_range=None):
+        """各图表数据
+        Args:
+            x_range: 可见的帧号区间 (起, 止), 为空时为全片
+        Returns:
+            tuple: (双臂姿态角, 脊柱倾角, 角速度, 角加速度, 相位图) 数据
+        """
+        data = self._window(x_range)
+        arm_angle_data = self._downsample(data, '双臂姿态角')
+
+        # 脊柱倾角与 ±5° 参考线
+        spine_angle_data = self._downsample(data, '脊柱倾角')[['帧号', '脊柱倾角']].assign(警告='正常')
+        if len(data):
+            span = [data['帧号'].iloc[0], data['帧号'].iloc[-1]]
+            spine_angle_data = pd.concat([
+                pd.DataFrame({'帧号': span, '脊柱倾角': [self.SPINE_LIMIT] * 2, '警告': '上限'}),
+                pd.DataFrame({'帧号': span, '脊柱倾角': [-self.SPINE_LIMIT] * 2, '警告': '下限'}),
+                spine_angle_data,
+            ])
+
+        velocity_data = self._downsample(data, '角速度')[['帧号', '角速度']]
+        acceleration_data = self._downsample(data, '角加速度')[['帧号', '角加速度']]
+        # 相位图保留姿态角与角速度各自的形状特征点
+        phase_index = np.union1d(arm_angle_data.index, velocity_data.index)
+        phase_data = data.loc[phase_index, ['双臂姿态角', '角速度']]
+        return arm_angle_data, spine_angle_data, velocity_data, acceleration_data, phase_data
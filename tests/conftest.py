@@ -0,0 +1,89 @@
+import cv2
+import numpy as np
+import pytest
+
+
+def encode_index(frame, index):
+    """把帧号以 4 位一组写成左上角的灰度块"""
+    for k in range(3):
+        frame[0:24, 24 * k:24 * (k + 1)] = ((index >> (4 * k)) & 15) * 16 + 8
+    return frame
+
+
+def decode_index(frame):
+    return sum(int(round((frame[2:22, 24 * k + 2:24 * k + 22].mean() - 8) / 16)) << (4 * k) for k in range(3))
+
+
+@pytest.fixture(scope='session')
+def indexed_video(tmp_path_factory):
+    """61 帧的小视频, 每帧左上角编码帧号"""
+    path = str(tmp_path_factory.mktemp('video') / 'indexed.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (160, 128))
+    for i in range(61):
+        writer.write(encode_index(np.full((128, 160, 3), 90, np.uint8), i))
+    writer.release()
+    return path
+
+
+def archer_keypoints(box):
+    """检测框内的站立射手关键点: 双臂水平伸开"""
+    x0, y0, x1, y1 = box
+    cx, w, h = (x0 + x1) / 2, x1 - x0, y1 - y0
+    xy = np.tile([cx, y0 + h * 0.5], (17, 1)).astype(np.float32)
+    shoulder_y, hip_y = y0 + h * 0.25, y0 + h * 0.6
+    xy[5], xy[6] = [cx - w / 4, shoulder_y], [cx + w / 4, shoulder_y]  # 左右肩
+    xy[7], xy[8] = [x0, shoulder_y], [x1, shoulder_y]  # 左右肘
+    xy[11], xy[12] = [cx - w / 6, hip_y], [cx + w / 6, hip_y]  # 左右髋
+    return np.concatenate([xy, np.full((17, 1), 0.9, np.float32)], axis=1)
+
+
+def blob_postprocess(predictor, preds, img, orig_imgs, **kwargs):
+    """把原图中的白色矩形作为人体检测结果, 每帧打乱检测顺序 (跟踪ID只能来自跟踪器)"""
+    import torch
+    from ultralytics.engine.results import Results
+
+    results = []
+    for i, image in enumerate(orig_imgs):
+        _, _, stats, _ = cv2.connectedComponentsWithStats((image[..., 0] > 200).astype(np.uint8))
+        boxes = [[x, y, x + w, y + h] for x, y, w, h, area in stats[1:].tolist() if area > 50]
+        predictor.blob_rng.shuffle(boxes)
+        detections = torch.tensor([[*box, 0.9, 0] for box in boxes], dtype=torch.float32).reshape(-1, 6)
+        keypoints = torch.tensor(np.array([archer_keypoints(box) for box in boxes]).reshape(-1, 17, 3))
+        results.append(Results(image, path=predictor.batch[0][i], names={0: 'person'}, boxes=detections, keypoints=keypoints))
+    return results
+
+
+@pytest.fixture(scope='module')
+def tracking_model():
+    """真实 ultralytics 姿态模型 (随机权重, 不需下载) 与真实跟踪器, 仅把后处理换成白色矩形检测"""
+    from ultralytics import YOLO
+    from ultralytics.models.yolo.pose import PosePredictor
+
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(PosePredictor, 'postprocess', blob_postprocess)
+        patch.setattr(PosePredictor, 'blob_rng', np.random.default_rng(0), raising=False)
+        yield YOLO('yolo11n-pose.yaml')
+
+
+def archer_boxes(frame):
+    """第 frame 帧两名射手的真实位置: A 在上方右移, B 在下方左移, 中途水平交错"""
+    return {'A': (20 + 6 * frame, 20, 60 + 6 * frame, 120), 'B': (260 - 6 * frame, 160, 300 - 6 * frame, 260)}
+
+
+@pytest.fixture(scope='session')
+def archers_video(tmp_path_factory):
+    """40 帧, 两名射手 (白色矩形) 相向移动"""
+    path = str(tmp_path_factory.mktemp('video') / 'archers.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (320, 288))
+    for i in range(40):
+        frame = np.zeros((288, 320, 3), np.uint8)
+        for x0, y0, x1, y1 in archer_boxes(i).values():
+            frame[y0:y1, x0:x1] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def archer_names(boxes):
+    """按检测框纵坐标区分射手 A/B"""
+    return ['A' if (box[1] + box[3]) / 2 < 144 else 'B' for box in boxes]
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.core.keypoints import FrameKeypoints
+from src.core.records import Records
+from src.core.registry import ModelRegistry
+from src.core.render import Renderer
+from src.core.video import Video
+from src.models.batch import BatchRunner
+from src.models.yolo_bow import YoloBow
+
+
+class ArcherModel:
+    """每帧检出同一个射手 (跟踪ID 1) 的模型"""
+
+    def track(self, frames, **kwargs):
+        xy = np.full((1, 17, 2), 60.0, np.float32)
+        xy[0, :, 0] += np.arange(17)
+        return iter([FrameKeypoints(xy, boxes=[[60, 60, 80, 80]], ids=[1]) for _ in frames])
+
+
+@pytest.fixture
+def runner(tmp_path, monkeypatch):
+    """单进程分段处理, 缓存与调优配置写到临时目录"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(BatchRunner, '_model', None)
+    monkeypatch.setattr(BatchRunner, '_error', None)
+    monkeypatch.setattr(ModelRegistry, 'acquire', classmethod(lambda cls, *args, **kwargs: ArcherModel()))
+    monkeypatch.setattr(ModelRegistry, 'release', classmethod(lambda cls, model: None))
+    return BatchRunner('fake', 'cpu', workers=1, batch_size=4)
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'w').close()
+
+
+def test_is_complete_requires_video_or_keypoints(tmp_path):
+    output_path = str(tmp_path / 'output_clip.mp4')
+    touch(YoloBow.csv_path(output_path))
+    assert not BatchRunner.is_complete(output_path)
+    assert not BatchRunner.is_complete(output_path, annotate=False)
+    touch(output_path)
+    assert BatchRunner.is_complete(output_path)
+    touch(os.path.join(YoloBow.keypoints_path(output_path), 'meta.json'))
+    assert BatchRunner.is_complete(output_path, annotate=False)
+
+    os.remove(YoloBow.csv_path(output_path))  # 数据文件最后落盘, 缺失即未完成
+    assert not BatchRunner.is_complete(output_path)
+
+
+def test_interrupted_render_is_not_complete(runner, indexed_video, tmp_path, monkeypatch):
+    output_path = str(tmp_path / 'output' / 'output_indexed.mp4')
+    os.makedirs(os.path.dirname(output_path))
+    render = Renderer.render
+
+    def interrupted(self, *args, **kwargs):
+        raise RuntimeError('渲染中断')
+
+    monkeypatch.setattr(Renderer, 'render', interrupted)
+    summary = runner.run_chunked(indexed_video, output_path, chunks=1)
+    assert summary['status'] == 'failed'
+    assert not os.path.exists(YoloBow.csv_path(output_path))
+    assert not BatchRunner.is_complete(output_path)
+
+    # 重新处理时复用关键点缓存, 渲染完成后才发布数据文件
+    monkeypatch.setattr(Renderer, 'render', render)
+    summary = runner.run_chunked(indexed_video, output_path, chunks=1)
+    assert summary['status'] == 'ok' and summary['inferred'] == 0
+    assert BatchRunner.is_complete(output_path)
+    assert len(Records.load(YoloBow.csv_path(output_path))) == 61
+
+
+def test_failed_process_video_leaves_no_data_parts(runner, indexed_video, tmp_path, monkeypatch):
+    output_path = str(tmp_path / 'output_indexed.mp4')
+    monkeypatch.setattr(Records.__init__, '__defaults__', (('csv',), None, 4))  # 每4行写出一块
+
+    def progress(processed, total):
+        if processed == 10:  # 已写出两块记录后中止
+            raise RuntimeError('处理中止')
+
+    with pytest.raises(RuntimeError):
+        YoloBow.process_video(indexed_video, output_path, model=ArcherModel(), batch_size=4, use_cache=False,
+                              record_formats=('csv', 'npz'), progress=progress)
+    data_files = [name for name in os.listdir(tmp_path) if '_data' in name]
+    assert data_files == []
+
+
+def test_cache_hit_with_rendered_output_only_rewrites_data(runner, indexed_video, tmp_path, monkeypatch):
+    output_path = str(tmp_path / 'output_indexed.mp4')
+    first = YoloBow.process_video(indexed_video, output_path, model=ArcherModel(), batch_size=4)
+    assert first['inferred'] == 61
+
+    def encode(*args, **kwargs):
+        raise AssertionError('不应重新编码标注视频')
+
+    monkeypatch.setattr(Video, 'write_frame', encode)
+    second = YoloBow.process_video(indexed_video, output_path, batch_size=4, record_formats=('csv', 'npz'))
+    assert second['inferred'] == 0 and second['frames'] == 61
+    assert os.path.exists(Records.path_for(YoloBow.csv_path(output_path), 'npz'))
+    assert len(Records.load(YoloBow.csv_path(output_path))) == 61
+
+
+def test_run_without_tasks_does_not_load_model(runner, tmp_path, monkeypatch):
+    def load(*args, **kwargs):
+        raise AssertionError('没有待处理视频时不应加载模型')
+
+    monkeypatch.setattr(BatchRunner, '_init_worker', classmethod(load))
+    os.makedirs(tmp_path / 'input')
+    assert runner.run(str(tmp_path / 'input'), str(tmp_path / 'output')) == []
+
+
+def test_chunked_warns_about_ignored_options(runner, indexed_video, tmp_path, caplog):
+    runner.options.update(roi=True, adaptive_stride=4)
+    summary = runner.run_chunked(indexed_video, str(tmp_path / 'output_indexed.mp4'), chunks=1)
+    assert summary['status'] == 'ok'
+    assert '裁剪推理、自适应跳帧' in caplog.text
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from src.core.cascade import ModelCascade
+from src.core.keypoints import FrameKeypoints
+from src.core.phase import TrackPhases
+from src.core.pose import Pose
+
+
+def person(arm_angle, x=200.0, conf=0.9):
+    """双肩水平、右臂水平伸直、左臂按双臂姿态角伸出的人"""
+    xy = np.tile(np.array([x, 260.0], np.float32), (17, 1))
+    left_shoulder, right_shoulder = np.array([x - 30, 200.0]), np.array([x + 30, 200.0])
+    angle = np.radians(arm_angle)
+    xy[Pose.LEFT_SHOULDER], xy[Pose.RIGHT_SHOULDER] = left_shoulder, right_shoulder
+    xy[Pose.LEFT_ELBOW] = left_shoulder + 60 * np.array([np.cos(angle), np.sin(angle)])
+    xy[Pose.RIGHT_ELBOW] = right_shoulder + [60, 0]
+    xy[Pose.LEFT_HIP], xy[Pose.RIGHT_HIP] = [x - 20, 320], [x + 20, 320]
+    return xy, np.full(17, conf, np.float32)
+
+
+def frame(*people, ids=None):
+    """people: (双臂姿态角, 横坐标, 置信度)"""
+    if not people:
+        return FrameKeypoints.empty()
+    xy, conf = zip(*(person(*p) for p in people))
+    xy = np.stack(xy)
+    boxes = np.concatenate([xy.min(axis=1), xy.max(axis=1)], axis=1)
+    return FrameKeypoints(xy, np.stack(conf), boxes, ids=ids)
+
+
+def test_gating():
+    cascade = ModelCascade('light', 'heavy')
+    assert Pose.compute_metrics(frame((100, 200, 0.9)).xy)['arm'][0] == pytest.approx(100, abs=1e-3)
+    assert not cascade.needs_heavy(frame((100, 200, 0.9), ids=[1]))
+    assert cascade.needs_heavy(frame((100, 200, 0.3), ids=[1]))  # 置信度低
+    assert cascade.needs_heavy(frame((149, 200, 0.9), ids=[1]))  # 接近开弓/固势分界
+    assert cascade.needs_heavy(frame())  # 刚丢失目标
+    assert not cascade.needs_heavy(frame())
+    assert (cascade.frames, cascade.escalated) == (5, 3)
+
+
+def test_merge_keeps_light_track_ids():
+    cascade = ModelCascade('light', 'heavy')
+    light = frame((100, 200, 0.4), (100, 500, 0.9), ids=[7, 8])
+    heavy = frame((100, 502, 0.9), (100, 900, 0.9))
+    merged = cascade.merge(light, heavy)
+    assert merged.ids.tolist() == [8, -1] and merged.source == 'heavy'
+    assert cascade.merge(light, frame()) is light
+
+
+def test_history_pruned_like_track_phases():
+    cascade = ModelCascade('light', 'heavy')
+    cascade.needs_heavy(frame((100, 200, 0.9), (100, 500, 0.9), ids=[1, 2]))
+    for _ in range(2 * TrackPhases.MAX_IDLE):
+        cascade.needs_heavy(frame((100, 200, 0.9), ids=[1]))
+    assert set(cascade.history) == set(cascade.last_seen) == {1}
+
+
+def test_merge_assigns_each_light_id_once():
+    # 轻量模型只跟踪到一人, 重量模型在同一位置检出两个相互重叠的框, ID 只给交并比最高的框
+    cascade = ModelCascade('light', 'heavy')
+    light = frame((100, 500, 0.4), ids=[8])
+    heavy = frame((100, 510, 0.9), (100, 501, 0.9))
+    assert cascade.merge(light, heavy).ids.tolist() == [-1, 8]
@@ -0,0 +1,57 @@
+import numpy as np
+
+from src.core.cache import KeypointCache, KeypointCacheWriter
+from src.core.chunks import VideoChunks
+from src.core.keypoints import FrameKeypoints
+
+TOTAL = 30
+OVERLAP = 3
+
+
+def test_plan_covers_every_frame_once():
+    plan = VideoChunks.plan(10000, 4, 30)
+    assert plan[0][:2] == (0, 0) and plan[-1][2] is None
+    for (_, _, end), (warm_start, start, _) in zip(plan, plan[1:]):
+        assert start == end and warm_start == start - 30
+    assert VideoChunks.plan(400, 4, 30) == [(0, 0, None)]  # 不足两段的最少帧数时不切分
+
+
+def boxes_at(frame):
+    """第 frame 帧的真实目标: A 右移, B 静止, C 从第 22 帧出现"""
+    boxes = {'A': [10 + 4 * frame, 10, 60 + 4 * frame, 110], 'B': [300, 10, 350, 110]}
+    if frame >= 22:
+        boxes['C'] = [500, 200, 550, 300]
+    return boxes
+
+
+def write_chunk(path, warm_start, start, end, local_ids):
+    """一段的关键点, 跟踪ID按该段自己的编号"""
+    writer = KeypointCacheWriter(path, start=start, warmup=start - warm_start)
+    for frame in range(warm_start, end):
+        targets = boxes_at(frame)
+        boxes = np.array(list(targets.values()), np.float32)
+        ids = [local_ids[name] for name in targets]
+        writer.append(FrameKeypoints(np.zeros((len(ids), 17, 2)), boxes=boxes, ids=ids))
+    writer.close()
+
+
+def test_stitch_renumbers_track_ids(tmp_path):
+    chunks = [
+        (0, 0, 10, {'A': 1, 'B': 2, 'C': 3}),
+        (10 - OVERLAP, 10, 20, {'A': 7, 'B': 3, 'C': 9}),
+        (20 - OVERLAP, 20, TOTAL, {'A': 2, 'B': 1, 'C': 5}),  # C 只在本段出现
+    ]
+    paths = []
+    for k, (warm_start, start, end, local_ids) in enumerate(chunks):
+        paths.append(str(tmp_path / f'chunk{k}'))
+        write_chunk(paths[-1], warm_start, start, end, local_ids)
+    writer = KeypointCacheWriter(str(tmp_path / 'stitched'))
+    assert VideoChunks.stitch(paths, [writer]) == TOTAL
+    writer.close()
+
+    stitched = KeypointCache.read(writer.path)
+    expected = {'A': 1, 'B': 2, 'C': 3}
+    for frame in range(TOTAL):
+        keypoints = stitched.frame(frame)
+        assert keypoints.ids.tolist() == [expected[name] for name in boxes_at(frame)]
+        assert np.array_equal(keypoints.boxes, np.array(list(boxes_at(frame).values()), np.float32))
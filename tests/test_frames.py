@@ -0,0 +1,56 @@
+import time
+
+import numpy as np
+
+from src.core.frames import FramePool
+from src.core.keypoints import FrameKeypoints
+from src.core.pipeline import Stage
+from src.core.video import Video
+from conftest import decode_index
+
+BATCH = 4
+QUEUE = 2
+
+
+class NullModel:
+    """不检出任何目标的模型"""
+
+    def track(self, frames, **kwargs):
+        return iter([FrameKeypoints.empty() for _ in frames])
+
+
+def consume(frames):
+    """模拟较慢的标注: 每帧检查内容仍是预期帧号 (未被后续批覆盖)"""
+    decoded = []
+    for frame in frames:
+        time.sleep(0.002)
+        decoded.append(decode_index(frame))
+    return decoded
+
+
+def test_frame_pool_ring():
+    pool = FramePool(BATCH, (8, 8, 3), depth=3)
+    buffers = [pool.acquire() for _ in range(7)]
+    assert len(pool) == 3 and pool.nbytes == 3 * BATCH * 8 * 8 * 3
+    assert buffers[0] is buffers[3] is buffers[6]
+    assert len({id(buffer) for buffer in buffers}) == 3
+
+
+def test_pipeline_does_not_overwrite_frames_in_use(indexed_video):
+    video = Video(indexed_video, None, queue_size=QUEUE)
+    try:
+        frames = (frame for frame, _ in video.process_frames_pipeline(NullModel(), BATCH, QUEUE))
+        assert consume(frames) == list(range(61))
+        assert len(video.pool) == 2 * QUEUE + 3
+    finally:
+        video.close()
+
+
+def test_frame_stage_does_not_overwrite_frames_in_use(indexed_video):
+    """裁剪/级联推理在流水线模式下按帧排队"""
+    video = Video(indexed_video, None, queue_size=QUEUE)
+    try:
+        batches = video.read_batches(BATCH, QUEUE + 2)
+        assert consume(Stage((frame for batch in batches for frame in batch), QUEUE * BATCH)) == list(range(61))
+    finally:
+        video.close()
@@ -0,0 +1,57 @@
+import pytest
+
+from src.models.jobs import Job, JobScheduler
+
+
+@pytest.fixture
+def scheduler(tmp_path, monkeypatch):
+    """不启动后台线程的调度器, 任务停留在队列中"""
+    scheduler = JobScheduler(output_dir=str(tmp_path / 'output'), max_finished=2)
+    monkeypatch.setattr(scheduler, '_ensure_workers', lambda: None)
+    return scheduler
+
+
+@pytest.fixture
+def video(tmp_path):
+    path = tmp_path / 'clip.mp4'
+    path.write_bytes(b'not really a video')
+    return str(path)
+
+
+def test_job_key_ignores_runtime_and_default_options(video):
+    assert JobScheduler.job_key(video) == JobScheduler.job_key(video, device_name='cpu', batch_size=4, multi_archer=False,
+                                                               record_formats=['csv'])
+
+
+@pytest.mark.parametrize('options', [{'roi': True}, {'adaptive_stride': 2}, {'record_formats': ('csv', 'npz')},
+                                     {'decode_width': 640}, {'multi_archer': True}, {'cascade_model': 'yolo11n-pose'},
+                                     {'backend': 'openvino'}, {'annotate': False}])
+def test_job_key_includes_output_options(video, options):
+    assert JobScheduler.job_key(video) != JobScheduler.job_key(video, **options)
+
+
+def test_shared_job_cancelled_by_last_subscriber(scheduler, video):
+    job = scheduler.submit(video, roi=True)
+    assert scheduler.submit(video, roi=True, batch_size=3) is job
+    assert job.subscribers == 2
+
+    assert scheduler.cancel(job.id)
+    assert job.status == Job.QUEUED and scheduler.position(job) == 0
+
+    assert scheduler.cancel(job.id)
+    assert job.status == Job.CANCELLED and scheduler.position(job) == -1
+    assert not scheduler.cancel(job.id)
+
+
+def test_finished_jobs_evicted(scheduler, video):
+    jobs = [scheduler.submit(video, decode_width=100 + i) for i in range(4)]
+    for job in jobs:
+        scheduler.cancel(job.id)
+    latest = scheduler.submit(video, decode_width=999)
+    assert [scheduler.get(job.id) for job in jobs] == [None, None, jobs[2], jobs[3]]
+    assert scheduler.get(latest.id) is latest
+
+    scheduler.finished_ttl = -1
+    scheduler.submit(video, decode_width=1000)
+    assert scheduler.get(jobs[3].id) is None
+    assert scheduler.get(latest.id) is latest  # 未结束的任务不移除
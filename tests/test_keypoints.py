@@ -0,0 +1,26 @@
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from src.core.keypoints import FrameKeypoints
+
+
+def result(persons, tracked):
+    """persons 人的姿态结果, tracked 时检测框带跟踪ID"""
+    image = np.zeros((64, 64, 3), np.uint8)
+    xy = torch.rand(persons, 17, 2) * 64
+    conf = torch.rand(persons, 17, 1)
+    boxes = torch.cat([torch.rand(persons, 4) * 64, torch.arange(1, persons + 1).reshape(-1, 1).float() if tracked else
+                       torch.empty(persons, 0), torch.rand(persons, 1), torch.zeros(persons, 1)], dim=1)
+    return Results(image, 'frame', {0: 'person'}, boxes=boxes, keypoints=torch.cat([xy, conf], dim=2))
+
+
+def test_from_results_matches_per_frame_conversion():
+    cached = FrameKeypoints.empty(source='cache')
+    results = [result(2, True), result(0, True), result(3, False), cached]
+    batch = FrameKeypoints.from_results(results, source='model')
+    assert batch[-1] is cached
+    for keypoints, expected in zip(batch, map(FrameKeypoints.from_result, results[:-1])):
+        assert keypoints.source == 'model'
+        for field in ('xy', 'conf', 'boxes', 'scores', 'ids'):
+            np.testing.assert_allclose(getattr(keypoints, field), getattr(expected, field), rtol=1e-6)
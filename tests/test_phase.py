@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from src.core.phase import PhaseTracker, TrackPhases
+
+
+def shooting_angles(rng, shots=4):
+    """模拟若干箭的双臂姿态角: 举弓 → 开弓 → 固势 → 撒放骤增, 叠加噪声与偶发检测跳变"""
+    angles = []
+    for _ in range(shots):
+        angles += list(rng.uniform(335, 359, 10))
+        angles += list(np.linspace(15, 148, 20))
+        solid = 160 + np.cumsum(rng.normal(0, 0.8, 30))
+        angles += list(solid)
+        angles += [solid[-1] + rng.uniform(5, 12)] + list(rng.uniform(175, 212, 8))
+        angles += list(rng.uniform(0, 360, 3))
+    return np.round(angles, 2)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_phase_tracker_label_matches_update(seed):
+    angles = shooting_angles(np.random.default_rng(seed))
+    tracker = PhaseTracker()
+    expected = [tracker.update(angle).value for angle in angles.tolist()]
+    assert PhaseTracker.label(angles).tolist() == expected
+
+
+def run_sequential(detections, total):
+    """逐帧调用 TrackPhases.update (空帧同样调用), 返回 (帧号, 目标ID) → 动作环节"""
+    phases = TrackPhases()
+    states = {}
+    for frame in range(total):
+        rows = detections.get(frame, [])
+        keys = np.array([key for key, _ in rows], dtype=np.int64)
+        angles = np.array([angle for _, angle in rows])
+        for key, state in zip(keys.tolist(), phases.update(keys, angles)):
+            states[frame, key] = state.value
+    return states
+
+
+@pytest.mark.parametrize('gap', [TrackPhases.MAX_IDLE - 1, TrackPhases.MAX_IDLE + 1, 2 * TrackPhases.MAX_IDLE + 5])
+def test_track_phases_label_matches_update_across_gaps(gap):
+    rng = np.random.default_rng(gap)
+    angles = shooting_angles(rng, shots=2)
+    # 目标1 在固势末尾消失 gap 帧后以撒放骤增角度重新出现, 目标2 一直在画面中
+    first = [(i, 1, a) for i, a in enumerate(angles[:60])]
+    second = [(60 + gap + i, 1, a) for i, a in enumerate(angles[60:])]
+    total = gap + len(angles)
+    other = [(i, 2, a) for i, a in enumerate(np.resize(angles, total))]
+    detections = {}
+    for frame, key, angle in first + second + other:
+        detections.setdefault(frame, []).append((key, angle))
+    expected = run_sequential(detections, total)
+
+    rows = sorted(first + second + other)
+    frames, keys, arm_angles = (np.array(column) for column in zip(*rows))
+    labels = TrackPhases.label(keys, arm_angles, frames)
+    assert dict(zip(zip(frames.tolist(), keys.tolist()), labels.tolist())) == expected
@@ -0,0 +1,60 @@
+import os
+
+import pandas as pd
+
+from src.core.records import Records
+
+
+def write(csv_path, rows, formats=('csv', 'npz')):
+    records = Records(str(csv_path), formats=formats, chunk_size=4)
+    for row in rows:
+        records.append(*row)
+    return records
+
+
+ROWS = [(i, 100 + i * 0.5, -3.25, '开弓', 1.5, float('nan')) for i in range(10)]
+
+
+def test_round_trip_across_chunks(tmp_path):
+    csv_path = tmp_path / 'clip_data.csv'
+    records = write(csv_path, ROWS)
+    assert not csv_path.exists()  # 结束前只有 .part 文件
+    records.close()
+
+    from_npz = Records.load(str(csv_path))
+    from_csv = pd.read_csv(csv_path)
+    assert list(from_npz.columns) == [name for name, _ in Records.COLUMNS]
+    assert from_npz['帧号'].tolist() == list(range(10))
+    pd.testing.assert_frame_equal(from_npz, from_csv, check_dtype=False)
+
+
+def test_empty_records_keep_header(tmp_path):
+    csv_path = tmp_path / 'empty_data.csv'
+    write(csv_path, [], formats=('csv',)).close()
+    assert list(pd.read_csv(csv_path).columns) == [name for name, _ in Records.COLUMNS]
+
+
+def test_publish_replaces_formats_csv_last(tmp_path, monkeypatch):
+    target = tmp_path / 'clip_data.csv'
+    write(target, ROWS[:2], formats=('csv', 'npz', 'parquet')).close()
+    staged = tmp_path / 'clip_data.staging.csv'
+    write(staged, ROWS, formats=('csv', 'npz')).close()
+
+    replaced = []
+    replace = os.replace
+    monkeypatch.setattr(os, 'replace', lambda src, dst: (replaced.append(os.path.basename(dst)), replace(src, dst)))
+    assert Records.publish(str(staged), str(target)) == str(target)
+    assert replaced == ['clip_data.npz', 'clip_data.csv']  # CSV 存在即表示其余格式已就位
+    # 本次未输出的旧格式被删除, 读取时不会读到过期数据
+    assert not os.path.exists(Records.path_for(str(target), 'parquet'))
+    assert len(Records.load(str(target))) == len(ROWS)
+    assert not staged.exists()
+
+
+
+def test_abort_removes_parts(tmp_path):
+    csv_path = tmp_path / 'aborted_data.csv'
+    records = write(csv_path, ROWS)  # 已写满两块, CSV .part 已落盘
+    assert os.path.exists(str(csv_path) + '.part')
+    records.abort()
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,59 @@
+import gc
+import weakref
+
+import pytest
+
+from src.core.registry import ModelRegistry
+
+
+class FakeModel:
+    pass
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """空的模型表, 加载与预热换成假模型"""
+    monkeypatch.setattr(ModelRegistry, '_idle', {})
+    monkeypatch.setattr(ModelRegistry, '_keys', weakref.WeakKeyDictionary())
+    monkeypatch.setattr(ModelRegistry, 'load', staticmethod(lambda *args, **kwargs: FakeModel()))
+    monkeypatch.setattr(ModelRegistry, 'warmup', staticmethod(lambda model: None))
+
+
+def test_reuses_released_instance():
+    model = ModelRegistry.acquire('fake', 'cpu')
+    ModelRegistry.release(model)
+    ModelRegistry.release(model)  # 重复归还不会重复入列
+    assert ModelRegistry.acquire('fake', 'cpu') is model
+    assert ModelRegistry.acquire('fake', 'cpu') is not model
+
+
+def test_idle_instances_capped_per_key():
+    models = [ModelRegistry.acquire('fake', 'cpu') for _ in range(ModelRegistry.MAX_IDLE_PER_KEY + 2)]
+    other = ModelRegistry.acquire('other', 'cpu')
+    for model in models + [other]:
+        ModelRegistry.release(model)
+    key = ModelRegistry.key('fake', 'cpu')
+    assert ModelRegistry._idle[key] == models[:ModelRegistry.MAX_IDLE_PER_KEY]
+    assert ModelRegistry._idle[ModelRegistry.key('other', 'cpu')] == [other]
+
+    # 被释放的实例不再由模型表引用, 回收后从实例表中移除
+    dropped = weakref.ref(models[-1])
+    del models, model
+    gc.collect()
+    assert dropped() is None
+    assert len(ModelRegistry._keys) == ModelRegistry.MAX_IDLE_PER_KEY + 1
+
+
+def test_release_unknown_model_ignored():
+    ModelRegistry.release(FakeModel())
+    assert not ModelRegistry._idle
+
+
+def test_missing_backend_dependency_names_extra(monkeypatch):
+    from src.core.model import Model
+
+    monkeypatch.setattr('importlib.util.find_spec', lambda name: None if name == 'nncf' else object())
+    Model.check_backend('torch', int8=True)
+    Model.check_backend('openvino')
+    with pytest.raises(ImportError, match=r"nncf.*archery_vision\[openvino\]"):
+        Model.check_backend('openvino', int8=True)
@@ -0,0 +1,101 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+from ultralytics.engine.results import Results
+
+from src.core.keypoints import FrameKeypoints
+from src.core.roi import ArcherRoi
+from src.core.video import Video
+
+FRAME_SHAPE = (720, 1280, 3)
+
+
+def archer(box, ids=None):
+    box = np.asarray(box, np.float32)
+    xy = np.tile((box[:2] + box[2:]) / 2, (1, 17, 1))
+    return FrameKeypoints(xy, boxes=box[None], ids=ids)
+
+
+def test_region_covers_batch_motion():
+    roi = ArcherRoi(padding=0.25)
+    roi.update(archer([600, 200, 700, 600]), 0, detection=True)
+    assert roi.region(FRAME_SHAPE) == (500, 100, 800, 700)
+    roi.update(archer([610, 200, 710, 600]), 2)
+    assert roi.velocity.tolist() == [5, 0]
+    # 8 帧的批按速度沿水平两侧额外扩展 40 像素
+    assert roi.region(FRAME_SHAPE, frames=8) == (470, 100, 850, 700)
+
+
+@pytest.mark.parametrize('region, expected', [
+    ((0, 0, 1280, 720), 320),  # 整帧时受上限限制
+    ((0, 0, 400, 300), 224),  # 640 * 400 / 1280 = 200, 对齐到 32 的倍数
+    ((0, 0, 50, 40), 128),  # 下限
+])
+def test_crop_imgsz_scales_with_region(region, expected):
+    assert ArcherRoi(imgsz=320, detect_imgsz=640).crop_imgsz(region, FRAME_SHAPE) == expected
+
+
+def test_at_edge_ignores_frame_border():
+    roi = ArcherRoi()
+    roi.update(archer([0, 100, 100, 300]), 0, detection=True)
+    assert not roi.at_edge((0, 50, 200, 400), FRAME_SHAPE)
+    assert roi.at_edge((0, 99, 200, 400), FRAME_SHAPE)
+    assert roi.at_edge((0, 50, 101, 400), FRAME_SHAPE)
+
+
+def test_lost_after_max_misses():
+    roi = ArcherRoi(max_misses=2)
+    roi.update(archer([0, 0, 10, 10]), 0, detection=True)
+    roi.update(archer([2, 0, 12, 10]), 1)
+    roi.update(FrameKeypoints.empty(), 2)
+    assert roi.box is not None
+    roi.update(FrameKeypoints.empty(), 3)
+    assert roi.box is None and not roi.velocity.any() and roi.needs_detection(4)
+
+
+class BlobModel:
+    """把图像中的白色矩形检测为射手, 记录每次推理的输入尺寸"""
+
+    def __init__(self):
+        self.sizes = []
+
+    def predict(self, frames, **kwargs):
+        results = []
+        for frame in frames:
+            self.sizes.append(frame.shape[:2])
+            ys, xs = np.nonzero(frame[..., 0] > 200)
+            boxes, keypoints = torch.zeros((0, 6)), torch.zeros((0, 17, 3))
+            if len(xs):
+                box = [xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]
+                boxes = torch.tensor([[*box, 0.9, 0]], dtype=torch.float32)
+                keypoints = torch.tensor([[[(box[0] + box[2]) / 2, (box[1] + box[3]) / 2, 0.9]] * 17])
+            results.append(Results(frame, 'blob', {0: 'person'}, boxes=boxes, keypoints=keypoints))
+        return iter(results)
+
+
+@pytest.fixture(scope='module')
+def moving_video(tmp_path_factory):
+    """白色矩形每帧右移 12 像素"""
+    path = str(tmp_path_factory.mktemp('video') / 'moving.mp4')
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 30, (640, 360))
+    for i in range(40):
+        frame = np.zeros((360, 640, 3), np.uint8)
+        frame[120:240, 40 + 12 * i:100 + 12 * i] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def test_roi_tracks_fast_moving_archer(moving_video):
+    model = BlobModel()
+    video = Video(moving_video, None)
+    try:
+        results = [keypoints for _, keypoints in video.process_frames_roi(model, 8, ArcherRoi(redetect_every=100))]
+    finally:
+        video.close()
+    assert len(results) == 40 and all(len(keypoints) == 1 for keypoints in results)
+    centers = np.array([keypoints.boxes[0, [0, 2]].mean() for keypoints in results])
+    assert np.abs(centers - (70 + 12 * np.arange(40))).max() <= 3
+    # 大部分帧只推理裁剪区域
+    assert sum(size != (360, 640) for size in model.sizes) >= 30
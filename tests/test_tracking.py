@@ -0,0 +1,100 @@
+import numpy as np
+
+from src.core.keypoints import FrameKeypoints
+from src.core.video import Video
+from conftest import archer_names
+
+
+def track_ids(model, path, batch_size=4):
+    """逐帧 {射手: 跟踪ID}"""
+    video = Video(path, None)
+    try:
+        frames = []
+        for _, keypoints in video.process_frames_batch(model, batch_size):
+            frames.append(dict(zip(archer_names(keypoints.boxes), keypoints.ids.tolist())))
+        return frames
+    finally:
+        video.close()
+
+
+def test_track_ids_stable_across_frames_and_batches(tracking_model, archers_video):
+    frames = track_ids(tracking_model, archers_video)
+    assert len(frames) == 40
+    assert all(frame == frames[0] for frame in frames)
+    assert sorted(frames[0].values()) == [1, 2]
+
+
+def test_tracker_reset_for_each_video(tracking_model, archers_video):
+    # 常驻模型被下一个视频复用时, 跟踪器清空并从1重新编号
+    first = track_ids(tracking_model, archers_video, batch_size=3)
+    second = track_ids(tracking_model, archers_video, batch_size=5)
+    assert sorted(first[-1].values()) == sorted(second[0].values()) == [1, 2]
+    assert all(frame == second[0] for frame in second)
+
+
+def test_predict_probe_does_not_touch_tracker(tracking_model, archers_video):
+    video = Video(archers_video, None)
+    try:
+        batches = [[frame.copy() for frame in batch] for batch in video.read_batches(4)]  # 帧缓冲会被复用
+    finally:
+        video.close()
+    before = FrameKeypoints.from_results(Video.track(tracking_model, batches[0], reset=True))
+    tracker = tracking_model.predictor.trackers[0]
+    frame_id = tracker.frame_id
+
+    probe = Video.predict(tracking_model, batches[1][:1])[0]
+    assert probe.boxes.id is None and len(probe.boxes) == 2  # 探测结果未经跟踪器
+    assert tracking_model.predictor.trackers[0] is tracker and tracker.frame_id == frame_id
+
+    after = FrameKeypoints.from_results(Video.track(tracking_model, batches[1]))
+    ids = lambda keypoints: dict(zip(archer_names(keypoints.boxes), keypoints.ids.tolist()))
+    assert all(ids(k) == ids(before[0]) for k in before + after)
+
+
+def test_live_session_resets_tracker_and_bounds_latency(tracking_model, archers_video, monkeypatch):
+    from src.core.live import LiveAnalyzer
+
+    monkeypatch.setattr(LiveAnalyzer, 'LATENCY_WINDOW', 4)
+    Video.track(tracking_model, [np.full((288, 320, 3), 255, np.uint8)])  # 上一会话遗留的轨迹
+    analyzer = LiveAnalyzer(tracking_model, archers_video)
+    results = [result for result, _ in analyzer.results(max_frames=10)]
+    assert results[0]['persons'] == 2
+    assert tracking_model.predictor.trackers[0].frame_id == len(results)  # 预热与上一会话的帧不计入
+    assert analyzer.summary()['analyzed'] == len(results) > 4 and len(analyzer.latency.samples) == 4
+
+
+def test_multi_archer_records_follow_each_archer(tracking_model, archers_video, tmp_path):
+    from src.core.cache import KeypointCache
+    from src.core.records import Records
+    from src.models.yolo_bow import YoloBow
+
+    output_path = str(tmp_path / 'output_archers.mp4')
+    YoloBow.process_video(archers_video, output_path, model=tracking_model, batch_size=6, use_cache=False,
+                          annotate=False, multi_archer=True)
+    cached = KeypointCache.read(YoloBow.keypoints_path(output_path))
+    frames = [cached.frame(i) for i in range(len(cached))]
+    archers = [dict(zip(archer_names(k.boxes), k.ids.tolist())) for k in frames]
+    assert len(archers) == 40 and all(frame == archers[0] for frame in archers)
+
+    # 每个目标ID逐帧一行, 动作环节状态机不会因换号而重新开始
+    data = Records.load(YoloBow.csv_path(output_path))
+    assert data.groupby('目标ID')['帧号'].apply(list).to_dict() == {track: list(range(40)) for track in (1, 2)}
+
+
+def test_stitched_chunks_keep_tracker_ids(tracking_model, archers_video, tmp_path):
+    from src.core.cache import KeypointCache, KeypointCacheWriter
+    from src.core.chunks import VideoChunks
+
+    paths = []
+    for k, (warm_start, start, end) in enumerate([(0, 0, 14), (9, 14, 27), (22, 27, None)]):
+        paths.append(str(tmp_path / f'chunk{k}'))
+        VideoChunks.process_chunk(tracking_model, archers_video, paths[-1], warm_start, start, end, batch_size=4)
+        chunk = KeypointCache.read(paths[-1])
+        assert sorted(chunk.frame(0).ids.tolist()) == [1, 2]  # 每段的跟踪器从1重新编号
+    writer = KeypointCacheWriter(str(tmp_path / 'stitched'))
+    assert VideoChunks.stitch(paths, [writer]) == 40
+    writer.close()
+
+    stitched = KeypointCache.read(writer.path)
+    archers = [dict(zip(archer_names(k.boxes), k.ids.tolist())) for k in map(stitched.frame, range(40))]
+    assert sorted(archers[0].values()) == [1, 2] and all(frame == archers[0] for frame in archers)
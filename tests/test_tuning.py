@@ -0,0 +1,51 @@
+import cv2
+import numpy as np
+import pytest
+import torch
+
+from src.core.tuning import AutoTuner
+
+
+class FakeModel:
+    """不检出任何目标的模型"""
+
+    device = 'cpu'
+
+    def predict(self, frames, **kwargs):
+        return iter([None] * len(frames))
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """调优配置写到临时目录, 结束后恢复线程数"""
+    monkeypatch.chdir(tmp_path)
+    threads = torch.get_num_threads(), cv2.getNumThreads()
+    yield tmp_path
+    torch.set_num_threads(threads[0])
+    cv2.setNumThreads(threads[1])
+
+
+def test_resolve_uses_profile_without_changing_threads(indexed_video):
+    AutoTuner.save(AutoTuner.key('fake', 'cpu', (160, 128), 2), {'batch_size': 8, 'threads': 1})
+    torch.set_num_threads(2)
+    assert AutoTuner.resolve(FakeModel(), 'fake', indexed_video, threads=2) == 8
+    assert AutoTuner.resolve(FakeModel(), 'fake', indexed_video, batch_size=3, threads=2) == 3
+    assert torch.get_num_threads() == 2
+
+
+def test_tune_restores_threads():
+    torch.set_num_threads(2)
+    frames = [np.zeros((128, 160, 3), np.uint8)] * AutoTuner.CALIBRATION_FRAMES
+    profile = AutoTuner.tune(FakeModel(), frames, 'cpu', max_threads=4)
+    assert profile['batch_size'] in AutoTuner.BATCH_SIZES
+    assert torch.get_num_threads() == 2
+
+
+def test_startup_applies_most_common_tuned_threads():
+    for i, threads in enumerate((2, 2, 4)):
+        AutoTuner.save(AutoTuner.key(f'model{i}', 'cpu', (640, 384), 4), {'batch_size': 8, 'threads': threads})
+    AutoTuner.save(AutoTuner.key('model0', 'cpu', (640, 384), 8), {'batch_size': 8, 'threads': 8})
+    AutoTuner.save(AutoTuner.key('model0', 'cuda:0', (640, 384), 4), {'batch_size': 16, 'threads': None})
+    assert AutoTuner.startup(4) == 2
+    assert torch.get_num_threads() == 2
+    assert AutoTuner.startup(3) == 3